@@ -0,0 +1,87 @@
+"""Dashboard latency: scanning raw reports vs reading the running aggregate.
+
+For each report volume, builds the global aggregate the way the report writer
+does (combine_deltas over flush-sized batches, summed into one document) and
+times two ways of answering /analytics/global: a full pass over the reports
+computing the same totals, and summarize() on the aggregate document
+(tests/test_analytics.py checks that they agree). The write-side cost of
+maintaining the aggregate (per report, at flush time) is printed too.
+
+Everything is in memory, so the scan column is a lower bound: against
+Firestore every scanned report is also a document read over the network,
+while the aggregate stays a single document read at any volume.
+
+Run from backend/:
+    python -m benchmarks.bench_analytics --sizes 1000 10000 100000 1000000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from services.analytics_engine import GLOBAL_DOC, combine_deltas, merge_fields, summarize
+
+CATEGORIES = ["Smartphone", "Laptop", "Battery", "Cable", "Charger", "Other Electronics"]
+FLUSH_SIZE = 200
+
+
+def make_reports(n: int, distinct: int = 1000):
+    # n references to a pool of distinct reports keeps a million-report run small in memory
+    rng = random.Random(0)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    pool = []
+    for i in range(distinct):
+        rating = rng.choice([0, 0, 1, 2, 3, 4, 5])
+        pool.append(({
+            "userId": f"user-{i % 50}",
+            "binId": f"BIN-{i % 20:03d}",
+            "rating": rating,
+            "credits_earned": rating * 10,
+            "waste_category": rng.choice(CATEGORIES),
+            "estimated_weight_kg": round(rng.uniform(0.05, 2.5), 2),
+        }, start + timedelta(minutes=i * 37)))
+    return [pool[i % distinct] for i in range(n)]
+
+
+def scan(reports):
+    totals = {"total_tests": 0, "tests_passed": 0, "tests_failed": 0, "total_stars": 0}
+    for report, _ in reports:
+        totals["total_tests"] += 1
+        if (report.get("rating") or 0) > 0:
+            totals["tests_passed"] += 1
+        else:
+            totals["tests_failed"] += 1
+        totals["total_stars"] += int(report.get("rating") or 0)
+    return totals
+
+
+def build_aggregate(reports):
+    doc = {}
+    for i in range(0, len(reports), FLUSH_SIZE):
+        merge_fields(doc, combine_deltas(reports[i:i + FLUSH_SIZE])[GLOBAL_DOC])
+    return doc
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    print(f"{'reports':>10}{'scan ms':>12}{'aggregate ms':>15}{'speedup':>11}{'maintain us/report':>21}")
+    for n in args.sizes:
+        reports = make_reports(n)
+        doc, build_ms = timed(lambda: build_aggregate(reports), 1)
+        _, scan_ms = timed(lambda: scan(reports), 1)
+        _, agg_ms = timed(lambda: summarize(doc), 1000)
+        print(f"{n:>10}{scan_ms:>12.2f}{agg_ms:>15.4f}{scan_ms / agg_ms:>10.0f}x{build_ms * 1000 / n:>21.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Per-request auth overhead with and without the ID token cache.
+
+Signs Firebase-style ID tokens with a local RSA key and serves the matching
+certificate from an in-process stand-in for the key endpoint, so the SDK's
+real verification code runs (header and claim checks, RS256 signature) with
+no network. Each request goes through the verify_token dependency, as a
+route would call it.
+
+Workload: ``--users`` distinct tokens, each sent ``--requests`` times in a
+shuffled order (a signed-in user makes many calls with the same token).
+
+Run from backend/:
+    python -m benchmarks.bench_auth --users 200 --requests 20
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import random
+import statistics
+import time
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from firebase_admin import _token_gen
+from google.auth import crypt, jwt
+
+import utils.auth as auth_module
+from services.token_cache import ID_TOKEN_CERT_URI, TokenCache
+
+PROJECT = "demo-ewaste"
+KEY_ID = "bench-key"
+
+
+def make_key():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "bench")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+            .serial_number(1).not_valid_before(now - datetime.timedelta(days=1))
+            .not_valid_after(now + datetime.timedelta(days=1)).sign(key, hashes.SHA256()))
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    signer = crypt.RSASigner.from_string(pem, key_id=KEY_ID)
+    return signer, cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+class LocalResponse:
+    status = 200
+
+    def __init__(self, body):
+        self.data = body
+        self.headers = {"cache-control": "public, max-age=20000"}
+
+
+class LocalKeyRequest:
+    """Serves the certificate the way the SDK's cached cert fetch would."""
+
+    def __init__(self, cert_pem):
+        self.body = json.dumps({KEY_ID: cert_pem}).encode()
+        self.fetches = 0
+
+    def __call__(self, url, method="GET", body=None, headers=None, **kwargs):
+        assert url == ID_TOKEN_CERT_URI
+        self.fetches += 1
+        return LocalResponse(self.body)
+
+
+def make_token(signer, uid):
+    now = int(time.time())
+    return jwt.encode(signer, {
+        "iss": f"https://securetoken.google.com/{PROJECT}", "aud": PROJECT, "sub": uid, "user_id": uid,
+        "iat": now, "exp": now + 3600, "auth_time": now,
+    }).decode()
+
+
+async def run(tokens, samples):
+    for token in tokens:
+        start = time.perf_counter()
+        await auth_module.verify_token(f"Bearer {token}")
+        samples.append(time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=20, help="Requests per user token")
+    args = parser.parse_args()
+
+    signer, cert_pem = make_key()
+    request = LocalKeyRequest(cert_pem)
+    verifier = _token_gen._JWTVerifier(
+        project_id=PROJECT, short_name="ID token", operation="verify_id_token()", doc_url="", cert_url=ID_TOKEN_CERT_URI,
+        issuer=_token_gen.ID_TOKEN_ISSUER_PREFIX, invalid_token_error=ValueError, expired_token_error=ValueError)
+    # Point the dependency at the SDK verifier with the local key endpoint
+    auth_module._verify_id_token = lambda token: verifier.verify(token, request)
+
+    users = [make_token(signer, f"user-{i:05d}") for i in range(args.users)]
+    workload = users * args.requests
+    random.Random(0).shuffle(workload)
+
+    print(f"{args.users} tokens x {args.requests} requests = {len(workload)} requests\n")
+    print(f"{'mode':<14}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}{'req/s':>10}{'hit rate':>10}{'verifies':>10}")
+    for mode in ("no cache", "token cache"):
+        # max_age=0 stores nothing, so every request verifies
+        cache = TokenCache(max_entries=10000, max_age=3600 if mode == "token cache" else 0)
+        auth_module.token_cache = cache
+        samples = []
+        start = time.perf_counter()
+        asyncio.run(run(workload, samples))
+        elapsed = time.perf_counter() - start
+        samples.sort()
+        stats = cache.stats()
+        print(f"{mode:<14}{statistics.mean(samples) * 1e6:>10.1f}{samples[len(samples) // 2] * 1e6:>10.1f}"
+              f"{samples[int(len(samples) * 0.99)] * 1e6:>10.1f}{len(samples) / elapsed:>10.0f}"
+              f"{stats['hit_rate']:>10.2f}{stats['verifications']:>10}")
+    print(f"\nkey endpoint calls: {request.fetches} (served locally; a real cold fetch is an HTTPS round trip)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Compare single-image inference with micro-batched, pooled inference.
+
+Fires ``--requests`` predictions from ``--concurrency`` client threads, first
+through the plain one-invoke-per-image path on a single shared interpreter and
+then through BatchScheduler pools of ``--pool-sizes`` interpreters at each of
+``--batch-sizes``, and reports throughput and p50/p99 latency for each.
+
+Run from backend/:
+    python -m benchmarks.bench_batching --requests 512 --concurrency 32
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import config
+from services.backends import create_runner, resolve_backend
+from services.batching import BatchScheduler
+from services.model_service import MODEL_PATH
+from utils.cpus import available_cpus
+
+
+def run_clients(fn, inputs, concurrency):
+    latencies = []
+
+    def one(x):
+        t0 = time.perf_counter()
+        fn(x)
+        latencies.append(time.perf_counter() - t0)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, inputs))
+    elapsed = time.perf_counter() - start
+
+    lat_ms = np.array(latencies) * 1000
+    return {
+        "throughput_rps": len(inputs) / elapsed,
+        "p50_ms": float(np.percentile(lat_ms, 50)),
+        "p99_ms": float(np.percentile(lat_ms, 99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=512)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--batch-sizes", default="1,4,8,16")
+    parser.add_argument("--pool-sizes", default="1,2")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    backend = resolve_backend(config.MODEL_BACKEND)
+    single = create_runner(backend, MODEL_PATH)
+    _, height, width, channels = single.input_details[0]['shape']
+    rng = np.random.default_rng(0)
+    inputs = [rng.random((1, height, width, channels), dtype=np.float32) for _ in range(args.requests)]
+
+    # Warm up the interpreter before timing anything
+    single(inputs[0])
+
+    lock = threading.Lock()
+
+    def run_single(x):
+        with lock:
+            return single(x)[0]
+
+    results = {"single": run_clients(run_single, inputs, args.concurrency)}
+    for pool_size in (int(s) for s in args.pool_sizes.split(",")):
+        num_threads = max(1, available_cpus() // pool_size)
+        runners = [create_runner(backend, MODEL_PATH, num_threads) for _ in range(pool_size)]
+        for size in (int(s) for s in args.batch_sizes.split(",")):
+            scheduler = BatchScheduler(runners, size, args.max_wait_ms)
+            results[f"pool={pool_size} batch={size}"] = run_clients(lambda x: scheduler.submit(x).result()[0], inputs, args.concurrency)
+            scheduler.close()
+
+    print(f"{'mode':<22}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for mode, r in results.items():
+        print(f"{mode:<22}{r['throughput_rps']:>10.1f}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Benchmark the in-memory bin index against a brute-force scan.
+
+For each index size, scatters bins uniformly over a city-sized box around
+Delhi, builds a BinIndex and times nearby() for the 30 m submission check, the
+3 km map radius and k-nearest queries, next to a vectorized full scan of every
+bin. tests/test_bin_index.py checks that both give the same answer.
+
+Run from backend/:
+    python -m benchmarks.bench_bin_index --sizes 1000,100000,1000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from services.bin_index import BinIndex
+from utils.geo import haversine_one_to_many
+
+CENTER = (28.6139, 77.2090)
+SPAN_DEG = 0.5  # roughly 55 km square
+
+
+def make_bins(n, rng):
+    lats = CENTER[0] + (rng.random(n) - 0.5) * SPAN_DEG
+    lngs = CENTER[1] + (rng.random(n) - 0.5) * SPAN_DEG
+    return [{"binId": f"BIN-{i}", "latitude": float(lats[i]), "longitude": float(lngs[i])} for i in range(n)], lats, lngs
+
+
+def timed(fn, queries):
+    start = time.perf_counter()
+    out = [fn(q) for q in queries]
+    return (time.perf_counter() - start) / len(queries) * 1e6, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'bins':>9}{'build ms':>10}{'query':>14}{'index us':>11}{'scan us':>11}{'speedup':>9}")
+    for n in (int(s) for s in args.sizes.split(",")):
+        bins, lats, lngs = make_bins(n, rng)
+        index = BinIndex()
+
+        start = time.perf_counter()
+        index.replace_all(bins)
+        index.nearby(*CENTER, 1.0)  # forces the lazy grid build
+        build_ms = (time.perf_counter() - start) * 1000
+
+        queries = [(CENTER[0] + (rng.random() - 0.5) * SPAN_DEG * 0.8, CENTER[1] + (rng.random() - 0.5) * SPAN_DEG * 0.8) for _ in range(args.queries)]
+        cases = [("30 m", 30.0, None), ("3 km", 3000.0, None), ("10-NN 5 km", 5000.0, 10)]
+        for name, radius, k in cases:
+            index_us, _ = timed(lambda q: index.nearby(q[0], q[1], radius, k), queries)
+
+            def scan(q):
+                d = haversine_one_to_many(q[0], q[1], lats, lngs)
+                hits = np.nonzero(d <= radius)[0]
+                hits = hits[np.argsort(d[hits])]
+                return hits[:k] if k else hits
+
+            scan_us, _ = timed(scan, queries)
+            print(f"{n:>9}{build_ms:>10.1f}{name:>14}{index_us:>11.1f}{scan_us:>11.1f}{scan_us / index_us:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
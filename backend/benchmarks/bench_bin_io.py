@@ -0,0 +1,119 @@
+"""Bulk bin import/export throughput for each file format.
+
+Generates ``--bins`` bins (1% of rows invalid), writes them as CSV, GeoJSON
+and NDJSON files, and times import_bins() and a full export_bins() pass for
+each, then checks that export -> import round-trips. Peak traced Python
+memory is reported to show neither side holds the collection.
+
+By default writes go to the in-memory local store, so the numbers are
+mostly parse + validate + batch building (the part this code controls). With FIRESTORE_EMULATOR_HOST set and --emulator, the same run
+goes against the Firestore emulator end to end.
+
+Run from backend/:
+    python -m benchmarks.bench_bin_io --bins 100000
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from services.bin_io import BIN_FIELDS, export_bins, import_bins
+from services.local_store import LocalStore
+
+
+def make_rows(n):
+    rng = random.Random(0)
+    rows = []
+    for i in range(n):
+        row = {
+            "binId": f"BIN-{i:07d}", "latitude": round(28.4 + rng.random() * 0.5, 6), "longitude": round(76.9 + rng.random() * 0.5, 6),
+            "areaName": f"Area {i % 500}", "current_capacity": 0.0, "max_capacity": 100.0, "status": "active",
+        }
+        if i % 100 == 99:
+            row["latitude"] = "not-a-number"
+        rows.append(row)
+    return rows
+
+
+def write_file(rows, fmt, path):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            writer = csv.DictWriter(f, fieldnames=BIN_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        elif fmt == "ndjson":
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+        else:
+            f.write('{"type": "FeatureCollection", "features": [\n')
+            for i, row in enumerate(rows):
+                props = {k: v for k, v in row.items() if k not in ("latitude", "longitude")}
+                feature = {"type": "Feature", "geometry": {"type": "Point", "coordinates": [row["longitude"], row["latitude"]]}, "properties": props}
+                f.write(("," if i else "") + json.dumps(feature) + "\n")
+            f.write("]}\n")
+
+
+def measured(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bins", type=int, default=100000)
+    parser.add_argument("--emulator", action="store_true")
+    parser.add_argument("--project", default="demo-ewaste")
+    args = parser.parse_args()
+
+    if args.emulator:
+        if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+            raise SystemExit("Set FIRESTORE_EMULATOR_HOST to run against the Firestore emulator")
+        from google.cloud import firestore
+        make_db = lambda: firestore.Client(project=args.project)
+    else:
+        make_db = LocalStore
+
+    rows = make_rows(args.bins)
+    print(f"{args.bins} bins ({'emulator' if args.emulator else 'in-memory writes'}); "
+          "peak MB is traced memory of parsing (dry run) and of exporting\n")
+    print(f"{'format':<9}{'file MB':>9}{'import s':>10}{'rows/s':>10}{'invalid':>9}{'peak MB':>9}"
+          f"{'export s':>10}{'rows/s':>10}{'peak MB':>9}{'round-trip':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in ("csv", "geojson", "ndjson"):
+            path = os.path.join(tmp, f"bins.{fmt}")
+            write_file(rows, fmt, path)
+            db = make_db()
+            with open(path, "rb") as f:
+                start = time.perf_counter()
+                summary = import_bins(db, f, fmt)
+                import_s = time.perf_counter() - start
+            with open(path, "rb") as f:
+                _, _, parse_peak = measured(lambda: import_bins(None, f, fmt, dry_run=True))
+
+            start = time.perf_counter()
+            for _ in export_bins(db, fmt):
+                pass
+            export_s = time.perf_counter() - start
+            _, _, export_peak = measured(lambda: sum(len(chunk) for chunk in export_bins(db, fmt)))
+
+            exported = io.BytesIO(b"".join(export_bins(db, fmt)))
+            again = import_bins(LocalStore(), exported, fmt, dry_run=True)
+            ok = again["invalid"] == 0 and again["imported"] == summary["imported"]
+
+            print(f"{fmt:<9}{os.path.getsize(path) / 1e6:>9.1f}{import_s:>10.2f}{summary['rows'] / import_s:>10.0f}"
+                  f"{summary['invalid']:>9}{parse_peak / 1e6:>9.1f}{export_s:>10.2f}{summary['imported'] / export_s:>10.0f}"
+                  f"{export_peak / 1e6:>9.1f}{'ok' if ok else 'MISMATCH':>12}")
+
+
+if __name__ == "__main__":
+    main()
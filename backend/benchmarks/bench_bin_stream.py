@@ -0,0 +1,93 @@
+"""Pushing coalesced bin deltas vs every map client polling the bin list.
+
+Loads ``--bins`` bins into a private BinIndex, connects ``--clients``
+in-process SSE subscribers to a BinEventHub, then applies ``--rate``
+accepted deposits per second (random bins, through the same
+capacity_updates/apply_capacity_updates path a report flush uses) for
+``--seconds``. Prints the bytes and messages each approach delivers, with
+polling modeled as every client fetching the full /admin/bins body every
+``--poll-seconds`` (the 304s of ETag revalidation still cost one request
+per client per poll, and each change still re-sends the whole list).
+
+Run from backend/:
+    python -m benchmarks.bench_bin_stream --clients 1000 --bins 500 --rate 200 --seconds 5
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from services import bin_capacity
+from services.bin_events import BinEventHub
+from services.bin_index import BinIndex
+
+
+async def run(args):
+    rng = random.Random(0)
+    index = BinIndex()
+    index.replace_all({
+        "binId": f"BIN-{i:04d}", "latitude": 28.5 + rng.random() * 0.3, "longitude": 77.0 + rng.random() * 0.3,
+        "areaName": f"Area {i}", "current_capacity": 0.0, "max_capacity": 100.0, "status": "active",
+    } for i in range(args.bins))
+    # Capacity updates go through the module-level index, so point it at this one
+    bin_capacity.bin_index = index
+    hub = BinEventHub(index, interval_ms=args.interval_ms, queue_size=32, max_clients=args.clients)
+
+    received = [0] * args.clients
+    streams = [await hub.stream() for _ in range(args.clients)]
+
+    async def consume(i, stream):
+        async for message in stream:
+            received[i] += len(message)
+
+    tasks = [asyncio.create_task(consume(i, s)) for i, s in enumerate(streams)]
+    await asyncio.sleep(0.05)
+    snapshot_bytes = sum(received)
+
+    ids = [f"BIN-{i:04d}" for i in range(args.bins)]
+    deposits, versions_changed = 0, 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < args.seconds:
+        tick = time.perf_counter()
+        for _ in range(max(1, int(args.rate / 20))):
+            before = index.version
+            report = {"binId": rng.choice(ids), "rating": 3, "estimated_weight_kg": rng.uniform(0.1, 2.0)}
+            bin_capacity.apply_capacity_updates(bin_capacity.capacity_updates([report]))
+            deposits += 1
+            versions_changed += index.version != before
+        await asyncio.sleep(max(0.0, 0.05 - (time.perf_counter() - tick)))
+    await asyncio.sleep(hub.interval * 2)
+    elapsed = time.perf_counter() - start
+    for t in tasks:
+        t.cancel()
+
+    listing_bytes = len(index.listing()[0])
+    polls = int(elapsed / args.poll_seconds) * args.clients
+    push_bytes = sum(received) - snapshot_bytes
+    stats = hub.stats()
+
+    print(f"{args.clients} clients, {args.bins} bins, {deposits} deposits over {elapsed:.1f}s "
+          f"({stats['changes']} bin changes -> {stats['deltas']} deltas in {stats['events']} events, "
+          f"{stats['resyncs']} resyncs)\n")
+    print(f"{'mode':<34}{'requests':>10}{'MB sent':>10}{'staleness':>12}")
+    print(f"{'poll /admin/bins every ' + str(args.poll_seconds) + 's':<34}{polls:>10}{polls * listing_bytes / 1e6:>10.2f}"
+          f"{f'<= {args.poll_seconds:.1f}s':>12}")
+    print(f"{'SSE, ' + str(int(args.interval_ms)) + ' ms coalescing':<34}{0:>10}{push_bytes / 1e6:>10.2f}"
+          f"{f'<= {args.interval_ms / 1000:.1f}s':>12}")
+    print(f"\nSSE connect cost: one snapshot of {snapshot_bytes // args.clients} bytes per client")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--bins", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=200, help="Deposits per second")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--interval-ms", type=float, default=1000.0)
+    parser.add_argument("--poll-seconds", type=float, default=5.0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
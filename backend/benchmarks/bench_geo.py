@@ -0,0 +1,63 @@
+"""Vectorized haversine vs the scalar math-module version.
+
+Times utils.geo's one-to-many, many-to-many and nearest() against
+haversine_distance called in a Python loop. Their agreement is checked in
+tests/test_geo.py.
+
+Run from backend/:
+    python -m benchmarks.bench_geo --users 500 --bins 2000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from utils.geo import haversine_distance, haversine_matrix, haversine_one_to_many, nearest
+
+def scalar_matrix(a, b):
+    return np.array([[haversine_distance(p[0], p[1], q[0], q[1]) for q in b] for p in a])
+
+
+def timed(fn, repeat=3):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--bins", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    users = np.column_stack([28.6 + rng.random(args.users) * 0.4, 77.0 + rng.random(args.users) * 0.4])
+    bins = np.column_stack([28.6 + rng.random(args.bins) * 0.4, 77.0 + rng.random(args.bins) * 0.4])
+
+    u, b = users[0], bins
+    cases = {
+        f"one-to-many (1x{args.bins})": (
+            lambda: [haversine_distance(u[0], u[1], q[0], q[1]) for q in b],
+            lambda: haversine_one_to_many(u[0], u[1], b[:, 0], b[:, 1]),
+        ),
+        f"matrix ({args.users}x{args.bins})": (
+            lambda: scalar_matrix(users, bins),
+            lambda: haversine_matrix(users[:, 0], users[:, 1], bins[:, 0], bins[:, 1]),
+        ),
+        f"nearest ({args.users}x{args.bins})": (
+            lambda: scalar_matrix(users, bins).argmin(axis=1),
+            lambda: nearest(users[:, 0], users[:, 1], bins[:, 0], bins[:, 1]),
+        ),
+    }
+
+    print(f"{'query':<28}{'scalar ms':>12}{'numpy ms':>12}{'speedup':>10}")
+    for name, (scalar, vectorized) in cases.items():
+        scalar_ms = timed(scalar, repeat=1)
+        numpy_ms = timed(vectorized)
+        print(f"{name:<28}{scalar_ms:>12.2f}{numpy_ms:>12.3f}{scalar_ms / numpy_ms:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Compare the old double-decode preprocessing with the single-decode pipeline.
+
+Builds synthetic JPEG "phone photos" at several resolutions and times, per
+image, the legacy path (grayscale decode for clarity + RGB decode, float32
+conversion and /255 for the model) against services.image_pipeline.prepare_image.
+Also prints the clarity drift introduced by reduced-scale decoding.
+
+Run from backend/:
+    python -m benchmarks.bench_preprocess --repeat 20
+"""
+import argparse
+import io
+import time
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from services.image_pipeline import prepare_image
+
+RESOLUTIONS = {"VGA": (640, 480), "2MP": (1920, 1080), "12MP": (4032, 3024)}
+MODEL_SIZE = (224, 224)
+
+
+def synthetic_jpeg(width, height, seed=0):
+    # Smooth noise so the JPEG compresses like a photo rather than static
+    rng = np.random.default_rng(seed)
+    small = Image.fromarray(rng.integers(0, 256, (height // 16, width // 16, 3), dtype=np.uint8))
+    image = small.resize((width, height), Image.BILINEAR).filter(ImageFilter.GaussianBlur(2))
+    buf = io.BytesIO()
+    image.save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+
+def legacy(data):
+    img = Image.open(io.BytesIO(data)).convert('L')
+    arr = np.array(img).astype(np.float32)
+    clarity = float(np.var(arr) / (255.0**2))
+
+    image = Image.open(io.BytesIO(data)).convert('RGB').resize(MODEL_SIZE)
+    input_data = np.expand_dims(np.array(image, dtype=np.float32), axis=0) / 255.0
+    return clarity, input_data
+
+
+def timed(fn, data, repeat):
+    fn(data)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(data)
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--draft-size", type=int, default=512)
+    args = parser.parse_args()
+
+    out = np.empty((1, MODEL_SIZE[1], MODEL_SIZE[0], 3), dtype=np.float32)
+    print(f"{'image':<8}{'legacy ms':>12}{'pipeline ms':>14}{'speedup':>10}{'clarity drift':>16}")
+    for name, (width, height) in RESOLUTIONS.items():
+        data = synthetic_jpeg(width, height)
+        legacy_ms, (legacy_clarity, _) = timed(legacy, data, args.repeat)
+        new_ms, prepared = timed(lambda d: prepare_image(d, *MODEL_SIZE, out=out, draft_size=args.draft_size), data, args.repeat)
+        drift = prepared.clarity - legacy_clarity
+        print(f"{name:<8}{legacy_ms:>12.2f}{new_ms:>14.2f}{legacy_ms / new_ms:>9.1f}x{drift:>+16.4f}")
+
+
+if __name__ == "__main__":
+    main()
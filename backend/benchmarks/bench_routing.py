@@ -0,0 +1,129 @@
+"""Solution quality against solve time of the collection route planner.
+
+For each bin count in --bins, scatters that many near-full bins over Delhi
+(random loads of 60-150 kg) and solves for --trucks trucks. Each truck has
+--slack times its even share of the load. The solve is repeated at every
+budget in --budgets, and reports for each:
+  - the wall time (distance matrix included) and the km driven
+  - the improvement over the nearest-neighbor construction
+  - the gap to a reference: the same problem solved with a long budget
+    (--reference-ms), which normally runs to convergence
+The solve is averaged over --seeds bin layouts. tests/test_routing.py checks
+that plans route each bin once without overloading a truck.
+
+It also times pairwise_distance_matrix against haversine_matrix and prints
+the largest difference between them.
+
+Results go to a JSON file under --out named after the commit.
+
+Run from backend/:
+    python -m benchmarks.bench_routing --bins 200,500,1000,2000 --budgets 50,100,250,500,800
+"""
+import argparse
+import json
+import os
+import platform
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from benchmarks.load_api import BACKEND_DIR, git_revision
+from services.routing import solve_routes
+from utils.cpus import available_cpus
+from utils.geo import haversine_matrix, pairwise_distance_matrix
+
+DEPOT = (28.6139, 77.2090)
+
+
+def problem(n, seed):
+    rng = np.random.default_rng(seed)
+    lats = 28.40 + rng.random(n) * 0.45
+    lngs = 76.95 + rng.random(n) * 0.45
+    return lats, lngs, rng.uniform(60, 150, n)
+
+
+def solve(lats, lngs, demand, trucks, capacity, budget_ms):
+    start = time.perf_counter()
+    routes, lengths, unassigned, stats = solve_routes(lats, lngs, demand, DEPOT, trucks, capacity, budget_ms)
+    elapsed = (time.perf_counter() - start) * 1000
+    return {"ms": elapsed, "km": stats.distance_m / 1000, "construction_km": stats.construction_m / 1000,
+            "unassigned": len(unassigned), "timed_out": stats.timed_out}
+
+
+def time_matrix(n):
+    lats, lngs, _ = problem(n, 0)
+    start = time.perf_counter()
+    fast = pairwise_distance_matrix(lats, lngs)
+    fast_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    exact = haversine_matrix(lats, lngs, lats, lngs)
+    exact_ms = (time.perf_counter() - start) * 1000
+    error = float(np.abs(fast - exact).max())
+    print(f"distance matrix ({n}x{n}): {fast_ms:.1f} ms against {exact_ms:.1f} ms for haversine_matrix, "
+          f"max difference {error * 1000:.3f} mm\n")
+    return {"bins": n, "ms": round(fast_ms, 2), "haversine_ms": round(exact_ms, 2), "max_error_m": error}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bins", default="200,500,1000,2000", help="Comma-separated bin counts")
+    parser.add_argument("--budgets", default="50,100,250,500,800", help="Comma-separated time budgets in ms")
+    parser.add_argument("--trucks", type=int, default=8)
+    parser.add_argument("--slack", type=float, default=1.1, help="Truck capacity over an even share of the load")
+    parser.add_argument("--seeds", type=int, default=3)
+    parser.add_argument("--reference-ms", type=float, default=10000)
+    parser.add_argument("--out", default=os.path.join(BACKEND_DIR, "benchmark-results"))
+    args = parser.parse_args()
+    sizes = [int(n) for n in args.bins.split(",")]
+    budgets = [float(ms) for ms in args.budgets.split(",")]
+
+    matrix = time_matrix(max(sizes))
+    results = []
+    print(f"{'bins':>6}{'budget ms':>11}{'solve ms':>10}{'km':>10}{'vs NN':>8}{'gap':>8}{'timed out':>11}")
+    for n in sizes:
+        problems = [problem(n, seed) for seed in range(args.seeds)]
+        capacities = [demand.sum() / args.trucks * args.slack for _, _, demand in problems]
+        references = [solve(*p, args.trucks, c, args.reference_ms) for p, c in zip(problems, capacities)]
+        reference_km = np.mean([r["km"] for r in references])
+        for budget in budgets + [args.reference_ms]:
+            runs = references if budget == args.reference_ms else [
+                solve(*p, args.trucks, c, budget) for p, c in zip(problems, capacities)]
+            row = {
+                "bins": n,
+                "budget_ms": budget,
+                "solve_ms": round(float(np.mean([r["ms"] for r in runs])), 1),
+                "max_solve_ms": round(max(r["ms"] for r in runs), 1),
+                "km": round(float(np.mean([r["km"] for r in runs])), 3),
+                "improvement_over_construction": round(float(np.mean([1 - r["km"] / r["construction_km"] for r in runs])), 4),
+                "gap_to_reference": round(float(np.mean([r["km"] for r in runs]) / reference_km - 1), 4),
+                "timed_out": sum(r["timed_out"] for r in runs),
+                "unassigned": sum(r["unassigned"] for r in runs),
+            }
+            results.append(row)
+            print(f"{n:>6}{budget:>11.0f}{row['solve_ms']:>10.1f}{row['km']:>10.1f}"
+                  f"{row['improvement_over_construction']:>8.1%}{row['gap_to_reference']:>8.2%}"
+                  f"{row['timed_out']:>8}/{len(runs)}")
+
+    commit, dirty = git_revision()
+    record = {
+        "benchmark": "bench_routing",
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}, {available_cpus()} available CPUs",
+        "trucks": args.trucks,
+        "seeds": args.seeds,
+        "distance_matrix": matrix,
+        "runs": results,
+    }
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"bench_routing-{(commit or 'nogit')[:10]}{'-dirty' if dirty else ''}.json")
+    with open(path, "w") as f:
+        json.dump(record, f, indent=2)
+    print(f"\nWrote {path}")
+
+
+if __name__ == "__main__":
+    main()
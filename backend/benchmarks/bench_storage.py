@@ -0,0 +1,123 @@
+"""The app's document store workloads on each storage backend.
+
+Runs the same service code the API uses against the in-memory store, the
+SQLite-backed store and, with FIRESTORE_EMULATOR_HOST set, the Firestore
+emulator:
+
+  submit    write_submissions() in report-queue sized batches (reports,
+            user increments, analytics aggregates, bin fill levels)
+  history   history_page() walked to the end for one user (cursor pages of 50)
+  summary   single aggregate document reads (analytics/global)
+  import    import_bins() of --bins bins from CSV
+  reset     a DeletionJob over the app collections
+
+Run from backend/:
+    python -m benchmarks.bench_storage --reports 20000
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m benchmarks.bench_storage --reports 2000
+"""
+import argparse
+import io
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import config
+from services.bin_index import bin_index
+from services.bin_io import import_bins
+from services.bulk_delete import APP_COLLECTIONS, DeletionJob
+from services.history import history_page
+from services.local_store import LocalStore
+from services.submissions import make_submission, take_batch, write_submissions
+
+USERS = 50
+
+
+def make_submissions(n, bins):
+    rng = random.Random(0)
+    start = time.time() - 90 * 86400
+    out = []
+    for i in range(n):
+        rating = rng.choice([0, 2, 3, 4, 5])
+        report = {
+            "userId": f"user-{i % USERS:03d}", "binId": rng.choice(bins), "label": "Mobile Phone",
+            "waste_category": rng.choice(["Mobile Phone", "Battery", "Laptop"]), "confidence": 0.9,
+            "estimated_weight_kg": 0.2 if rating else 0.0, "credits_earned": 10 * rating, "rating": rating,
+        }
+        s = make_submission({"uid": report["userId"]}, report, rating, 10 * rating)
+        s["ts"] = start + i * (90 * 86400 / n)
+        out.append(s)
+    return out
+
+
+def seed_bins(db, count):
+    rows = "".join(f"BENCH-{i:05d},{28.5 + i * 1e-4},{77.1 + i * 1e-4},Area,0,1000000,active\n" for i in range(count))
+    f = io.BytesIO(("binId,latitude,longitude,areaName,current_capacity,max_capacity,status\n" + rows).encode())
+    return import_bins(db, f, "csv")
+
+
+def run(name, db, args):
+    results = {"backend": name}
+
+    start = time.perf_counter()
+    seed_bins(db, args.bins)
+    results["import"] = args.bins / (time.perf_counter() - start)
+
+    pending = make_submissions(args.reports, [f"BENCH-{i:05d}" for i in range(min(args.bins, 200))])
+    start = time.perf_counter()
+    while pending:
+        count = take_batch(pending, config.REPORT_QUEUE_FLUSH_SIZE)
+        write_submissions(db, pending[:count])
+        pending = pending[count:]
+    results["submit"] = args.reports / (time.perf_counter() - start)
+
+    pages = []
+    cursor, first = None, True
+    while first or cursor:
+        first = False
+        start = time.perf_counter()
+        _, cursor = history_page(db, "user-000", 50, cursor)
+        pages.append(time.perf_counter() - start)
+    results["history_ms"] = statistics.median(pages) * 1000
+
+    ref = db.collection("analytics").document("global")
+    start = time.perf_counter()
+    for _ in range(args.reads):
+        ref.get()
+    results["summary_us"] = (time.perf_counter() - start) / args.reads * 1e6
+
+    job = DeletionJob("bench", APP_COLLECTIONS + [("bins", False)])
+    start = time.perf_counter()
+    job.run(db)
+    deleted = job.to_dict()["deleted"]
+    results["reset"] = deleted / (time.perf_counter() - start)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=20000)
+    parser.add_argument("--bins", type=int, default=5000)
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--project", default="demo-ewaste")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = [("memory", LocalStore), ("sqlite", lambda: LocalStore(os.path.join(tmp, "bench.sqlite3")))]
+        if os.getenv("FIRESTORE_EMULATOR_HOST"):
+            from google.cloud import firestore
+            backends.append(("firestore emulator", lambda: firestore.Client(project=args.project)))
+
+        print(f"{args.reports} reports from {USERS} users, {args.bins} bins\n")
+        print(f"{'backend':<20}{'import/s':>10}{'submit/s':>10}{'history ms':>12}{'summary us':>12}{'reset/s':>10}")
+        for name, make_db in backends:
+            config.STORAGE_BACKEND = "firestore" if name.startswith("firestore") else name
+            bin_index.replace_all([])
+            r = run(name, make_db(), args)
+            print(f"{name:<20}{r['import']:>10.0f}{r['submit']:>10.0f}{r['history_ms']:>12.2f}"
+                  f"{r['summary_us']:>12.1f}{r['reset']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Throughput scaling and per-worker memory of the multi-worker server.
+
+Starts ``python server.py --workers N`` for each N in --workers, on the
+local store. Each worker keeps its own copy of it, so the scan bin is
+written to the SQLite file before start-up, and every worker loads it. It drives
+/api/predict with distinct 640x480 uploads at --concurrency-per-worker x N
+and reports:
+  - throughput, and the scaling efficiency against the 1-worker run
+  - p50/p99 latency and CPU milliseconds per request
+  - for the workers: average RSS, PSS and the part shared with other
+    processes. PSS splits each shared page between the processes mapping
+    it, so it is what each worker really costs.
+
+With --compare-spawn, the same runs are repeated under `uvicorn --workers N`.
+It spawns fresh interpreters that each import the app and TensorFlow, which
+shows what the preloading master saves.
+
+Results go to a JSON file under --out named after the commit.
+
+Run from backend/:
+    python -m benchmarks.bench_workers --workers 1,2,4 --requests 400 --compare-spawn
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+from benchmarks.load_api import (BACKEND_DIR, BIN, SERVER_ENV, drive, free_port, git_revision, predict_request,
+                                 process_sample, synthetic_jpeg, wait_ready)
+from services.bin_io import normalize_bin
+from services.local_store import LocalStore
+from utils.cpus import available_cpus
+
+
+def children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def memory(pid):
+    """RSS, PSS and shared (clean + dirty) MB of ``pid`` from smaps_rollup."""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    except OSError:
+        return None
+    return {"rss_mb": fields.get("Rss", 0.0), "pss_mb": fields.get("Pss", 0.0),
+            "shared_mb": fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0)}
+
+
+def seed_store(path):
+    store = LocalStore(path)
+    doc = normalize_bin(BIN)
+    store.collection("bins").document(doc["binId"]).set(doc)
+    store.close()
+
+
+def cpu_seconds(pids):
+    return sum(process_sample(pid)[0] or 0.0 for pid in pids)
+
+
+def launch(launcher, workers, port, env):
+    if launcher == "preload":
+        cmd = [sys.executable, "server.py", "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port)]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "main:app", "--workers", str(workers),
+               "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    return subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL)
+
+
+async def run_one(launcher, workers, args, images):
+    import httpx
+
+    port = free_port()
+    with tempfile.TemporaryDirectory(prefix="bench-workers-") as tmp:
+        env = {**SERVER_ENV, **os.environ, "STORAGE_BACKEND": "sqlite", "LOG_LEVEL": "WARNING",
+               "STORAGE_SQLITE_PATH": os.path.join(tmp, "store.sqlite3"), "IMAGE_ARCHIVE_DIR": os.path.join(tmp, "images"),
+               # uvicorn --workers doesn't divide the cores the way server.py does
+               "INFERENCE_CPUS": str(max(1, available_cpus() // workers))}
+        seed_store(env["STORAGE_SQLITE_PATH"])
+        server = launch(launcher, workers, port, env)
+        concurrency = args.concurrency_per_worker * workers
+        try:
+            limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120, limits=limits) as client:
+                await wait_ready(client, args.ready_timeout)
+                # Enough unmeasured requests that every worker has loaded its model
+                # and answered a few scans
+                await drive(client, predict_request(images, True), 4 * concurrency, concurrency, None)
+                # uvicorn --workers 1 serves from the process itself
+                pids = children(server.pid) or [server.pid]
+                cpu_before = cpu_seconds(pids)
+                result = await drive(client, predict_request(images, True), args.requests, concurrency, None)
+                cpu = cpu_seconds(pids) - cpu_before
+                usage = [m for m in (memory(pid) for pid in pids) if m]
+                master = memory(server.pid) if pids != [server.pid] else None
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+
+    per_worker = {k: round(sum(m[k] for m in usage) / len(usage), 1) for k in ("rss_mb", "pss_mb", "shared_mb")} if usage else {}
+    return {
+        "launcher": launcher,
+        "workers": workers,
+        "concurrency": concurrency,
+        "throughput_rps": result["throughput_rps"],
+        "p50_ms": result["p50_ms"],
+        "p99_ms": result["p99_ms"],
+        "errors": result["errors"],
+        "cpu_ms_per_request": round(cpu * 1000 / args.requests, 3),
+        "worker_memory": per_worker,
+        "master_memory": {k: round(v, 1) for k, v in master.items()} if master else None,
+        "total_pss_mb": round(sum(m["pss_mb"] for m in usage) + (master["pss_mb"] if master else 0.0), 1),
+    }
+
+
+async def run(args):
+    images = [synthetic_jpeg(640, 480, seed) for seed in range(8)]
+    launchers = ["preload"] + (["spawn"] if args.compare_spawn else [])
+    results = []
+    print(f"{'launcher':<10}{'workers':>8}{'req/s':>9}{'scaling':>9}{'p50 ms':>9}{'p99 ms':>9}{'errors':>7}"
+          f"{'cpu ms/r':>10}{'RSS/w':>8}{'PSS/w':>8}{'shared/w':>10}{'total PSS':>11}")
+    for launcher in launchers:
+        single = None
+        for workers in args.workers:
+            r = await run_one(launcher, workers, args, images)
+            single = single or r["throughput_rps"] / workers
+            r["scaling_efficiency"] = round(r["throughput_rps"] / (single * workers), 3)
+            results.append(r)
+            m = r["worker_memory"]
+            print(f"{launcher:<10}{workers:>8}{r['throughput_rps']:>9.1f}{r['scaling_efficiency']:>9.0%}{r['p50_ms']:>9.1f}"
+                  f"{r['p99_ms']:>9.1f}{r['errors']:>7}{r['cpu_ms_per_request']:>10.2f}{m.get('rss_mb', 0):>8.0f}"
+                  f"{m.get('pss_mb', 0):>8.0f}{m.get('shared_mb', 0):>10.0f}{r['total_pss_mb']:>11.0f}")
+    return results
+
+
+def main():
+    cpus = available_cpus()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default=",".join(str(n) for n in sorted({1, max(1, cpus // 2), cpus})),
+                        help="Comma-separated worker counts (default: 1, half and all of the available cores)")
+    parser.add_argument("--requests", type=int, default=400, help="Measured requests per run")
+    parser.add_argument("--concurrency-per-worker", type=int, default=4)
+    parser.add_argument("--compare-spawn", action="store_true", help="Also run uvicorn --workers (no preload)")
+    parser.add_argument("--ready-timeout", type=float, default=180)
+    parser.add_argument("--out", default=os.path.join(BACKEND_DIR, "benchmark-results"))
+    args = parser.parse_args()
+    args.workers = [int(n) for n in args.workers.split(",")]
+
+    print(f"{cpus} available core(s); {args.requests} requests per run at {args.concurrency_per_worker} per worker\n")
+    if max(args.workers) > cpus:
+        print(f"Note: more workers than the {cpus} available core(s), so throughput can't scale past that\n")
+    results = asyncio.run(run(args))
+
+    commit, dirty = git_revision()
+    record = {
+        "benchmark": "bench_workers",
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}, {cpus} available CPUs",
+        "runs": results,
+    }
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"bench_workers-{(commit or 'nogit')[:10]}{'-dirty' if dirty else ''}.json")
+    with open(path, "w") as f:
+        json.dump(record, f, indent=2)
+    print(f"\nWrote {path}")
+
+
+if __name__ == "__main__":
+    main()
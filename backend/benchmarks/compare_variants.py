@@ -0,0 +1,124 @@
+"""Accuracy-vs-latency comparison of model variants and backends.
+
+Runs every available (variant, backend) combination over a labeled image
+folder laid out as <folder>/<label>/<image>, each in a fresh process so
+resident memory is measured in isolation, and reports:
+
+  * top-1 agreement with the reference variant (default: unquant)
+  * top-1 accuracy against the folder labels, where they match labels.txt
+  * mean and p95 per-image inference latency
+  * resident memory after loading the model and after the run
+
+Run from backend/:
+    python -m benchmarks.compare_variants --images ./samples --backends tensorflow,tflite_runtime,onnxruntime
+"""
+import argparse
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def labeled_images(folder: str):
+    items = []
+    for label in sorted(os.listdir(folder)):
+        label_dir = os.path.join(folder, label)
+        if not os.path.isdir(label_dir):
+            continue
+        for name in sorted(os.listdir(label_dir)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                items.append((label, os.path.join(label_dir, name)))
+    return items
+
+
+def run_variant(backend, model_path, images, num_threads, results):
+    # Runs in a child process: import the runtime here so its memory is counted
+    from services.backends import create_runner
+    from services.image_pipeline import prepare_image
+
+    baseline = rss_mb()
+    runner = create_runner(backend, model_path, num_threads)
+    _, height, width, _ = runner.input_details[0]['shape']
+    loaded = rss_mb()
+
+    predictions, latencies = [], []
+    for _, path in images:
+        with open(path, "rb") as f:
+            input_data = prepare_image(f.read(), width, height).input_data
+        t0 = time.perf_counter()
+        probs = runner(input_data)[0]
+        latencies.append(time.perf_counter() - t0)
+        predictions.append(int(np.argmax(probs)))
+
+    results.put({
+        "predictions": predictions,
+        "latencies_ms": [1000 * t for t in latencies],
+        "rss_loaded_mb": loaded - baseline,
+        "rss_after_mb": rss_mb() - baseline,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", required=True, help="Folder of <label>/<image> files")
+    parser.add_argument("--variants", default="unquant,float16,int8")
+    parser.add_argument("--backends", default="auto")
+    parser.add_argument("--reference", default="unquant", help="Variant the others are compared against")
+    parser.add_argument("--num-threads", type=int, default=1)
+    args = parser.parse_args()
+
+    from services.backends import resolve_backend
+    from services.model_service import LABELS_PATH, model_path_for
+
+    images = labeled_images(args.images)
+    if not images:
+        raise SystemExit(f"No labeled images found under {args.images}")
+    with open(LABELS_PATH) as f:
+        labels = [line.strip().split(' ', 1)[1].lower() for line in f if line.strip()]
+    truth = [labels.index(label.lower()) if label.lower() in labels else None for label, _ in images]
+
+    ctx = multiprocessing.get_context("spawn")
+    runs = {}
+    for backend in (resolve_backend(b) for b in args.backends.split(",")):
+        for variant in args.variants.split(","):
+            model_path = model_path_for(variant, backend)
+            if not os.path.exists(model_path):
+                print(f"skip {variant}/{backend}: {model_path} not found")
+                continue
+            results = ctx.Queue()
+            proc = ctx.Process(target=run_variant, args=(backend, model_path, images, args.num_threads, results))
+            proc.start()
+            runs[(variant, backend)] = results.get()
+            proc.join()
+
+    reference = next((r["predictions"] for (v, _), r in runs.items() if v == args.reference), None)
+
+    print(f"\n{len(images)} images")
+    print(f"{'variant':<10}{'backend':<16}{'agree':>8}{'acc':>8}{'mean ms':>10}{'p95 ms':>10}{'rss load MB':>13}{'rss run MB':>12}")
+    for (variant, backend), r in runs.items():
+        preds = r["predictions"]
+        agree = np.mean([a == b for a, b in zip(preds, reference)]) if reference else float("nan")
+        scored = [(p, t) for p, t in zip(preds, truth) if t is not None]
+        acc = np.mean([p == t for p, t in scored]) if scored else float("nan")
+        lat = np.array(r["latencies_ms"])
+        print(f"{variant:<10}{backend:<16}{agree:>8.3f}{acc:>8.3f}{lat.mean():>10.2f}{np.percentile(lat, 95):>10.2f}"
+              f"{r['rss_loaded_mb']:>13.1f}{r['rss_after_mb']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
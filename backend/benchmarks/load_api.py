@@ -0,0 +1,386 @@
+"""End-to-end load test of the API: scans, the bin list and analytics.
+
+Drives the real app (model, preprocessing, prediction cache, report queue,
+storage) over HTTP, either in this process through httpx's ASGI transport
+(--mode inprocess) or as a uvicorn subprocess on localhost (--mode uvicorn,
+where CPU and memory are the server's alone). Storage is the local store
+(STORAGE_BACKEND=memory unless --storage says otherwise), so no Google
+project is needed; requests authenticate with the mock token.
+
+Scenarios (--scenarios):
+  predict         /api/predict, a distinct upload per request (no cache hits),
+                  once per --resolutions entry and once for --images files
+  predict_cached  /api/predict re-sending one image (prediction cache hits)
+  predict_batch   /api/predict/batch with --batch-size distinct 640x480 images
+                  per request (compare its req/s x batch size with predict@640x480)
+  admin_bins      GET /api/admin/bins with --bins bins imported
+  analytics       /api/analytics/global, /user/{uid} and /daily (30 days)
+
+Each reports throughput, p50/p95/p99 latency, errors, CPU seconds and RSS.
+Results go to a JSON file under --out named after the commit; --baseline
+compares them with an earlier file and exits non-zero when p50 latency or
+throughput regressed by more than --tolerance.
+
+Run from backend/:
+    python -m benchmarks.load_api --mode inprocess --requests 200 --concurrency 8
+    python -m benchmarks.load_api --mode uvicorn --baseline benchmark-results/load_api-<commit>.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import resource
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+from PIL import Image
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BIN = {"binId": "LOAD-BIN", "latitude": 28.6139, "longitude": 77.2090, "areaName": "Load test", "max_capacity": 1e9}
+AUTH = {"Authorization": "Bearer mock-token"}
+USER = "mock-user"
+SERVER_ENV = {
+    "REPORT_JOURNAL_PATH": "",
+    "TOKEN_KEY_REFRESH": "0",
+    # Distinct uploads must not be answered as near-duplicates of earlier ones
+    "PREDICTION_CACHE_PHASH_DISTANCE": "-1",
+    # Uploads are archived as in a deployment that enables the archive, into a
+    # fresh directory per run
+    "IMAGE_ARCHIVE": "local",
+    "IMAGE_ARCHIVE_DIR": tempfile.mkdtemp(prefix="load-api-archive-"),
+}
+
+
+# Image corpus
+
+
+def synthetic_jpeg(width: int, height: int, seed: int) -> bytes:
+    # High-contrast blocks plus noise, so the image passes the clarity check
+    rng = np.random.default_rng(seed)
+    # Luminance is black or white per block (clarity is grayscale variance); colour is a tint
+    blocks = rng.integers(0, 2, size=(8, 8, 1), dtype=np.uint8) * 215 + rng.integers(0, 41, size=(8, 8, 3), dtype=np.uint8)
+    img = np.kron(blocks, np.ones((-(-height // 8), -(-width // 8), 1), dtype=np.uint8))[:height, :width]
+    img = np.clip(img.astype(np.int16) + rng.integers(-20, 21, size=img.shape), 0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(img).save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+
+def with_comment(jpeg: bytes, text: str) -> bytes:
+    # A COM segment after SOI changes the bytes (and their hash), not the pixels
+    payload = text.encode()
+    return jpeg[:2] + b"\xff\xfe" + struct.pack(">H", len(payload) + 2) + payload + jpeg[2:]
+
+
+def corpus(resolutions, images_dir):
+    sets = {}
+    for res in resolutions:
+        width, height = (int(v) for v in res.lower().split("x"))
+        sets[f"predict@{width}x{height}"] = [synthetic_jpeg(width, height, seed) for seed in range(4)]
+    if images_dir:
+        files = []
+        for root, _, names in os.walk(images_dir):
+            files += [os.path.join(root, n) for n in sorted(names) if n.lower().endswith(IMAGE_EXTENSIONS)]
+        if files:
+            sets["predict@files"] = []
+            for path in files:
+                with open(path, "rb") as f:
+                    data = f.read()
+                # Re-encode non-JPEGs so a comment segment can make each upload distinct
+                if not data.startswith(b"\xff\xd8"):
+                    buf = io.BytesIO()
+                    Image.open(io.BytesIO(data)).convert("RGB").save(buf, "JPEG", quality=95)
+                    data = buf.getvalue()
+                sets["predict@files"].append(data)
+    return sets
+
+
+# Process metrics
+
+
+def _proc(pid, name):
+    try:
+        with open(f"/proc/{pid}/{name}") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def process_sample(pid=None):
+    """(cpu seconds, rss MB, peak rss MB) of ``pid``, or of this process."""
+    if pid is None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        cpu = usage.ru_utime + usage.ru_stime
+    else:
+        stat = _proc(pid, "stat")
+        if stat is None:
+            return None, None, None
+        fields = stat.rsplit(")", 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    status = _proc(pid or "self", "status") or ""
+    mem = {line.split(":")[0]: int(line.split()[1]) / 1024 for line in status.splitlines() if line.startswith(("VmRSS", "VmHWM"))}
+    return cpu, mem.get("VmRSS"), mem.get("VmHWM")
+
+
+# Load generation
+
+
+async def drive(client, make_request, requests, concurrency, pid):
+    latencies, errors = [], 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            method, url, kwargs, expected = make_request(i)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                ok = response.status_code == expected
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            errors += not ok
+
+    cpu_before, _, _ = process_sample(pid)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    cpu_after, rss, peak = process_sample(pid)
+
+    lat_ms = np.array(latencies) * 1000
+    cpu = cpu_after - cpu_before if cpu_before is not None else None
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 2),
+        "p50_ms": round(float(np.percentile(lat_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(lat_ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(lat_ms, 99)), 3),
+        "mean_ms": round(float(lat_ms.mean()), 3),
+        "cpu_seconds": round(cpu, 3) if cpu is not None else None,
+        "cpu_ms_per_request": round(cpu * 1000 / requests, 3) if cpu is not None else None,
+        "rss_mb": round(rss, 1) if rss is not None else None,
+        "peak_rss_mb": round(peak, 1) if peak is not None else None,
+    }
+
+
+def predict_request(images, unique):
+    def make(i):
+        data = images[i % len(images)]
+        if unique:
+            data = with_comment(data, f"load-{time.time_ns()}-{i}")
+        form = {"bin_id": BIN["binId"], "user_lat": str(BIN["latitude"]), "user_lng": str(BIN["longitude"])}
+        return "POST", "/api/predict", {"data": form, "files": {"file": ("scan.jpg", data, "image/jpeg")}, "headers": AUTH}, 200
+    return make
+
+
+def batch_request(images, size):
+    def make(i):
+        files = [("files", (f"scan{j}.jpg", with_comment(images[j % len(images)], f"load-{time.time_ns()}-{i}-{j}"), "image/jpeg"))
+                 for j in range(size)]
+        form = {"bin_id": BIN["binId"], "user_lat": str(BIN["latitude"]), "user_lng": str(BIN["longitude"])}
+        return "POST", "/api/predict/batch", {"data": form, "files": files, "headers": AUTH}, 200
+    return make
+
+
+def get_request(url):
+    return lambda i: ("GET", url, {}, 200)
+
+
+async def setup(client, bins):
+    response = await client.post("/api/admin/bins", json=BIN)
+    response.raise_for_status()
+    if bins:
+        rows = "".join(f"LOAD-{i:06d},{28.4 + (i % 1000) * 5e-4},{77.0 + (i // 1000) * 5e-4},Area {i % 50},0,100,active\n" for i in range(bins))
+        csv = ("binId,latitude,longitude,areaName,current_capacity,max_capacity,status\n" + rows).encode()
+        response = await client.post("/api/admin/bins/import", files={"file": ("bins.csv", csv, "text/csv")})
+        response.raise_for_status()
+
+
+async def wait_ready(client, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/readyz")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.25)
+    raise SystemExit(f"The app was not ready within {timeout:.0f}s")
+
+
+async def run_scenarios(client, args, pid):
+    await wait_ready(client, args.ready_timeout)
+    await setup(client, args.bins)
+    scenarios = set(args.scenarios.split(","))
+    results = {}
+
+    def report(name, result):
+        results[name] = result
+        print(f"{name:<26}{result['throughput_rps']:>9.1f}{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}"
+              f"{result['p99_ms']:>9.1f}{result['errors']:>7}"
+              f"{(result['cpu_ms_per_request'] or 0):>10.2f}{(result['rss_mb'] or 0):>9.0f}")
+
+    print(f"{'scenario':<26}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>7}{'cpu ms/r':>10}{'RSS MB':>9}")
+    if "predict" in scenarios:
+        for name, images in corpus(args.resolutions.split(","), args.images).items():
+            # One unmeasured request per image set warms the model and buffers
+            await drive(client, predict_request(images, True), 2, 1, pid)
+            report(name, await drive(client, predict_request(images, True), args.requests, args.concurrency, pid))
+    if "predict_cached" in scenarios:
+        images = [synthetic_jpeg(640, 480, 99)]
+        await drive(client, predict_request(images, False), 1, 1, pid)
+        report("predict_cached", await drive(client, predict_request(images, False), args.requests, args.concurrency, pid))
+    if "predict_batch" in scenarios:
+        images = [synthetic_jpeg(640, 480, seed) for seed in range(8)]
+        await drive(client, batch_request(images, args.batch_size), 1, 1, pid)
+        report(f"predict_batch@{args.batch_size}",
+               await drive(client, batch_request(images, args.batch_size), args.requests, args.concurrency, pid))
+    if "admin_bins" in scenarios:
+        report("admin_bins", await drive(client, get_request("/api/admin/bins"), args.requests, args.concurrency, pid))
+    if "analytics" in scenarios:
+        today = date.today()
+        urls = {
+            "analytics_global": "/api/analytics/global",
+            "analytics_user": f"/api/analytics/user/{USER}",
+            "analytics_daily": f"/api/analytics/daily?start={today - timedelta(days=29)}&end={today}",
+        }
+        for name, url in urls.items():
+            report(name, await drive(client, get_request(url), args.requests, args.concurrency, pid))
+    return results
+
+
+async def run_inprocess(args):
+    # config reads the environment when main is imported
+    for key, value in SERVER_ENV.items():
+        os.environ.setdefault(key, value)
+    os.environ["STORAGE_BACKEND"] = args.storage
+    import httpx
+    import main as app_module
+
+    app = app_module.app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=120) as client:
+            return await run_scenarios(client, args, None)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def run_uvicorn(args):
+    import httpx
+
+    port = free_port()
+    env = {**SERVER_ENV, **os.environ, "STORAGE_BACKEND": args.storage}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120, limits=limits) as client:
+            return await run_scenarios(client, args, server.pid)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+# Results
+
+
+def git_revision():
+    def git(*cmd):
+        try:
+            return subprocess.run(["git", *cmd], cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    return git("rev-parse", "HEAD"), bool(git("status", "--porcelain", "--untracked-files=no"))
+
+
+def compare(results, baseline, tolerance, mode, storage):
+    """Print per-scenario changes against ``baseline``; returns the regressed scenario names."""
+    regressed = []
+    print(f"\nvs {(baseline.get('commit') or '?')[:10]} (tolerance {tolerance:.0%})")
+    if (baseline.get("mode"), baseline.get("storage")) != (mode, storage):
+        print(f"Note: the baseline ran {baseline.get('mode')} with {baseline.get('storage')} storage")
+    print(f"{'scenario':<26}{'req/s':>10}{'p50':>10}")
+    for name, now in results.items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        rps = now["throughput_rps"] / before["throughput_rps"] - 1
+        p50 = now["p50_ms"] / before["p50_ms"] - 1 if before["p50_ms"] else 0.0
+        bad = rps < -tolerance or p50 > tolerance
+        if bad:
+            regressed.append(name)
+        print(f"{name:<26}{rps:>+10.1%}{p50:>+10.1%}{'  REGRESSED' if bad else ''}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--storage", choices=("memory", "sqlite"), default="memory")
+    parser.add_argument("--scenarios", default="predict,predict_cached,admin_bins,analytics")
+    parser.add_argument("--resolutions", default="224x224,640x480,1920x1080,4032x3024")
+    parser.add_argument("--images", help="Folder of real photos to add as a predict scenario")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--batch-size", type=int, default=16, help="Images per predict_batch request")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--bins", type=int, default=1000, help="Bins imported for the admin_bins scenario")
+    parser.add_argument("--ready-timeout", type=float, default=180)
+    parser.add_argument("--out", default=os.path.join(BACKEND_DIR, "benchmark-results"))
+    parser.add_argument("--baseline", help="Earlier results file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    commit, dirty = git_revision()
+    print(f"{args.mode}, {args.storage} storage, {args.requests} requests per scenario at concurrency {args.concurrency}\n")
+    runner = run_inprocess if args.mode == "inprocess" else run_uvicorn
+    results = asyncio.run(runner(args))
+
+    import config
+    record = {
+        "benchmark": "load_api",
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+        "mode": args.mode,
+        "storage": args.storage,
+        "model": {"variant": config.MODEL_VARIANT, "backend": config.MODEL_BACKEND},
+        "scenarios": results,
+    }
+    os.makedirs(args.out, exist_ok=True)
+    name = f"load_api-{(commit or 'nogit')[:10]}{'-dirty' if dirty else ''}-{args.mode}.json"
+    path = os.path.join(args.out, name)
+    with open(path, "w") as f:
+        json.dump(record, f, indent=2)
+    print(f"\nWrote {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressed = compare(results, json.load(f), args.tolerance, args.mode, args.storage)
+        if regressed:
+            raise SystemExit(f"Regressed: {', '.join(regressed)}")
+
+
+if __name__ == "__main__":
+    main()
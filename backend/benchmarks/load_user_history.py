@@ -0,0 +1,137 @@
+"""History and chart queries for one user with a large scan history.
+
+Seeds ``--reports`` reports for one uid spread over ``--days`` days through
+write_submissions() (so the per-user daily/weekly/monthly buckets are built
+the same way the report writer builds them), then measures against the
+Firestore emulator:
+
+- cursor pagination: latency of the first, middle and last pages while
+  walking the whole history, and that every report is seen exactly once;
+- offset pagination at the same depths, for comparison (Firestore still
+  reads and bills every skipped document);
+- chart queries for a year of daily, weekly and monthly buckets, and the
+  stored bucket totals against the seeded reports.
+
+Needs the emulator (it refuses to run against a real project):
+    firebase emulators:start --only firestore
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m benchmarks.load_user_history --reports 100000
+Pass --skip-seed to rerun the queries against an already seeded uid.
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from services.analytics_engine import bucket_range
+from services.history import HISTORY_FIELDS, history_page, user_series
+from services.submissions import make_submission, take_batch, write_submissions
+
+CATEGORIES = ["Smartphone", "Laptop", "Battery", "Cable", "Charger", "Other Electronics"]
+
+
+def seed(db, uid, reports, days, end):
+    rng = random.Random(0)
+    user = {"uid": uid, "name": "History Load Test"}
+    span = days * 86400
+    pending = []
+    for _ in range(reports):
+        rating = rng.choice([0, 1, 2, 3, 4, 5])
+        report = {
+            "userId": uid,
+            "binId": f"BIN-{rng.randrange(20):03d}",
+            "label": "load",
+            "rating": rating,
+            "waste_category": rng.choice(CATEGORIES),
+            "estimated_weight_kg": round(rng.uniform(0.05, 2.5), 2),
+            "credits_earned": rating * 10,
+        }
+        submission = make_submission(user, report, rating, rating * 10)
+        submission["ts"] = end.timestamp() - rng.random() * span
+        pending.append(submission)
+
+    start = time.perf_counter()
+    written = 0
+    while pending:
+        n = take_batch(pending, 250)
+        write_submissions(db, pending[:n])
+        del pending[:n]
+        written += n
+        if written % 10000 < n:
+            print(f"  seeded {written}/{reports}")
+    print(f"Seeded {reports} reports in {time.perf_counter() - start:.1f}s")
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - t0) * 1000
+
+
+def walk_cursor(db, uid, page_size):
+    seen, latencies, cursor = set(), [], None
+    while True:
+        (rows, cursor), ms = timed(lambda: history_page(db, uid, page_size, cursor))
+        latencies.append(ms)
+        seen.update(r["id"] for r in rows)
+        if cursor is None:
+            return seen, latencies
+
+
+def offset_page(db, uid, page_size, page):
+    from google.cloud.firestore import Query
+
+    query = (
+        db.collection("reports").where("userId", "==", uid)
+        .order_by("createdAt", direction=Query.DESCENDING)
+        .select(HISTORY_FIELDS)
+        .offset(page * page_size).limit(page_size)
+    )
+    return list(query.stream())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--uid", default="history-load")
+    parser.add_argument("--skip-seed", action="store_true")
+    parser.add_argument("--project", default="demo-ewaste")
+    args = parser.parse_args()
+
+    if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+        raise SystemExit("Set FIRESTORE_EMULATOR_HOST to run against the Firestore emulator")
+
+    from google.cloud import firestore
+    db = firestore.Client(project=args.project)
+
+    end = datetime.now(timezone.utc)
+    if not args.skip_seed:
+        seed(db, args.uid, args.reports, args.days, end)
+
+    seen, latencies = walk_cursor(db, args.uid, args.page_size)
+    pages = len(latencies)
+    print(f"\nCursor walk: {len(seen)} distinct reports in {pages} pages of {args.page_size}, "
+          f"total {sum(latencies) / 1000:.1f}s, p50 {np.percentile(latencies, 50):.1f} ms, p95 {np.percentile(latencies, 95):.1f} ms")
+    if not args.skip_seed and len(seen) != args.reports:
+        print(f"  MISMATCH: expected {args.reports} reports")
+
+    print(f"\n{'page':>8}{'cursor ms':>12}{'offset ms':>12}")
+    for page in sorted({0, pages // 2, pages - 1}):
+        _, offset_ms = timed(lambda: offset_page(db, args.uid, args.page_size, page))
+        print(f"{page:>8}{latencies[page]:>12.1f}{offset_ms:>12.1f}")
+
+    today = end.date()
+    year_ago = today - timedelta(days=365)
+    print(f"\n{'chart':<8}{'buckets':>9}{'ms':>10}{'tests':>10}")
+    for period in ("day", "week", "month"):
+        buckets = bucket_range(period, year_ago, today)
+        series, ms = timed(lambda: user_series(db, args.uid, period, buckets))
+        print(f"{period:<8}{len(buckets):>9}{ms:>10.1f}{sum(b['total_tests'] for b in series):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Concurrent same-user submissions: read-modify-write vs batched increments.
+
+Fires ``--submissions`` scans for one uid from ``--concurrency`` threads
+against the Firestore emulator, once with the old read-modify-write of
+users/{uid} followed by reports.add(), and once with record_submission()'s
+single batched write of Increment() fields plus the report. Prints lost
+increments (expected minus stored totals) and write latency percentiles.
+
+The old write sat on the request path; the batched write runs as a
+background task after the response, so its latency no longer adds to the
+scan response at all.
+
+Needs the emulator (it refuses to run against a real project):
+    firebase emulators:start --only firestore
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m benchmarks.load_user_stats
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from services.submissions import record_submission
+
+STARS, CREDITS = 3, 40
+
+
+def legacy_submission(db, user, report_doc, stars, credits):
+    # The pre-batching predict_image logic: read totals, add in Python, write back
+    user_ref = db.collection("users").document(user["uid"])
+    user_doc = user_ref.get()
+    if user_doc.exists:
+        data = user_doc.to_dict()
+        user_ref.update({
+            "totalStars": data.get("totalStars", 0) + stars,
+            "totalCredits": data.get("totalCredits", 0) + credits,
+            "testsCompleted": data.get("testsCompleted", 0) + 1,
+        })
+    else:
+        user_ref.set({"name": user.get("name", "User"), "email": "", "totalStars": stars, "totalCredits": credits, "testsCompleted": 1})
+    db.collection("reports").add(report_doc)
+
+
+def run(db, fn, uid, submissions, concurrency):
+    db.collection("users").document(uid).delete()
+    user = {"uid": uid, "name": "Load Test"}
+    report = {"userId": uid, "binId": "BIN-LOAD", "rating": STARS, "credits_earned": CREDITS}
+    latencies = []
+
+    def one(_):
+        t0 = time.perf_counter()
+        fn(db, user, report, STARS, CREDITS)
+        latencies.append(time.perf_counter() - t0)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(submissions)))
+
+    stored = db.collection("users").document(uid).get().to_dict() or {}
+    lat_ms = np.array(latencies) * 1000
+    return {
+        "lost_tests": submissions - stored.get("testsCompleted", 0),
+        "lost_stars": submissions * STARS - stored.get("totalStars", 0),
+        "p50_ms": np.percentile(lat_ms, 50),
+        "p95_ms": np.percentile(lat_ms, 95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--submissions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--project", default="demo-ewaste")
+    args = parser.parse_args()
+
+    if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+        raise SystemExit("Set FIRESTORE_EMULATOR_HOST to run against the Firestore emulator")
+
+    from google.cloud import firestore
+    db = firestore.Client(project=args.project)
+
+    print(f"{args.submissions} submissions for one uid, {args.concurrency} concurrent\n")
+    print(f"{'mode':<22}{'lost tests':>12}{'lost stars':>12}{'write p50 ms':>14}{'write p95 ms':>14}")
+    for name, fn in (("read-modify-write", legacy_submission), ("batched increment", record_submission)):
+        r = run(db, fn, f"load-{name.split()[0]}", args.submissions, args.concurrency)
+        print(f"{name:<22}{r['lost_tests']:>12}{r['lost_stars']:>12}{r['p50_ms']:>14.1f}{r['p95_ms']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import os
+
+from utils.cpus import available_cpus
+
+# Runtime settings, all overridable through environment variables.
+
+# Inference micro-batching: concurrent predictions are grouped into one
+# interpreter invoke of up to BATCH_MAX_SIZE images, waiting at most
+# BATCH_MAX_WAIT_MS for a batch to fill. BATCH_MAX_SIZE=1 disables batching.
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", 8))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", 5))
+
+# Interpreter pool: INFERENCE_POOL_SIZE worker threads, each owning its own
+# TFLite interpreter running with INFERENCE_NUM_THREADS threads. By default the
+# INFERENCE_CPUS cores this process may use (its CPU affinity and container quota;
+# server.py gives each worker process its share) are split evenly between the interpreters.
+INFERENCE_CPUS = int(os.getenv("INFERENCE_CPUS", available_cpus()))
+INFERENCE_POOL_SIZE = int(os.getenv("INFERENCE_POOL_SIZE", min(2, INFERENCE_CPUS)))
+INFERENCE_NUM_THREADS = int(os.getenv("INFERENCE_NUM_THREADS", max(1, INFERENCE_CPUS // INFERENCE_POOL_SIZE)))
+
+# Large JPEGs are decoded at a reduced scale that is still at least this many
+# pixels on each side; clarity and the model input are both computed from it.
+DECODE_DRAFT_SIZE = int(os.getenv("DECODE_DRAFT_SIZE", 512))
+
+# /api/predict/batch (bulk drop-offs): at most PREDICT_BATCH_MAX_IMAGES images and
+# PREDICT_BATCH_MAX_BYTES of image data (uncompressed, for zip archives) per
+# request. Images go to the interpreters in stacked batches of
+# PREDICT_BATCH_CHUNK_SIZE, the size the micro-batcher already runs at, so
+# the interpreters are not reallocated for every new batch shape.
+PREDICT_BATCH_MAX_IMAGES = int(os.getenv("PREDICT_BATCH_MAX_IMAGES", 64))
+PREDICT_BATCH_MAX_BYTES = int(os.getenv("PREDICT_BATCH_MAX_BYTES", 128 * 1024 * 1024))
+PREDICT_BATCH_CHUNK_SIZE = int(os.getenv("PREDICT_BATCH_CHUNK_SIZE", BATCH_MAX_SIZE))
+
+# Classifier variant and runtime. MODEL_VARIANT picks converted_tflite/model_<variant>.tflite
+# (unquant, float16 or int8; .onnx for the onnxruntime backend) unless MODEL_PATH
+# points at a file directly. MODEL_BACKEND is one of auto, tflite_runtime, litert,
+# tensorflow or onnxruntime; auto uses the lightest TFLite runtime installed.
+MODEL_VARIANT = os.getenv("MODEL_VARIANT", "unquant")
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "auto")
+MODEL_PATH = os.getenv("MODEL_PATH", "")
+
+# Document store: firestore, or memory / sqlite to run without a Google project
+# (local development, load tests). sqlite keeps the documents in STORAGE_SQLITE_PATH.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "firestore")
+STORAGE_SQLITE_PATH = os.getenv("STORAGE_SQLITE_PATH", "local_store.sqlite3")
+
+# Load the model and document store in a background thread at startup instead
+# of on the first request that needs them.
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "1") != "0"
+
+# Prediction cache for re-submitted images, keyed by a hash of the upload bytes.
+# Near-identical re-shots are matched by perceptual hash within
+# PREDICTION_CACHE_PHASH_DISTANCE bits (of 64); set it to -1 to disable that mode.
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", 4096))
+PREDICTION_CACHE_TTL_SECONDS = float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", 3600))
+PREDICTION_CACHE_PHASH_DISTANCE = int(os.getenv("PREDICTION_CACHE_PHASH_DISTANCE", 4))
+
+# Verified Firebase ID tokens are cached (by hash) until they expire, or for at
+# most TOKEN_CACHE_MAX_AGE_SECONDS. TOKEN_KEY_REFRESH re-fetches the token
+# signing keys in the background before their HTTP cache lifetime runs out; it
+# starts once Firebase Admin is initialized (the firestore store, or the first
+# real token verified), so the local stores with mock tokens run no such thread.
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+TOKEN_CACHE_MAX_AGE_SECONDS = float(os.getenv("TOKEN_CACHE_MAX_AGE_SECONDS", 3600))
+TOKEN_KEY_REFRESH = os.getenv("TOKEN_KEY_REFRESH", "1") != "0"
+
+# In-memory bin index: grid cell size in degrees (0.01 is about 1.1 km), and
+# whether to follow changes to the bins collection with a Firestore listener.
+# Without the listener the collection is re-read after BIN_INDEX_MAX_AGE_SECONDS
+# (0 keeps it until restart; this worker's own admin edits apply immediately).
+BIN_INDEX_CELL_DEG = float(os.getenv("BIN_INDEX_CELL_DEG", 0.01))
+BIN_INDEX_LISTEN = os.getenv("BIN_INDEX_LISTEN", "1") != "0"
+BIN_INDEX_MAX_AGE_SECONDS = float(os.getenv("BIN_INDEX_MAX_AGE_SECONDS", 300))
+
+# Bin fill tracking: accepted scans add their estimated kg to current_capacity,
+# and an active bin is marked full once it reaches BIN_FULL_THRESHOLD of max_capacity.
+BIN_FULL_THRESHOLD = float(os.getenv("BIN_FULL_THRESHOLD", 0.95))
+
+# /api/bins/stream (Server-Sent Events): bin changes are coalesced and pushed
+# at most every BIN_STREAM_INTERVAL_MS. A client more than BIN_STREAM_QUEUE_SIZE
+# messages behind is resynced with a full snapshot instead.
+BIN_STREAM_INTERVAL_MS = float(os.getenv("BIN_STREAM_INTERVAL_MS", 1000))
+BIN_STREAM_QUEUE_SIZE = int(os.getenv("BIN_STREAM_QUEUE_SIZE", 32))
+BIN_STREAM_MAX_CLIENTS = int(os.getenv("BIN_STREAM_MAX_CLIENTS", 5000))
+
+# Write-behind report queue: submissions are journaled to REPORT_JOURNAL_PATH
+# (empty disables the journal) and committed in batches of up to
+# REPORT_QUEUE_FLUSH_SIZE (fewer if a batch would exceed Firestore's 500 writes)
+# or every REPORT_QUEUE_FLUSH_INTERVAL_MS.
+REPORT_JOURNAL_PATH = os.getenv("REPORT_JOURNAL_PATH", "report_journal.ndjson")
+REPORT_JOURNAL_FSYNC = os.getenv("REPORT_JOURNAL_FSYNC", "0") != "0"
+REPORT_QUEUE_FLUSH_SIZE = int(os.getenv("REPORT_QUEUE_FLUSH_SIZE", 200))
+REPORT_QUEUE_FLUSH_INTERVAL_MS = float(os.getenv("REPORT_QUEUE_FLUSH_INTERVAL_MS", 500))
+REPORT_QUEUE_MAX_SIZE = int(os.getenv("REPORT_QUEUE_MAX_SIZE", 100000))
+REPORT_QUEUE_MAX_RETRIES = int(os.getenv("REPORT_QUEUE_MAX_RETRIES", 5))
+# While the store is unavailable (connection errors, timeouts, UNAVAILABLE and the
+# like) reports stay queued and are retried until it is back. A batch that still
+# fails with any other error after REPORT_QUEUE_MAX_RETRIES is split to isolate
+# the report that fails; a single report that fails is appended to
+# REPORT_DEAD_LETTER_PATH (empty: only logged) and the queue moves on. The file
+# has the journal's format, so appending it to the journal replays it on start.
+REPORT_DEAD_LETTER_PATH = os.getenv("REPORT_DEAD_LETTER_PATH", "report_dead_letters.ndjson")
+
+# Timezone whose calendar days the per-day analytics rollups follow.
+ANALYTICS_TIMEZONE = os.getenv("ANALYTICS_TIMEZONE", "UTC")
+
+# Admin seed/reset bulk deletes: pages of BULK_DELETE_PAGE_SIZE documents (max 500)
+# deleted per batched write, BULK_DELETE_PARALLELISM collections at a time, each
+# with up to BULK_DELETE_MAX_INFLIGHT batch commits outstanding.
+BULK_DELETE_PAGE_SIZE = int(os.getenv("BULK_DELETE_PAGE_SIZE", 500))
+BULK_DELETE_PARALLELISM = int(os.getenv("BULK_DELETE_PARALLELISM", 4))
+BULK_DELETE_MAX_INFLIGHT = int(os.getenv("BULK_DELETE_MAX_INFLIGHT", 4))
+
+# Logging: LOG_FORMAT=json writes one JSON object per line (for log shippers),
+# text is for local development.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+
+# Telemetry: Prometheus metrics at /metrics and a Server-Timing header with the
+# stage breakdown are always on. OTEL_TRACES=1 also emits OpenTelemetry spans
+# (exported by whatever SDK is configured). Requests slower than SLOW_REQUEST_MS
+# are logged with their stage timings (0 disables).
+OTEL_TRACES = os.getenv("OTEL_TRACES", "0") != "0"
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", 1000))
+
+# Per-request sampling profiler: with PROFILE_REQUESTS=1, a request carrying an
+# X-Profile header (equal to PROFILE_TOKEN, if set) is profiled and the collapsed
+# stacks are written to PROFILE_DIR; the response's X-Profile header names the file.
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "0") != "0"
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", 30))
+
+# Content-addressed image archive: every upload that produces a report is kept
+# once under its sha256 (the report's imageHash), with a JPEG thumbnail of at most
+# IMAGE_ARCHIVE_THUMBNAIL_SIZE px made from the same decode. IMAGE_ARCHIVE is off
+# (the default: user photos are only kept when a deployment opts in), local (files
+# under IMAGE_ARCHIVE_DIR, never pruned) or gcs (IMAGE_ARCHIVE_BUCKET, where a
+# bucket lifecycle rule can expire them). Writes run on
+# IMAGE_ARCHIVE_WORKERS threads; when IMAGE_ARCHIVE_QUEUE_BYTES are waiting, a request
+# waits up to IMAGE_ARCHIVE_MAX_WAIT_MS for room before the image is skipped.
+IMAGE_ARCHIVE = os.getenv("IMAGE_ARCHIVE", "off")
+IMAGE_ARCHIVE_DIR = os.getenv("IMAGE_ARCHIVE_DIR", "image_archive")
+IMAGE_ARCHIVE_BUCKET = os.getenv("IMAGE_ARCHIVE_BUCKET", "")
+IMAGE_ARCHIVE_THUMBNAIL_SIZE = int(os.getenv("IMAGE_ARCHIVE_THUMBNAIL_SIZE", 256))
+IMAGE_ARCHIVE_WORKERS = int(os.getenv("IMAGE_ARCHIVE_WORKERS", 2))
+IMAGE_ARCHIVE_QUEUE_BYTES = int(os.getenv("IMAGE_ARCHIVE_QUEUE_BYTES", 64 * 1024 * 1024))
+IMAGE_ARCHIVE_MAX_WAIT_MS = float(os.getenv("IMAGE_ARCHIVE_MAX_WAIT_MS", 50))
+
+# Collection routes (/api/admin/routes): bins marked full or filled to at least
+# ROUTE_FILL_THRESHOLD of max_capacity, split between ROUTE_TRUCKS trucks carrying
+# ROUTE_TRUCK_CAPACITY_KG each, starting from ROUTE_DEPOT_LAT/LNG (the bins'
+# centroid when unset). Route improvement stops after ROUTE_TIME_BUDGET_MS,
+# distance matrix included.
+ROUTE_FILL_THRESHOLD = float(os.getenv("ROUTE_FILL_THRESHOLD", 0.8))
+ROUTE_TRUCKS = int(os.getenv("ROUTE_TRUCKS", 4))
+ROUTE_TRUCK_CAPACITY_KG = float(os.getenv("ROUTE_TRUCK_CAPACITY_KG", 5000))
+ROUTE_DEPOT_LAT = os.getenv("ROUTE_DEPOT_LAT", "")
+ROUTE_DEPOT_LNG = os.getenv("ROUTE_DEPOT_LNG", "")
+ROUTE_TIME_BUDGET_MS = float(os.getenv("ROUTE_TIME_BUDGET_MS", 800))
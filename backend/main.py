@@ -1,11 +1,48 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from routers import predict, analytics
-from routers import admin
+from routers import admin, bins
+from services.model_service import get_model_service, is_model_loaded
+from services.bin_index import bin_index, ensure_bin_index
+from services.report_queue import get_report_writer, is_report_writer_started
+from services.image_archive import get_image_archiver, is_image_archiver_started
+from services.warmup import start_warmup, warmup_status
+from services.storage import get_store, is_store_ready
+from services.telemetry import REGISTRY, TelemetryMiddleware
+from utils.auth import signing_keys
+from utils.log import setup_logging
+import config
 import uvicorn
 import os
 
-app = FastAPI(title="E-Waste Classifier API", description="Backend for running TFLite model inference")
+setup_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Model and document store load in the background; the server answers right away
+    # and /readyz reports when they are done.
+    if config.WARMUP_ON_STARTUP:
+        start_warmup([
+            ("model", get_model_service),
+            ("storage", get_store),
+            ("bins", lambda: ensure_bin_index(get_store())),
+        ])
+    # Replays any reports journaled but not committed before the last shutdown
+    get_report_writer()
+    yield
+    signing_keys.stop()
+    if is_report_writer_started():
+        get_report_writer().close()
+    if is_image_archiver_started():
+        get_image_archiver().close()
+    if is_model_loaded():
+        get_model_service().close()
+
+
+app = FastAPI(title="E-Waste Classifier API", description="Backend for running TFLite model inference", lifespan=lifespan)
 
 # Configure CORS
 origins = [
@@ -20,16 +57,43 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Server-Timing", "X-Profile"],
 )
+# Outermost, so the latency it records includes the other middleware
+app.add_middleware(TelemetryMiddleware)
 
 app.include_router(predict.router, prefix="/api")
 app.include_router(analytics.router, prefix="/api")
 app.include_router(admin.router, prefix="/api")
+app.include_router(bins.router, prefix="/api")
 
 @app.get("/")
 def read_root():
     return {"status": "online", "message": "E-Waste Classifier Backend is Running"}
 
+@app.get("/healthz")
+def liveness():
+    """Liveness: the process is up and the event loop is responsive."""
+    return {"status": "alive"}
+
+@app.get("/readyz")
+def readiness():
+    """Readiness: the model, document store and bin index are loaded."""
+    status = warmup_status()
+    components = {
+        "model": {"ready": is_model_loaded(), **status.get("model", {})},
+        "storage": {"ready": is_store_ready(), "backend": config.STORAGE_BACKEND, **status.get("storage", {})},
+        "bins": {"ready": bin_index.loaded, **status.get("bins", {})},
+    }
+    ready = all(c["ready"] for c in components.values())
+    return JSONResponse(status_code=200 if ready else 503, content={"ready": ready, "components": components})
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus metrics."""
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 if __name__ == "__main__":
+    # Development server; for production use server.py (preloaded, multi-worker)
     port = int(os.getenv("PORT", 8000))
     uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
@@ -1,12 +1,12 @@
 from pydantic import BaseModel
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 class PredictionResponse(BaseModel):
     label: str
     confidence: float
     all_predictions: Dict[str, float]
     stars_awarded: int = 0
-    new_total_stars: int = 0
+    new_total_stars: Optional[int] = None
     rating: int = 0
     message: str = ""
     waste_type: str = ""
@@ -18,3 +18,9 @@ class PredictionResponse(BaseModel):
     denial_reason: Optional[str] = None
     credits_earned: int = 0
 
+
+
+class DistanceMatrixRequest(BaseModel):
+    points: List[List[float]]            # [[lat, lng], ...]
+    bin_ids: Optional[List[str]] = None  # defaults to every bin
+    max_distance_m: Optional[float] = None  # entries farther than this are returned as null
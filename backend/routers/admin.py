@@ -1,62 +1,68 @@
-from fastapi import APIRouter, HTTPException, Body
-from typing import List, Dict
-from utils.auth import db
-import uuid
+from fastapi import APIRouter, Depends, HTTPException, Body, Header, Response, UploadFile, File, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import Any, List, Dict, Optional
+from services.storage import get_store
+from services.bin_index import bin_document, bin_index, ensure_bin_index
+from services.bulk_delete import APP_COLLECTIONS, get_job, list_jobs, start_deletion_job
+from services.bin_io import FORMATS, detect_format, export_bins, import_bins, normalize_bin
+from services.image_archive import get_image_archiver, image_key, is_image_hash, thumbnail_key
+from services.routing import plan_collection
+from utils.auth import require_admin, verify_token
+import config
 
 router = APIRouter()
 
 
-@router.post("/admin/seed")
+# Seed bins (10 predefined locations in Delhi with capacity and status)
+SEED_BINS = [
+    {"binId": "BIN-CP", "latitude": 28.6328, "longitude": 77.2195, "areaName": "Connaught Place", "current_capacity": 0, "max_capacity": 100, "status": "active"},
+    {"binId": "BIN-LN", "latitude": 28.5677, "longitude": 77.2756, "areaName": "Lajpat Nagar", "current_capacity": 0, "max_capacity": 100, "status": "active"},
+    {"binId": "BIN-KB", "latitude": 28.6518, "longitude": 77.1900, "areaName": "Karol Bagh", "current_capacity": 45, "max_capacity": 100, "status": "active"},
+    {"binId": "BIN-RH", "latitude": 28.7320, "longitude": 77.1170, "areaName": "Rohini", "current_capacity": 0, "max_capacity": 150, "status": "active"},
+    {"binId": "BIN-DW", "latitude": 28.5921, "longitude": 77.0460, "areaName": "Dwarka", "current_capacity": 100, "max_capacity": 100, "status": "full"},
+    {"binId": "BIN-SK", "latitude": 28.5244, "longitude": 77.2066, "areaName": "Saket", "current_capacity": 20, "max_capacity": 120, "status": "active"},
+    {"binId": "BIN-JP", "latitude": 28.6215, "longitude": 77.0924, "areaName": "Janakpuri", "current_capacity": 0, "max_capacity": 100, "status": "active"},
+    {"binId": "BIN-PP", "latitude": 28.6970, "longitude": 77.1315, "areaName": "Pitampura", "current_capacity": 0, "max_capacity": 100, "status": "inactive"},
+    {"binId": "BIN-VK", "latitude": 28.5307, "longitude": 77.1580, "areaName": "Vasant Kunj", "current_capacity": 35, "max_capacity": 100, "status": "active"},
+    {"binId": "BIN-NP", "latitude": 28.5494, "longitude": 77.2501, "areaName": "Nehru Place", "current_capacity": 0, "max_capacity": 150, "status": "active"}
+]
+
+
+def _start_job(kind: str, targets, then=None):
+    try:
+        job = start_deletion_job(get_store, kind, targets, then)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {**job.to_dict(), "status_url": f"/api/admin/jobs/{job.id}"}
+
+
+@router.post("/admin/seed", status_code=202)
 def seed_admin_and_bins(admin_email: str = Body(...), admin_password: str = Body(...)):
     """Deletes common collections and seeds a single admin account and sample Delhi bins.
-    This is intended for initial setup/demos.
+    This is intended for initial setup/demos. The deletion runs as a background
+    job; poll /admin/jobs/{job_id} for progress. The bins are seeded when it finishes.
     """
     try:
-        # Delete common collections if they exist (users, reports, shops, images, complaints)
-        collections_to_remove = ["users", "reports", "shops", "images", "complaints"]
-        for col in collections_to_remove:
-            try:
-                docs = db.collection(col).stream()
-                for d in docs:
-                    db.collection(col).document(d.id).delete()
-            except Exception:
-                pass
-
+        db = get_store()
         # Create or replace admin doc (plain password as requested)
         admin_ref = db.collection("admin").document("admin")
         admin_ref.set({
             "email": admin_email,
             "password": admin_password
         })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Seed bins (10 predefined locations in Delhi with capacity and status)
-        bins = [
-            {"binId": "BIN-CP", "latitude": 28.6328, "longitude": 77.2195, "areaName": "Connaught Place", "current_capacity": 0, "max_capacity": 100, "status": "active"},
-            {"binId": "BIN-LN", "latitude": 28.5677, "longitude": 77.2756, "areaName": "Lajpat Nagar", "current_capacity": 0, "max_capacity": 100, "status": "active"},
-            {"binId": "BIN-KB", "latitude": 28.6518, "longitude": 77.1900, "areaName": "Karol Bagh", "current_capacity": 45, "max_capacity": 100, "status": "active"},
-            {"binId": "BIN-RH", "latitude": 28.7320, "longitude": 77.1170, "areaName": "Rohini", "current_capacity": 0, "max_capacity": 150, "status": "active"},
-            {"binId": "BIN-DW", "latitude": 28.5921, "longitude": 77.0460, "areaName": "Dwarka", "current_capacity": 100, "max_capacity": 100, "status": "full"},
-            {"binId": "BIN-SK", "latitude": 28.5244, "longitude": 77.2066, "areaName": "Saket", "current_capacity": 20, "max_capacity": 120, "status": "active"},
-            {"binId": "BIN-JP", "latitude": 28.6215, "longitude": 77.0924, "areaName": "Janakpuri", "current_capacity": 0, "max_capacity": 100, "status": "active"},
-            {"binId": "BIN-PP", "latitude": 28.6970, "longitude": 77.1315, "areaName": "Pitampura", "current_capacity": 0, "max_capacity": 100, "status": "inactive"},
-            {"binId": "BIN-VK", "latitude": 28.5307, "longitude": 77.1580, "areaName": "Vasant Kunj", "current_capacity": 35, "max_capacity": 100, "status": "active"},
-            {"binId": "BIN-NP", "latitude": 28.5494, "longitude": 77.2501, "areaName": "Nehru Place", "current_capacity": 0, "max_capacity": 150, "status": "active"}
-        ]
-
-        # Clear existing bins
-        try:
-            for d in db.collection("bins").stream():
-                db.collection("bins").document(d.id).delete()
-        except Exception:
-            pass
-
-        for b in bins:
+    def seed_bins(db):
+        batch = db.batch()
+        for b in SEED_BINS:
             # Use provided binId as doc id
-            db.collection("bins").document(b["binId"]).set(b)
+            batch.set(db.collection("bins").document(b["binId"]), b)
+        batch.commit()
+        bin_index.replace_all([dict(b) for b in SEED_BINS])
 
-        return {"status": "ok", "message": "Seeded admin and sample bins"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return _start_job("seed", APP_COLLECTIONS + [("bins", False)], then=seed_bins)
 
 
 @router.post("/admin/login")
@@ -67,6 +73,7 @@ def admin_login(payload: Dict = Body(...)):
         raise HTTPException(status_code=400, detail="Missing email or password")
 
     try:
+        db = get_store()
         admin_doc = db.collection("admin").document("admin").get()
         if not admin_doc.exists:
             raise HTTPException(status_code=401, detail="Admin not configured")
@@ -82,44 +89,92 @@ def admin_login(payload: Dict = Body(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as If-None-Match specifies
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
 @router.get("/admin/bins")
-def list_bins():
-    bins = []
+def list_bins(if_none_match: Optional[str] = Header(None)):
+    """
+    All bins, served from the in-memory bin cache. Responses carry an ETag of
+    the list; a poll with a matching If-None-Match gets an empty 304.
+    """
     try:
-        for d in db.collection("bins").stream():
-            data = d.to_dict()
-            bins.append(data)
-        return {"bins": bins}
+        body, etag = ensure_bin_index(get_store()).listing()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    # no-cache: clients may store the list but must revalidate it on every use
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @router.post("/admin/bins")
 def create_bin(payload: Dict = Body(...)):
     try:
-        bin_id = payload.get("binId") or f"BIN-{str(uuid.uuid4())[:8].upper()}"
-        doc = {
-            "binId": bin_id,
-            "latitude": float(payload.get("latitude")),
-            "longitude": float(payload.get("longitude")),
-            "areaName": payload.get("areaName", ""),
-            "current_capacity": float(payload.get("current_capacity", 0)),
-            "max_capacity": float(payload.get("max_capacity", 100)),
-            "status": payload.get("status", "active")
-        }
-        db.collection("bins").document(bin_id).set(doc)
+        doc = normalize_bin(payload)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        db = get_store()
+        db.collection("bins").document(doc["binId"]).set(doc)
+        bin_index.upsert(doc)
         return {"status": "ok", "bin": doc}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/admin/bins/import")
+async def import_bins_file(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, description="csv, geojson or ndjson; guessed from the file name if omitted"),
+    dry_run: bool = Query(False, description="Validate only, write nothing"),
+):
+    """
+    Bulk upsert of bins from a CSV, GeoJSON FeatureCollection or NDJSON file.
+    Rows are validated as they are read and written 500 per batched commit;
+    invalid rows are skipped and listed in the summary.
+    """
+    fmt = format or detect_format(file.filename, file.content_type)
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format, use one of {', '.join(FORMATS)}")
+    try:
+        db = None if dry_run else get_store()
+        return await run_in_threadpool(import_bins, db, file.file, fmt, dry_run)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/admin/bins/export")
+def export_bins_file(format: str = Query("csv", pattern="^(csv|geojson|ndjson)$")):
+    """Every bin as CSV, GeoJSON or NDJSON, streamed page by page from Firestore."""
+    media_types = {"csv": "text/csv", "geojson": "application/geo+json", "ndjson": "application/x-ndjson"}
+    try:
+        db = get_store()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(
+        export_bins(db, format),
+        media_type=media_types[format],
+        headers={"Content-Disposition": f'attachment; filename="bins.{format}"'},
+    )
+
+
 @router.put("/admin/bins/{bin_id}")
 def update_bin(bin_id: str, payload: Dict = Body(...)):
     try:
+        db = get_store()
         ref = db.collection("bins").document(bin_id)
         if not ref.get().exists:
             raise HTTPException(status_code=404, detail="Bin not found")
         ref.update(payload)
+        bin_index.upsert(bin_document(ref.get()))
         return {"status": "ok"}
     except HTTPException:
         raise
@@ -130,10 +185,12 @@ def update_bin(bin_id: str, payload: Dict = Body(...)):
 @router.delete("/admin/bins/{bin_id}")
 def delete_bin(bin_id: str):
     try:
+        db = get_store()
         ref = db.collection("bins").document(bin_id)
         if not ref.get().exists:
             raise HTTPException(status_code=404, detail="Bin not found")
         ref.delete()
+        bin_index.remove(bin_id)
         return {"status": "ok"}
     except HTTPException:
         raise
@@ -141,22 +198,65 @@ def delete_bin(bin_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/admin/reset")
+@router.post("/admin/reset", status_code=202)
 def reset_db():
-    """Delete everything except admin and bins. Use with care."""
+    """Delete everything except admin and bins, as a background job. Use with care."""
+    return _start_job("reset", APP_COLLECTIONS)
+
+
+@router.get("/admin/jobs")
+def admin_jobs():
+    """Recent seed/reset jobs, newest first."""
+    return {"jobs": list_jobs()}
+
+
+@router.get("/admin/jobs/{job_id}")
+def admin_job_status(job_id: str):
+    """Progress of a seed/reset job: status and documents deleted per collection."""
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@router.get("/admin/images/{image_hash}")
+def archived_image(image_hash: str, thumbnail: bool = False, token: Dict[str, Any] = Depends(verify_token)):
+    """The archived upload behind a report (its imageHash), or its thumbnail, for disputes; admins only."""
+    require_admin(token)
+    if not is_image_hash(image_hash):
+        raise HTTPException(status_code=400, detail="imageHash must be a sha256 hex digest")
+    archiver = get_image_archiver()
+    if archiver is None:
+        raise HTTPException(status_code=404, detail="Image archive is disabled")
+    data = archiver.backend.get(thumbnail_key(image_hash) if thumbnail else image_key(image_hash))
+    if data is None:
+        raise HTTPException(status_code=404, detail="Image not archived")
+    media_type = "image/jpeg" if thumbnail else archiver.content_type(data)
+    # A user's photo: keep it out of shared and browser caches
+    return Response(content=data, media_type=media_type, headers={"Cache-Control": "private, no-store"})
+
+
+@router.get("/admin/routes")
+def collection_routes(
+    threshold: float = Query(config.ROUTE_FILL_THRESHOLD, ge=0, le=1, description="Fill ratio at which a bin is collected"),
+    trucks: int = Query(config.ROUTE_TRUCKS, ge=1, le=100),
+    capacity: float = Query(config.ROUTE_TRUCK_CAPACITY_KG, gt=0, description="Load per truck, in kg"),
+    depot_lat: Optional[float] = Query(None, ge=-90, le=90),
+    depot_lng: Optional[float] = Query(None, ge=-180, le=180),
+    time_budget_ms: float = Query(config.ROUTE_TIME_BUDGET_MS, gt=0, le=10000),
+):
+    """
+    Pickup routes for the bins that need collecting: every bin marked full or
+    filled to ``threshold``, split between the trucks. Bins no truck has room
+    for are listed as unassigned. Distances are straight-line, not by road.
+    """
+    if (depot_lat is None) != (depot_lng is None):
+        raise HTTPException(status_code=400, detail="Give both depot_lat and depot_lng, or neither")
+    if depot_lat is None and config.ROUTE_DEPOT_LAT and config.ROUTE_DEPOT_LNG:
+        depot_lat, depot_lng = float(config.ROUTE_DEPOT_LAT), float(config.ROUTE_DEPOT_LNG)
+    depot = (depot_lat, depot_lng) if depot_lat is not None else None
     try:
-        protected = {"admin", "bins"}
-        # Delete top-level collections except protected
-        # Note: Firestore python client does not provide listing of all collections at root easily,
-        # so target known collections used by app.
-        target_collections = ["users", "reports", "shops", "images", "complaints"]
-        for col in target_collections:
-            try:
-                for d in db.collection(col).stream():
-                    db.collection(col).document(d.id).delete()
-            except Exception:
-                pass
-
-        return {"status": "ok", "message": "Reset done (kept admin and bins)"}
+        bins = ensure_bin_index(get_store()).all()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return plan_collection(bins, threshold, trucks, capacity, time_budget_ms, depot)
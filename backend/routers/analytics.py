@@ -1,27 +1,119 @@
-from fastapi import APIRouter
-from typing import List, Dict
+from datetime import date, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from typing import Any, Dict, Optional
+from services.analytics_engine import BINS_COLLECTION, DAILY_COLLECTION, GLOBAL_DOC, USER_FIELD, bucket_range, summarize
+from services.history import history_page, user_series
+from services.storage import get_store
+from utils.auth import require_user, verify_token
 
 router = APIRouter()
 
+# Longest range /analytics/daily reads in one request
+MAX_DAILY_RANGE = 366
+# Most buckets one /analytics/user/{uid}/series request reads
+MAX_SERIES_BUCKETS = 400
+# Recent scans embedded in /analytics/user/{uid}; the rest via /history
+USER_SUMMARY_HISTORY = 10
+
+
+def _read(collection: str, doc_id: str):
+    doc = get_store().collection(collection).document(doc_id).get()
+    return doc.to_dict() if doc.exists else {}
+
+
 @router.get("/analytics/global")
-def get_global_analytics():
-    return {
-        "total_tests": 1240,
-        "tests_passed": 1050,
-        "tests_failed": 190,
-        "total_stars": 5200
-    }
+async def get_global_analytics():
+    """Platform-wide totals, read from the running aggregate (one document)."""
+    try:
+        return summarize(await run_in_threadpool(_read, *GLOBAL_DOC))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 
 @router.get("/analytics/user/{uid}")
-def get_user_analytics(uid: str):
-    # In real app, fetch from Firestore
-    return {
-        "uid": uid,
-        "total_tests": 42,
-        "tests_passed": 38,
-        "stars_earned": 210,
-        "history": [
-            {"date": "2023-10-01", "result": "passed"},
-            {"date": "2023-10-02", "result": "passed"}
-        ]
-    }
+async def get_user_analytics(uid: str, token: Dict[str, Any] = Depends(verify_token)):
+    """A user's totals, read from the aggregate map on their user document, plus their latest scans. Own data only, unless admin."""
+    require_user(token, uid)
+    try:
+        user = await run_in_threadpool(_read, "users", uid)
+        rows, _ = await run_in_threadpool(lambda: history_page(get_store(), uid, USER_SUMMARY_HISTORY))
+        stats = summarize(user.get(USER_FIELD))
+        return {
+            "uid": uid,
+            **stats,
+            "stars_earned": stats["total_stars"],
+            "history": rows,
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/analytics/user/{uid}/history")
+async def get_user_history(
+    uid: str,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    token: Dict[str, Any] = Depends(verify_token),
+):
+    """A user's scans, newest first, one page at a time. Own data only, unless admin."""
+    require_user(token, uid)
+    try:
+        rows, next_cursor = await run_in_threadpool(lambda: history_page(get_store(), uid, limit, cursor))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"uid": uid, "items": rows, "next_cursor": next_cursor}
+
+
+@router.get("/analytics/user/{uid}/series")
+async def get_user_series(
+    uid: str,
+    start: date = Query(...),
+    end: date = Query(...),
+    period: str = Query("day", pattern="^(day|week|month)$"),
+    token: Dict[str, Any] = Depends(verify_token),
+):
+    """Chart data: a user's totals per day, ISO week or month, from their precomputed buckets. Own data only, unless admin."""
+    require_user(token, uid)
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    buckets = bucket_range(period, start, end)
+    if len(buckets) > MAX_SERIES_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Range covers more than {MAX_SERIES_BUCKETS} {period} buckets")
+    try:
+        series = await run_in_threadpool(lambda: user_series(get_store(), uid, period, buckets))
+        return {"uid": uid, "period": period, "buckets": series}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/analytics/bin/{bin_id}")
+async def get_bin_analytics(bin_id: str):
+    """Totals for scans recorded at one bin."""
+    try:
+        return {"binId": bin_id, **summarize(await run_in_threadpool(_read, BINS_COLLECTION, bin_id))}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/analytics/daily")
+async def get_daily_analytics(start: date = Query(...), end: Optional[date] = Query(None)):
+    """Per-day totals from `start` to `end` inclusive (default: just `start`); days without scans read as zero."""
+    end = end or start
+    days = (end - start).days + 1
+    if days < 1 or days > MAX_DAILY_RANGE:
+        raise HTTPException(status_code=400, detail=f"Range must cover 1 to {MAX_DAILY_RANGE} days")
+    ids = [(start + timedelta(days=i)).isoformat() for i in range(days)]
+
+    def read_days():
+        db = get_store()
+        refs = [db.collection(DAILY_COLLECTION).document(i) for i in ids]
+        return {doc.id: doc.to_dict() for doc in db.get_all(refs) if doc.exists}
+
+    try:
+        found = await run_in_threadpool(read_days)
+        return {"days": [{"date": i, **summarize(found.get(i))} for i in ids]}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,87 @@
+from fastapi import APIRouter, HTTPException, Query, Body, Header
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from services.bin_events import bin_events
+from services.bin_index import ensure_bin_index, has_coords
+from models.schemas import DistanceMatrixRequest
+from utils.geo import haversine_matrix
+import numpy as np
+from services.storage import get_store
+
+router = APIRouter()
+
+# Upper bound on points x bins for one distance matrix request
+MAX_MATRIX_CELLS = 1_000_000
+
+
+@router.get("/bins/nearby")
+async def nearby_bins(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius: float = Query(3000.0, gt=0, le=500000, description="Search radius in meters"),
+    k: Optional[int] = Query(None, ge=1, le=1000, description="Return at most the k nearest bins"),
+):
+    """Bins within `radius` meters of (lat, lng), nearest first, served from the in-memory bin index."""
+    try:
+        index = await run_in_threadpool(lambda: ensure_bin_index(get_store()))
+        # A query after bins were added or moved rebuilds the grid first
+        results = await run_in_threadpool(index.nearby, lat, lng, radius, k)
+        return {"bins": [{**b, "distance_meters": d} for b, d in results]}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/bins/distances")
+async def bin_distances(payload: DistanceMatrixRequest = Body(...)):
+    """Many-to-many distance matrix in meters between the given points and bins (rows are points)."""
+    index = await run_in_threadpool(lambda: ensure_bin_index(get_store()))
+    if payload.bin_ids is None:
+        bins = [b for b in index.all() if has_coords(b)]
+    else:
+        bins = [index.get(b) for b in payload.bin_ids]
+        missing = [b for b, data in zip(payload.bin_ids, bins) if data is None or not has_coords(data)]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Unknown bins or bins without a location: {', '.join(missing[:10])}")
+
+    if any(len(p) != 2 for p in payload.points):
+        raise HTTPException(status_code=400, detail="Each point must be [lat, lng]")
+    if len(payload.points) * len(bins) > MAX_MATRIX_CELLS:
+        raise HTTPException(status_code=413, detail=f"Matrix too large, at most {MAX_MATRIX_CELLS} point/bin pairs per request")
+
+    points = np.asarray(payload.points, dtype=np.float64).reshape(-1, 2)
+    bin_lats = np.array([float(b["latitude"]) for b in bins])
+    bin_lngs = np.array([float(b["longitude"]) for b in bins])
+    matrix = await run_in_threadpool(haversine_matrix, points[:, 0], points[:, 1], bin_lats, bin_lngs)
+
+    rows = matrix.tolist()
+    if payload.max_distance_m is not None:
+        rows = [[d if d <= payload.max_distance_m else None for d in row] for row in rows]
+    return {"bin_ids": [b["binId"] for b in bins], "distances_meters": rows}
+
+
+@router.get("/bins/stream")
+async def bin_stream(last_event_id: Optional[str] = Header(None)):
+    """
+    Server-Sent Events feed of bin changes: a `snapshot` event with every bin,
+    then coalesced `bins` events carrying per-bin deltas and removed ids.
+    """
+    try:
+        await run_in_threadpool(lambda: ensure_bin_index(get_store()))
+        events = await bin_events.stream(last_event_id)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        # Stop proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/bins/stream/stats")
+def bin_stream_stats():
+    """Connected clients and coalescing counters of the bin event stream."""
+    return bin_events.stats()
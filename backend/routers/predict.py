@@ -1,128 +1,158 @@
 from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Form
-from services.model_service import model_service
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from services.model_service import get_model_service
+from services.prediction_cache import prediction_cache, content_hash
+from services.bin_index import ensure_bin_index
+from services.submissions import MAX_BATCH_WRITES, make_submission, take_batch, write_submissions
+from services.report_queue import get_report_writer
+from services.image_archive import get_image_archiver, is_image_archiver_started
+from services.scoring import MIN_CLARITY, score_prediction
+from utils.geo import haversine_distance
 from models.schemas import PredictionResponse
-from utils.auth import verify_token, db
-from typing import Dict, Any
-from PIL import Image
+from services.storage import get_store
+from utils.auth import verify_token, auth_stats
+from services.telemetry import stage
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
 import io
-import numpy as np
-import math
+import json
+import logging
+import os
+import zipfile
+import config
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-def haversine_distance(lat1, lon1, lat2, lon2):
-    # Returns distance in meters
-    R = 6371000
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon2 - lon1)
-    a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dlambda/2)**2
-    return R * (2 * math.atan2(math.sqrt(a), math.sqrt(1 - a)))
-
-
-def categorize_waste(label: str, confidence: float):
-    """Categorize e-waste and estimate weight based on detected label"""
-    label_lower = label.lower()
-    
-    # E-waste categories with weight ranges (min, max in kg)
-    categories = {
-        "mobile": {
-            "keywords": ["mobile", "phone", "smartphone", "cell"],
-            "weight_range": (0.15, 0.25),
-            "base_stars": 2.5,
-            "recyclability": "recyclable"
-        },
-        "laptop": {
-            "keywords": ["laptop", "notebook", "computer"],
-            "weight_range": (1.5, 3.0),
-            "base_stars": 3.5,
-            "recyclability": "recyclable"
-        },
-        "charger": {
-            "keywords": ["charger", "adapter", "cable", "cord"],
-            "weight_range": (0.05, 0.15),
-            "base_stars": 1.5,
-            "recyclability": "recyclable"
-        },
-        "battery": {
-            "keywords": ["battery", "cell"],
-            "weight_range": (0.02, 0.5),
-            "base_stars": 2.0,
-            "recyclability": "partially_damaged"
-        },
-        "monitor": {
-            "keywords": ["monitor", "screen", "display", "tv", "television"],
-            "weight_range": (3.0, 10.0),
-            "base_stars": 4.5,
-            "recyclability": "recyclable"
-        },
-        "printer": {
-            "keywords": ["printer", "scanner"],
-            "weight_range": (5.0, 15.0),
-            "base_stars": 4.5,
-            "recyclability": "recyclable"
-        },
-        "mixed": {
-            "keywords": ["electronic", "device", "plastic", "waste", "trash", "mixed"],
-            "weight_range": (0.5, 2.0),
-            "base_stars": 2.0,
-            "recyclability": "recyclable"
-        }
+ALLOWED_RADIUS_M = 30.0
+
+
+async def _lookup_bin(bin_id: str) -> Dict[str, Any]:
+    # Get bin info from the in-memory index, falling back to Firestore for bins
+    # created on another worker that the listener hasn't delivered yet
+    with stage("bin_lookup"):
+        db = await run_in_threadpool(get_store)
+        index = await run_in_threadpool(ensure_bin_index, db)
+        bin_data = index.get(bin_id)
+        if bin_data is None:
+            bin_doc = await run_in_threadpool(db.collection("bins").document(bin_id).get)
+            if not bin_doc.exists:
+                raise HTTPException(status_code=404, detail="Selected bin not found")
+            bin_data = bin_doc.to_dict()
+            index.upsert(bin_data)
+    return bin_data
+
+
+def _check_distance(bin_data: Dict[str, Any], user_lat: float, user_lng: float) -> float:
+    bin_lat = float(bin_data.get("latitude"))
+    bin_lng = float(bin_data.get("longitude"))
+
+    # Compute distance
+    distance = haversine_distance(user_lat, user_lng, bin_lat, bin_lng)
+    allowed_radius = ALLOWED_RADIUS_M  # meters
+    if distance > allowed_radius:
+        raise HTTPException(
+            status_code=403, 
+            detail=f"You are not near a bin. You must be within {allowed_radius}m of a registered bin to submit waste. Current distance: {distance:.1f}m"
+        )
+    return distance
+
+
+def _blurry_response(clarity: float, distance: float) -> PredictionResponse:
+    return PredictionResponse(
+        label="Unknown",
+        confidence=0.0,
+        all_predictions={},
+        rating=0,
+        message="Image quality too poor. Please take a clearer photo.",
+        denial_reason="Poor image quality (too blurry)",
+        clarity_score=clarity,
+        distance_meters=distance
+    )
+
+
+def _scored_response(user: Dict[str, Any], bin_id: str, distance: float, result: Dict[str, Any],
+                     clarity: float, duplicate: Optional[str], image_hash: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """The response for a classified image and the submission recording it."""
+    label = result.get("label", "Unknown")
+    confidence = float(result.get("confidence", 0.0))
+    scored = score_prediction(label, confidence, clarity)
+    rating = scored["rating"]
+    waste_category = scored["waste_category"]
+    estimated_weight = scored["estimated_weight_kg"]
+    credits_earned = scored["credits_earned"]
+
+    stars_earned = rating
+
+    report_doc = {
+        "userId": user.get("uid"),
+        "binId": bin_id,
+        "label": label,
+        "confidence": confidence,
+        "rating": rating,
+        "clarity": clarity,
+        "distance": distance,
+        "waste_category": waste_category,
+        "estimated_weight_kg": estimated_weight,
+        "recyclability": scored["recyclability"],
+        "credits_earned": credits_earned,
+        # Re-submission of an already scored image (exact or near copy), a fraud signal
+        "duplicate": duplicate,
+        # Content hash of the upload, so the report can be matched to its image later
+        "imageHash": image_hash
     }
-    
-    # Match label to category
-    for category, data in categories.items():
-        for keyword in data["keywords"]:
-            if keyword in label_lower:
-                # Estimate weight (average with slight randomness based on confidence)
-                weight_min, weight_max = data["weight_range"]
-                estimated_weight = weight_min + (weight_max - weight_min) * confidence
-                return category, estimated_weight, data["base_stars"], data["recyclability"]
-    
-    # Unknown/not e-waste
-    return "unknown", 0.0, 0.0, "unknown"
-
-
-def calculate_rating(waste_category: str, estimated_weight: float, clarity: float, confidence: float, base_stars: float):
-    """Calculate rating based on waste value, weight, clarity, and confidence"""
-    
-    if waste_category == "unknown" or confidence < 0.35:
-        # Not e-waste or too low confidence
-        return 0
-    
-    # Start with base stars for waste type
-    rating = base_stars
-    
-    # Weight contribution
-    if estimated_weight >= 5.0:
-        rating += 1.5
-    elif estimated_weight >= 1.0:
-        rating += 1.0
-    elif estimated_weight >= 0.1:
-        rating += 0.5
-    
-    # Image quality (clarity)
-    if clarity < 0.2:
-        rating -= 1.0  # Poor quality penalty
-    elif clarity > 0.4:
-        rating += 0.5  # Good quality bonus
-    
-    # Confidence multiplier
-    if confidence < 0.6:
-        rating *= 0.7  # Fair confidence
-    elif confidence < 0.8:
-        rating *= 0.85  # Good confidence
-    # Otherwise 100% (excellent confidence)
-    
-    # Clamp to 0-5 range and round
-    rating = max(0, min(5, round(rating)))
-    
-    # Deny if rating < 1
-    if rating < 1:
+
+    # Build response
+    response = {
+        "label": label,
+        "confidence": confidence,
+        "all_predictions": result.get("all_predictions", {}),
+        "stars_awarded": stars_earned,
+        # Totals are incremented server-side and not read back on the request path
+        "new_total_stars": None,
+        "rating": rating,
+        "message": scored["message"],
+        "waste_type": waste_category,  # Keep for backward compatibility
+        "waste_category": waste_category,
+        "estimated_weight_kg": estimated_weight,
+        "recyclability": scored["recyclability"],
+        "clarity_score": clarity,
+        "distance_meters": distance,
+        "denial_reason": scored["denial_reason"],
+        "credits_earned": credits_earned
+    }
+    return response, make_submission(user, report_doc, stars_earned, credits_earned)
+
+
+def _thumbnail_size(image_hash: str) -> int:
+    """Thumbnail size to make while decoding, 0 if the image is already archived."""
+    archiver = get_image_archiver()
+    if archiver is None or archiver.known(image_hash):
         return 0
-    
-    return int(rating)
+    return archiver.thumbnail_size
+
+
+def _archive_images(images: List[Tuple[str, bytes, Optional[bytes]]]):
+    """Queue uploads for the image archive; re-submissions are dropped cheaply."""
+    archiver = get_image_archiver()
+    if archiver is None:
+        return
+    for image_hash, data, thumbnail in images:
+        archiver.submit(image_hash, data, thumbnail)
+
+
+@router.get("/predict/stats")
+def inference_stats():
+    """Interpreter pool, prediction cache, report write queue, image archive and auth token cache metrics."""
+    return {
+        "pool": get_model_service().stats(),
+        "cache": prediction_cache.stats(),
+        "reports": get_report_writer().stats(),
+        "archive": get_image_archiver().stats() if is_image_archiver_started() else None,
+        "auth": auth_stats(),
+    }
 
 
 @router.post("/predict", response_model=PredictionResponse)
@@ -136,161 +166,309 @@ async def predict_image(
     if not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="File must be an image")
 
-    # Get bin info
-    bin_doc = db.collection("bins").document(bin_id).get()
-    if not bin_doc.exists:
-        raise HTTPException(status_code=404, detail="Selected bin not found")
-
-    bin_data = bin_doc.to_dict()
-    bin_lat = float(bin_data.get("latitude"))
-    bin_lng = float(bin_data.get("longitude"))
-
-    # Compute distance
-    distance = haversine_distance(user_lat, user_lng, bin_lat, bin_lng)
-    allowed_radius = 30.0  # meters
-    if distance > allowed_radius:
-        raise HTTPException(
-            status_code=403, 
-            detail=f"You are not near a bin. You must be within {allowed_radius}m of a registered bin to submit waste. Current distance: {distance:.1f}m"
-        )
+    bin_data = await _lookup_bin(bin_id)
+    distance = _check_distance(bin_data, user_lat, user_lng)
 
     try:
-        data = await file.read()
+        with stage("read_upload"):
+            data = await file.read()
 
-        # Basic clarity metric: variance of grayscale image normalized
-        try:
-            img = Image.open(io.BytesIO(data)).convert('L')
-            arr = np.array(img).astype(np.float32)
-            clarity = float(np.var(arr) / (255.0**2))  # roughly 0-1
-        except Exception:
-            clarity = 0.0
-
-        # Reject very blurry images
-        if clarity < 0.15:
-            return PredictionResponse(
-                label="Unknown",
-                confidence=0.0,
-                all_predictions={},
-                rating=0,
-                message="Image quality too poor. Please take a clearer photo.",
-                denial_reason="Poor image quality (too blurry)",
-                clarity_score=clarity,
-                distance_meters=distance
-            )
-
-        result = model_service.predict(data)
-
-        label = result.get("label", "Unknown")
-        confidence = float(result.get("confidence", 0.0))
-
-        # Categorize waste and estimate weight
-        waste_category, estimated_weight, base_stars, recyclability = categorize_waste(label, confidence)
-
-        # Calculate rating
-        rating = calculate_rating(waste_category, estimated_weight, clarity, confidence, base_stars)
-
-        # Determine if this is valid e-waste
-        is_valid_waste = rating > 0 and waste_category != "unknown"
-
-        message = ""
-        denial_reason = None
-
-        if not is_valid_waste:
-            rating = 0
-            message = "Invalid image. No e-waste detected or confidence too low."
-            denial_reason = "Not valid e-waste"
+        # Retried uploads of the same bytes reuse the earlier decode and inference
+        with stage("cache_lookup"):
+            image_hash = content_hash(data)
+            result = prediction_cache.get(image_hash)
+        duplicate = None
+        prepared = None
+        if result is not None:
+            duplicate = "exact"
+            clarity = result["clarity"]
         else:
-            # Success messages based on rating
-            if rating >= 4:
-                message = f"Excellent! High-value {waste_category} detected. Clear image, good recyclability."
-            elif rating >= 3:
-                message = f"Good submission! {waste_category.capitalize()} detected and accepted."
-            elif rating >= 2:
-                message = f"{waste_category.capitalize()} detected but image could be clearer or item is small."
-            else:
-                message = f"Low-value item detected. Try submitting larger or clearer e-waste."
+            # The first request after a cold start may still be waiting on the model load
+            model_service = await run_in_threadpool(get_model_service)
 
-        # Calculate credits: (rating × 10) + (weight × 5)
-        credits_earned = int((rating * 10) + (estimated_weight * 5)) if is_valid_waste else 0
+            # Decode once for both the clarity check and the model input, off the event loop
+            try:
+                prepared = await run_in_threadpool(model_service.prepare, data, _thumbnail_size(image_hash))
+                clarity = prepared.clarity
+            except Exception:
+                clarity = 0.0
 
-        # Update Firestore user stats
-        stars_earned = rating
-        new_total_stars = 0
-        new_total_credits = 0
-        
-        try:
-            user_ref = db.collection("users").document(user["uid"])
-            user_doc = user_ref.get()
-
-            if user_doc.exists:
-                user_data = user_doc.to_dict()
-                current_stars = user_data.get("totalStars", 0)
-                current_credits = user_data.get("totalCredits", 0)
-                current_tests = user_data.get("testsCompleted", 0)
-
-                new_total_stars = current_stars + stars_earned
-                new_total_credits = current_credits + credits_earned
-
-                user_ref.update({
-                    "totalStars": new_total_stars,
-                    "totalCredits": new_total_credits,
-                    "testsCompleted": current_tests + 1
-                })
+        # Reject very blurry images
+        if clarity < MIN_CLARITY:
+            if duplicate is None:
+                prediction_cache.put(image_hash, {"clarity": clarity})
+            return _blurry_response(clarity, distance)
+
+        if result is None:
+            # Near-identical re-shots skip inference too, and are flagged on the report
+            with stage("cache_lookup"):
+                similar = prediction_cache.find_similar(prepared.phash)
+            if similar is not None and "label" in similar[0]:
+                result = {**similar[0], "clarity": clarity}
+                duplicate = "near"
+                model_service.buffers.release(prepared.input_data)
             else:
-                new_total_stars = stars_earned
-                new_total_credits = credits_earned
-                user_ref.set({
-                    "name": user.get("name", "User"),
-                    "email": user.get("email", ""),
-                    "totalStars": new_total_stars,
-                    "totalCredits": new_total_credits,
-                    "testsCompleted": 1
-                })
+                result = await model_service.infer_async(prepared)
+                result["clarity"] = clarity
+            prediction_cache.put(image_hash, result, prepared.phash)
 
-        except Exception as e:
-            print(f"Firestore update error: {e}")
+        response, submission = _scored_response(user, bin_id, distance, result, clarity, duplicate, image_hash)
 
-        # Record report
-        try:
-            report_doc = {
-                "userId": user.get("uid"),
-                "binId": bin_id,
-                "label": label,
-                "confidence": confidence,
-                "rating": rating,
-                "clarity": clarity,
-                "distance": distance,
-                "waste_category": waste_category,
-                "estimated_weight_kg": estimated_weight,
-                "recyclability": recyclability,
-                "credits_earned": credits_earned
-            }
-            db.collection("reports").add(report_doc)
-        except Exception:
-            pass
-
-        # Build response
-        response = {
-            "label": label,
-            "confidence": confidence,
-            "all_predictions": result.get("all_predictions", {}),
-            "stars_awarded": stars_earned,
-            "new_total_stars": new_total_stars,
-            "rating": rating,
-            "message": message,
-            "waste_type": waste_category,  # Keep for backward compatibility
-            "waste_category": waste_category,
-            "estimated_weight_kg": estimated_weight,
-            "recyclability": recyclability,
-            "clarity_score": clarity,
-            "distance_meters": distance,
-            "denial_reason": denial_reason,
-            "credits_earned": credits_earned
-        }
+        # User stat increments and the report are journaled and queued; the
+        # report writer commits them in bulk batched writes off the request path
+        with stage("report_queue"):
+            await run_in_threadpool(get_report_writer().submit, submission)
+
+        # The upload is kept under its hash for audits; written in the background
+        archiver = get_image_archiver()
+        if archiver is not None and not archiver.known(image_hash):
+            with stage("archive_queue"):
+                thumbnail = prepared.thumbnail if prepared is not None else None
+                await run_in_threadpool(archiver.submit, image_hash, data, thumbnail)
 
         return response
     except HTTPException:
         raise
     except Exception as e:
-        print(e)
+        logger.exception("Prediction failed")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif"}
+
+
+def _too_large(detail: str):
+    return HTTPException(status_code=413, detail=detail)
+
+
+def _zip_members(archive: zipfile.ZipFile, budget: int) -> List[Tuple[str, bytes]]:
+    members = [
+        info for info in archive.infolist()
+        if not info.is_dir() and not info.filename.startswith("__MACOSX/")
+        and os.path.splitext(info.filename)[1].lower() in IMAGE_EXTENSIONS
+    ]
+    if len(members) > config.PREDICT_BATCH_MAX_IMAGES:
+        raise _too_large(f"At most {config.PREDICT_BATCH_MAX_IMAGES} images per batch")
+    # Declared sizes bound what is read (zipfile stops at file_size), so this
+    # also guards against archives that decompress to far more than they claim
+    if sum(info.file_size for info in members) > budget:
+        raise _too_large(f"Images exceed {config.PREDICT_BATCH_MAX_BYTES} bytes")
+    return [(info.filename, archive.read(info)) for info in members]
+
+
+async def _read_batch(files: Optional[List[UploadFile]], archive: Optional[UploadFile]) -> List[Tuple[str, Optional[bytes], Optional[str]]]:
+    """(filename, data, error) for every uploaded image, in upload order."""
+    items = []
+    total = 0
+    for upload in files or []:
+        if len(items) >= config.PREDICT_BATCH_MAX_IMAGES:
+            raise _too_large(f"At most {config.PREDICT_BATCH_MAX_IMAGES} images per batch")
+        if not (upload.content_type or "").startswith("image/"):
+            items.append((upload.filename, None, "File must be an image"))
+            continue
+        data = await upload.read()
+        total += len(data)
+        if total > config.PREDICT_BATCH_MAX_BYTES:
+            raise _too_large(f"Images exceed {config.PREDICT_BATCH_MAX_BYTES} bytes")
+        items.append((upload.filename, data, None))
+
+    if archive is not None:
+        try:
+            with zipfile.ZipFile(archive.file) as zf:
+                members = await run_in_threadpool(_zip_members, zf, config.PREDICT_BATCH_MAX_BYTES - total)
+        except zipfile.BadZipFile:
+            raise HTTPException(status_code=400, detail="archive must be a zip file")
+        if len(items) + len(members) > config.PREDICT_BATCH_MAX_IMAGES:
+            raise _too_large(f"At most {config.PREDICT_BATCH_MAX_IMAGES} images per batch")
+        items.extend((name, data, None) for name, data in members)
+
+    if not items:
+        raise HTTPException(status_code=400, detail="No images uploaded")
+    return items
+
+
+def _commit_batch(submissions: List[Dict[str, Any]]) -> str:
+    """
+    Commit the batch's reports, one increment per user and the aggregates in
+    a single batched write (more only past Firestore's 500-write limit). If
+    the store is unavailable they go to the report queue, which retries.
+    """
+    pending = submissions
+    try:
+        db = get_store()
+        while pending:
+            count = take_batch(pending, MAX_BATCH_WRITES)
+            write_submissions(db, pending[:count])
+            pending = pending[count:]
+        return "committed"
+    except Exception as e:
+        logger.warning("Batch commit of %d report(s) failed, queueing them: %s", len(pending), e)
+        writer = get_report_writer()
+        for submission in pending:
+            writer.submit(submission)
+        return "queued"
+
+
+class _BatchScan:
+    """State of one /api/predict/batch request while its results stream out."""
+
+    def __init__(self, items, user: Dict[str, Any], bin_id: str, distance: float):
+        self.items = items
+        self.user = user
+        self.bin_id = bin_id
+        self.distance = distance
+        self.submissions: List[Dict[str, Any]] = []
+        self.totals = {"images": len(items), "accepted": 0, "rejected": 0, "errors": 0,
+                       "stars_awarded": 0, "credits_earned": 0, "estimated_weight_kg": 0.0}
+        # Later uploads with the same bytes as an earlier one: content hash -> indexes
+        self.copies: Dict[str, List[int]] = {}
+        # Images that produced a report, for the image archive
+        self.to_archive: Dict[str, Tuple[bytes, Optional[bytes]]] = {}
+
+    def _line(self, index: int, body: Dict[str, Any]) -> bytes:
+        if "error" in body:
+            self.totals["errors"] += 1
+        elif body["rating"] > 0:
+            self.totals["accepted"] += 1
+            self.totals["stars_awarded"] += body["stars_awarded"]
+            self.totals["credits_earned"] += body["credits_earned"]
+            self.totals["estimated_weight_kg"] += body["estimated_weight_kg"]
+        else:
+            self.totals["rejected"] += 1
+        return (json.dumps({"index": index, "filename": self.items[index][0], **body}) + "\n").encode()
+
+    def _scored(self, index: int, image_hash: str, result: Dict[str, Any], clarity: float,
+                duplicate: Optional[str], thumbnail: Optional[bytes] = None) -> List[bytes]:
+        lines = []
+        for i, dup in [(index, duplicate)] + [(i, "exact") for i in self.copies.get(image_hash, [])]:
+            if clarity < MIN_CLARITY:
+                lines.append(self._line(i, _blurry_response(clarity, self.distance).model_dump()))
+                continue
+            response, submission = _scored_response(self.user, self.bin_id, self.distance, result, clarity, dup, image_hash)
+            self.submissions.append(submission)
+            self.to_archive.setdefault(image_hash, (self.items[index][1], thumbnail))
+            lines.append(self._line(i, response))
+        return lines
+
+    async def _decode(self, model_service, index: int, image_hash: str, data: bytes):
+        try:
+            return index, await run_in_threadpool(model_service.prepare, data, _thumbnail_size(image_hash))
+        except Exception:
+            return index, None
+
+    async def _infer(self, model_service, chunk):
+        try:
+            results = await model_service.infer_batch_async([prepared for _, _, prepared in chunk])
+        except Exception as e:
+            logger.exception("Batch inference of %d image(s) failed", len(chunk))
+            return [self._line(i, {"error": str(e)})
+                    for index, image_hash, _ in chunk for i in [index] + self.copies.get(image_hash, [])]
+        lines = []
+        for (index, image_hash, prepared), result in zip(chunk, results):
+            result["clarity"] = prepared.clarity
+            prediction_cache.put(image_hash, result, prepared.phash)
+            lines.extend(self._scored(index, image_hash, result, prepared.clarity, None, prepared.thumbnail))
+        return lines
+
+    async def run(self):
+        # Every copy within the upload is known before any result goes out,
+        # since _scored() answers an image's copies along with it
+        hashes = {}
+        for index, (_, data, error) in enumerate(self.items):
+            if error is not None:
+                yield self._line(index, {"error": error})
+                continue
+            with stage("cache_lookup"):
+                image_hash = content_hash(data)
+            if image_hash in hashes:
+                self.copies.setdefault(image_hash, []).append(index)
+            else:
+                hashes[image_hash] = index
+
+        # Exact repeats of earlier scans skip decoding
+        misses = []
+        for image_hash, index in hashes.items():
+            with stage("cache_lookup"):
+                result = prediction_cache.get(image_hash)
+            if result is not None:
+                for line in self._scored(index, image_hash, result, result["clarity"], "exact"):
+                    yield line
+            else:
+                misses.append(index)
+
+        # Decode in parallel; every full chunk of decoded images goes to the
+        # interpreters as one stacked batch while the rest are still decoding
+        tasks = []
+        try:
+            if misses:
+                model_service = await run_in_threadpool(get_model_service)
+                index_hash = {i: h for h, i in hashes.items()}
+                decodes = [asyncio.ensure_future(self._decode(model_service, i, index_hash[i], self.items[i][1])) for i in misses]
+                tasks.extend(decodes)
+                chunk, inferences = [], []
+                for done in asyncio.as_completed(decodes):
+                    index, prepared = await done
+                    image_hash = index_hash[index]
+                    if prepared is None or prepared.clarity < MIN_CLARITY:
+                        clarity = prepared.clarity if prepared is not None else 0.0
+                        if prepared is not None:
+                            model_service.buffers.release(prepared.input_data)
+                        prediction_cache.put(image_hash, {"clarity": clarity})
+                        for line in self._scored(index, image_hash, {}, clarity, None):
+                            yield line
+                        continue
+                    with stage("cache_lookup"):
+                        similar = prediction_cache.find_similar(prepared.phash)
+                    if similar is not None and "label" in similar[0]:
+                        model_service.buffers.release(prepared.input_data)
+                        result = {**similar[0], "clarity": prepared.clarity}
+                        prediction_cache.put(image_hash, result, prepared.phash)
+                        for line in self._scored(index, image_hash, result, prepared.clarity, "near", prepared.thumbnail):
+                            yield line
+                        continue
+                    chunk.append((index, image_hash, prepared))
+                    if len(chunk) >= max(1, config.PREDICT_BATCH_CHUNK_SIZE):
+                        inferences.append(asyncio.ensure_future(self._infer(model_service, chunk)))
+                        chunk = []
+                if chunk:
+                    inferences.append(asyncio.ensure_future(self._infer(model_service, chunk)))
+                tasks.extend(inferences)
+                for done in asyncio.as_completed(inferences):
+                    for line in await done:
+                        yield line
+        finally:
+            # The client went away (or a chunk failed): stop what is still queued
+            for task in tasks:
+                task.cancel()
+
+        stored = None
+        if self.submissions:
+            with stage("report_commit"):
+                stored = await run_in_threadpool(_commit_batch, self.submissions)
+            with stage("archive_queue"):
+                await run_in_threadpool(_archive_images, [(h, d, t) for h, (d, t) in self.to_archive.items()])
+        self.totals["estimated_weight_kg"] = round(self.totals["estimated_weight_kg"], 3)
+        yield (json.dumps({"summary": {**self.totals, "distance_meters": self.distance, "stored": stored}}) + "\n").encode()
+
+
+@router.post("/predict/batch")
+async def predict_batch(
+    files: Optional[List[UploadFile]] = File(None),
+    archive: Optional[UploadFile] = File(None),
+    bin_id: str = Form(...),
+    user_lat: float = Form(...),
+    user_lng: float = Form(...),
+    user: Dict[str, Any] = Depends(verify_token)
+):
+    """
+    Scan many items for one bin at once (bulk drop-offs). Images come as
+    repeated ``files`` parts and/or a zip ``archive``. Each image's result is
+    streamed as an NDJSON line (with its ``index`` in the upload and
+    ``filename``) as soon as it is scored; the last line is a ``summary``,
+    sent once every report and the user's totals have been written.
+    """
+    bin_data = await _lookup_bin(bin_id)
+    distance = _check_distance(bin_data, user_lat, user_lng)
+    with stage("read_upload"):
+        items = await _read_batch(files, archive)
+    return StreamingResponse(_BatchScan(items, user, bin_id, distance).run(), media_type="application/x-ndjson")
@@ -0,0 +1,96 @@
+"""Build quantized and ONNX variants of the classifier.
+
+The shipped model_unquant.tflite cannot be re-quantized by the TFLite
+converter, so float16/int8 variants are produced from the source Keras model
+(the Teachable Machine keras_model.h5 export, or a SavedModel directory):
+
+    python -m scripts.convert_model --keras keras_model.h5 --calibration ./samples
+
+writes converted_tflite/model_float16.tflite and model_int8.tflite. The int8
+model is fully integer-quantized, calibrated on up to --calibration-limit images
+from the given folder. With --onnx, every model_<variant>.tflite present is also
+converted to model_<variant>.onnx for the onnxruntime backend (needs tf2onnx).
+"""
+import argparse
+import glob
+import os
+
+from services.image_pipeline import prepare_image
+from services.model_service import MODEL_DIR
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+
+def list_images(folder: str, limit: int):
+    paths = sorted(p for p in glob.glob(os.path.join(folder, "**", "*"), recursive=True) if p.lower().endswith(IMAGE_EXTENSIONS))
+    return paths[:limit]
+
+
+def load_converter(tf, source: str):
+    if os.path.isdir(source):
+        return tf.lite.TFLiteConverter.from_saved_model(source)
+    model = tf.keras.models.load_model(source, compile=False)
+    return tf.lite.TFLiteConverter.from_keras_model(model)
+
+
+def convert_float16(tf, source: str) -> bytes:
+    converter = load_converter(tf, source)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.target_spec.supported_types = [tf.float16]
+    return converter.convert()
+
+
+def convert_int8(tf, source: str, calibration_images, size):
+    def representative_dataset():
+        for path in calibration_images:
+            with open(path, "rb") as f:
+                yield [prepare_image(f.read(), size, size).input_data]
+
+    converter = load_converter(tf, source)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.int8
+    converter.inference_output_type = tf.int8
+    return converter.convert()
+
+
+def convert_onnx():
+    import tf2onnx
+
+    for tflite_path in sorted(glob.glob(os.path.join(MODEL_DIR, "model_*.tflite"))):
+        onnx_path = tflite_path[:-len(".tflite")] + ".onnx"
+        tf2onnx.convert.from_tflite(tflite_path, output_path=onnx_path)
+        print(f"Wrote {onnx_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keras", help="Source Keras .h5/.keras file or SavedModel directory")
+    parser.add_argument("--calibration", help="Folder of representative images for int8 calibration")
+    parser.add_argument("--calibration-limit", type=int, default=200)
+    parser.add_argument("--size", type=int, default=224, help="Model input height/width")
+    parser.add_argument("--onnx", action="store_true", help="Also export every TFLite variant to ONNX")
+    args = parser.parse_args()
+
+    if args.keras:
+        import tensorflow as tf
+
+        outputs = {"float16": convert_float16(tf, args.keras)}
+        if args.calibration:
+            outputs["int8"] = convert_int8(tf, args.keras, list_images(args.calibration, args.calibration_limit), args.size)
+        else:
+            print("No --calibration folder given, skipping the int8 variant")
+
+        for variant, model in outputs.items():
+            path = os.path.join(MODEL_DIR, f"model_{variant}.tflite")
+            with open(path, "wb") as f:
+                f.write(model)
+            print(f"Wrote {path} ({len(model) / 1e6:.1f} MB)")
+
+    if args.onnx:
+        convert_onnx()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Import-time profile of the API, for tracking cold-start regressions.
+
+Runs ``python -X importtime -c "import main"`` in a fresh interpreter, parses
+the per-module timings and prints the total plus the slowest modules by
+cumulative and self time. With --json the full report is written to a file so
+it can be diffed between commits; --budget-ms exits non-zero when the total
+import time exceeds the budget.
+
+Run from backend/:
+    python -m scripts.profile_imports --top 20 --json import_profile.json --budget-ms 1500
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def profile(module: str):
+    env = dict(os.environ, WARMUP_ON_STARTUP="0")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    modules = []
+    for line in proc.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append({
+                "module": name,
+                "self_ms": int(self_us) / 1000.0,
+                "cumulative_ms": int(cumulative_us) / 1000.0,
+                "depth": (len(indent) - 1) // 2,
+            })
+    total_ms = sum(m["cumulative_ms"] for m in modules if m["depth"] == 0)
+    return total_ms, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", help="Write the full report to this file")
+    parser.add_argument("--budget-ms", type=float, help="Fail if total import time exceeds this")
+    args = parser.parse_args()
+
+    total_ms, modules = profile(args.module)
+
+    print(f"import {args.module}: {total_ms:.1f} ms total, {len(modules)} modules\n")
+    print(f"{'cumulative ms':>14}{'self ms':>10}  module")
+    for m in sorted(modules, key=lambda m: m["cumulative_ms"], reverse=True)[:args.top]:
+        print(f"{m['cumulative_ms']:>14.1f}{m['self_ms']:>10.1f}  {m['module']}")
+    print(f"\n{'self ms':>14}  module")
+    for m in sorted(modules, key=lambda m: m["self_ms"], reverse=True)[:args.top]:
+        print(f"{m['self_ms']:>14.1f}  {m['module']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"module": args.module, "total_ms": total_ms, "modules": modules}, f, indent=2)
+
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        raise SystemExit(f"Import time {total_ms:.1f} ms exceeds budget of {args.budget_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
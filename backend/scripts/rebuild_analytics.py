@@ -0,0 +1,93 @@
+"""Recompute the analytics aggregates from the raw reports collection.
+
+Streams every report once, sums its deltas in memory with the same
+analytics_engine functions the report writer uses, and overwrites the global,
+per-day and per-bin aggregate documents, each user's ``analytics`` map and
+their daily, weekly and monthly history buckets.
+Reports without a createdAt are counted under the day the rebuild runs.
+With --clear, aggregate and bucket documents that no report maps to any
+more are deleted.
+
+Submissions flushed while a rebuild runs may be counted twice or not at all;
+run it with the API stopped (or its report queue drained) for exact totals.
+
+Run from backend/:
+    python -m scripts.rebuild_analytics --clear
+"""
+import argparse
+import time
+from datetime import datetime, timezone
+
+from services.analytics_engine import BINS_COLLECTION, DAILY_COLLECTION, GLOBAL_DOC, USER_BUCKETS, USER_FIELD, combine_deltas
+from services.submissions import MAX_BATCH_WRITES
+
+
+def stream_reports(db, page_size: int):
+    now = datetime.now(timezone.utc)
+    seen = 0
+    for doc in db.collection("reports").stream():
+        report = doc.to_dict()
+        seen += 1
+        if seen % page_size == 0:
+            print(f"  read {seen} reports")
+        yield report, report.get("createdAt") or now
+
+
+def write_aggregates(db, aggregates, clear: bool):
+    batch, pending = db.batch(), 0
+
+    def add(op):
+        nonlocal batch, pending
+        op(batch)
+        pending += 1
+        if pending == MAX_BATCH_WRITES:
+            batch.commit()
+            batch, pending = db.batch(), 0
+
+    for (collection, doc_id), fields in aggregates.items():
+        ref = db.collection(collection).document(doc_id)
+        if collection == "users":
+            # Replace only the aggregate map; profile and totals stay as they are
+            add(lambda b: b.set(ref, fields, merge=[USER_FIELD]))
+        else:
+            add(lambda b: b.set(ref, fields))
+
+    if clear:
+        for collection in (DAILY_COLLECTION, BINS_COLLECTION):
+            for doc in db.collection(collection).select([]).stream():
+                if (collection, doc.id) not in aggregates:
+                    add(lambda b: b.delete(doc.reference))
+        for collection in USER_BUCKETS.values():
+            for doc in db.collection_group(collection).select([]).stream():
+                if (doc.reference.parent.path, doc.id) not in aggregates:
+                    add(lambda b: b.delete(doc.reference))
+
+    if pending:
+        batch.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clear", action="store_true", help="Delete aggregate docs no report maps to")
+    parser.add_argument("--dry-run", action="store_true", help="Compute and print the global totals without writing")
+    parser.add_argument("--progress-every", type=int, default=10000)
+    args = parser.parse_args()
+
+    from services.storage import get_store
+    db = get_store()
+
+    start = time.perf_counter()
+    aggregates = combine_deltas(stream_reports(db, args.progress_every))
+    totals = aggregates.get(GLOBAL_DOC, {})
+    print(f"Aggregated {totals.get('total_tests', 0)} reports into {len(aggregates)} documents "
+          f"in {time.perf_counter() - start:.1f}s")
+    print({k: v for k, v in totals.items() if not isinstance(v, dict)})
+
+    if args.dry_run:
+        return
+    write_aggregates(db, aggregates, args.clear)
+    print(f"Wrote aggregates in {time.perf_counter() - start:.1f}s total")
+
+
+if __name__ == "__main__":
+    main()
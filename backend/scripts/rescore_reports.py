@@ -0,0 +1,339 @@
+"""Re-score historical reports with a new model or new scoring rules.
+
+Streams the reports collection in document-id order and looks up each
+report's image by its ``imageHash`` in --images (content-addressed layout:
+<images>/<hash[:2]>/<hash>). Pages of reports are sharded across a pool of
+worker processes, each with its own ModelService interpreter, which decode,
+classify and score their shard in stacked batches with the same
+services.scoring rules the API uses.
+
+Every report whose label, category, rating or credits would change is written
+to --out as one NDJSON diff line ({"reportId", "userId", "before", "after"}),
+after a header line naming the run. Nothing in the store changes until the
+diff file is applied:
+
+    python -m scripts.rescore_reports --images ./image_archive --model new_model.tflite --out rescore.ndjson
+    python -m scripts.rescore_reports --apply rescore.ndjson
+    python -m scripts.rebuild_analytics --clear
+
+Progress is checkpointed next to --out after every shard that completes in
+order; --resume continues an interrupted run from there. --apply updates the
+reports and increments each user's star and credit totals by the difference.
+It marks reports with the run id, so applying the same file twice is a no-op,
+and skips (as conflicts) reports that no longer match the diff's before values.
+Reports without an imageHash (scored before images were recorded) or whose
+image is missing are counted and skipped.
+
+Run from backend/.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timezone
+
+import numpy as np
+
+import config
+from services.scoring import MIN_CLARITY, score_prediction
+
+REPORT_FIELDS = ["userId", "binId", "imageHash", "label", "confidence", "waste_category",
+                 "rating", "credits_earned", "estimated_weight_kg"]
+# A report is listed in the diff when any of these change
+COMPARED = ("label", "waste_category", "rating", "credits_earned")
+
+
+def image_path(images_dir: str, image_hash: str) -> str:
+    return os.path.join(images_dir, image_hash[:2], image_hash)
+
+
+def stream_reports(db, page_size: int, after: str = None):
+    """Pages of (report id, selected fields), ordered by document id, after ``after``."""
+    last = {"__name__": after} if after else None
+    while True:
+        query = db.collection("reports").order_by("__name__").select(REPORT_FIELDS).limit(page_size)
+        if last is not None:
+            query = query.start_after(last)
+        docs = list(query.stream())
+        if docs:
+            yield [(doc.id, doc.to_dict()) for doc in docs]
+        if len(docs) < page_size:
+            return
+        last = docs[-1]
+
+
+# Worker processes
+
+_model = None
+
+
+def _init_worker(model_path, labels_path, backend, threads, batch_size):
+    global _model
+    from services.model_service import ModelService
+
+    _model = ModelService(model_path, labels_path, pool_size=1, num_threads=threads, max_batch_size=batch_size,
+                          max_wait_ms=0, draft_size=config.DECODE_DRAFT_SIZE, backend=backend)
+
+
+def _blurry(clarity):
+    return {"label": "Unknown", "confidence": 0.0, "clarity": clarity, "waste_category": "unknown",
+            "rating": 0, "credits_earned": 0, "estimated_weight_kg": 0.0, "recyclability": "unknown"}
+
+
+def _scored(result, clarity):
+    scored = score_prediction(result["label"], result["confidence"], clarity)
+    return {"label": result["label"], "confidence": result["confidence"], "clarity": clarity,
+            **{k: scored[k] for k in ("waste_category", "rating", "credits_earned", "estimated_weight_kg", "recyclability")}}
+
+
+def rescore_shard(images_dir, reports, batch_size):
+    """Score one shard: a list of (id, report). Returns (per-report outcomes, CPU seconds)."""
+    cpu = time.process_time()
+    outcomes = []
+    for start in range(0, len(reports), batch_size):
+        pending = []
+        for report_id, report in reports[start:start + batch_size]:
+            image_hash = report.get("imageHash")
+            if not image_hash:
+                outcomes.append((report_id, "no_image", None))
+                continue
+            try:
+                with open(image_path(images_dir, image_hash), "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                outcomes.append((report_id, "missing", None))
+                continue
+            try:
+                prepared = _model.prepare(data)
+            except Exception:
+                outcomes.append((report_id, "unreadable", None))
+                continue
+            if prepared.clarity < MIN_CLARITY:
+                _model.buffers.release(prepared.input_data)
+                outcomes.append((report_id, "ok", _blurry(prepared.clarity)))
+                continue
+            pending.append((report_id, prepared))
+        if pending:
+            input_data = np.concatenate([p.input_data for _, p in pending], axis=0)
+            for _, p in pending:
+                _model.buffers.release(p.input_data)
+            for (report_id, prepared), probs in zip(pending, _model.run_batch(input_data)):
+                outcomes.append((report_id, "ok", _scored(_model.postprocess(probs), prepared.clarity)))
+    return outcomes, time.process_time() - cpu
+
+
+# Run bookkeeping
+
+class Checkpoint:
+    """Last report id written to the diff file, its size then, and the running totals."""
+
+    def __init__(self, path):
+        self.path = path
+        self.state = {"run": None, "last_report_id": None, "diff_bytes": 0, "elapsed": 0.0, "cpu": 0.0,
+                      "counts": {}, "changed": 0, "categories": {}, "transitions": {}}
+
+    def load(self):
+        with open(self.path) as f:
+            self.state = json.load(f)
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+def _category_totals(checkpoint):
+    return defaultdict(lambda: {"reports": 0, "changed": 0, "rating_delta": 0, "credits_delta": 0},
+                       checkpoint.state["categories"])
+
+
+def record(checkpoint, diff_file, run, shard, outcomes, cpu):
+    """Write a shard's diffs and fold its outcomes into the totals."""
+    reports = dict(shard)
+    counts = Counter(checkpoint.state["counts"])
+    categories = _category_totals(checkpoint)
+    transitions = Counter(checkpoint.state["transitions"])
+    for report_id, status, after in outcomes:
+        counts[status] += 1
+        if status != "ok":
+            continue
+        report = reports[report_id]
+        before = {k: report.get(k) for k in ("label", "confidence", "waste_category", "rating", "credits_earned", "estimated_weight_kg")}
+        category = categories[before["waste_category"] or "unknown"]
+        category["reports"] += 1
+        if all(before[k] == after[k] for k in COMPARED):
+            continue
+        checkpoint.state["changed"] += 1
+        category["changed"] += 1
+        category["rating_delta"] += after["rating"] - (before["rating"] or 0)
+        category["credits_delta"] += after["credits_earned"] - (before["credits_earned"] or 0)
+        transitions[f"{before['waste_category']} -> {after['waste_category']}"] += 1
+        diff_file.write(json.dumps({"run": run, "reportId": report_id, "userId": report.get("userId"),
+                                    "binId": report.get("binId"), "before": before, "after": after}) + "\n")
+    diff_file.flush()
+    os.fsync(diff_file.fileno())
+    checkpoint.state.update(last_report_id=shard[-1][0], diff_bytes=diff_file.tell(), counts=dict(counts),
+                            categories=dict(categories), transitions=dict(transitions))
+    checkpoint.state["cpu"] += cpu
+    checkpoint.save()
+
+
+def print_summary(state):
+    counts = state["counts"]
+    scored = counts.get("ok", 0)
+    elapsed = state["elapsed"] or 1e-9
+    print(f"\n{sum(counts.values())} reports: {scored} re-scored, {state['changed']} changed, "
+          f"{counts.get('no_image', 0)} without an image hash, {counts.get('missing', 0)} images missing, "
+          f"{counts.get('unreadable', 0)} unreadable")
+    # Per core: images per CPU second the workers spent on shards (all their
+    # threads), so start-up, model loading and oversubscribed cores are left out
+    print(f"{scored / elapsed:.1f} images/s over {elapsed:.1f}s including worker start-up; "
+          f"{scored / state['cpu'] if state['cpu'] else 0:.1f} images/s per core")
+    print(f"\n{'category':<12}{'reports':>9}{'changed':>9}{'stars +/-':>11}{'credits +/-':>13}")
+    for name, c in sorted(state["categories"].items(), key=lambda kv: -kv[1]["reports"]):
+        print(f"{name:<12}{c['reports']:>9}{c['changed']:>9}{c['rating_delta']:>11}{c['credits_delta']:>13}")
+    if state["transitions"]:
+        print("\nCategory changes:")
+        for transition, n in Counter(state["transitions"]).most_common():
+            print(f"  {transition:<28}{n:>8}")
+
+
+def rescore(args):
+    from services.model_service import LABELS_PATH, MODEL_PATH
+    from services.storage import get_store
+
+    checkpoint = Checkpoint(args.out + ".checkpoint.json")
+    if args.resume:
+        checkpoint.load()
+        with open(args.out, "r+") as f:
+            # Drop diffs written after the last checkpoint; their shards run again
+            f.truncate(checkpoint.state["diff_bytes"])
+        print(f"Resuming run {checkpoint.state['run']} after report {checkpoint.state['last_report_id']}")
+    elif os.path.exists(checkpoint.path):
+        raise SystemExit(f"{checkpoint.path} exists; pass --resume to continue that run, or remove it")
+    else:
+        checkpoint.state["run"] = datetime.now(timezone.utc).strftime("rescore-%Y%m%dT%H%M%SZ")
+        with open(args.out, "w") as f:
+            f.write(json.dumps({"run": checkpoint.state["run"], "model": args.model or MODEL_PATH,
+                                "labels": args.labels or LABELS_PATH}) + "\n")
+            checkpoint.state["diff_bytes"] = f.tell()
+        checkpoint.save()
+    run = checkpoint.state["run"]
+
+    db = get_store()
+    ctx = multiprocessing.get_context("spawn")
+    initargs = (args.model or MODEL_PATH, args.labels or LABELS_PATH, args.backend, args.threads, args.batch_size)
+    start = time.perf_counter() - checkpoint.state["elapsed"]
+    with open(args.out, "a") as diff_file, \
+            ProcessPoolExecutor(args.workers, mp_context=ctx, initializer=_init_worker, initargs=initargs) as pool:
+        # Shards finish out of order but are recorded in order, so the
+        # checkpoint is always a prefix of the reports collection
+        inflight, done, next_seq, seq = {}, {}, 0, 0
+        pages = stream_reports(db, args.shard_size, checkpoint.state["last_report_id"])
+        limit = args.limit
+        while True:
+            while len(inflight) < 2 * args.workers:
+                page = next(pages, None)
+                if page is None or (limit is not None and limit <= 0):
+                    break
+                if limit is not None:
+                    page, limit = page[:limit], limit - len(page)
+                inflight[pool.submit(rescore_shard, args.images, page, args.batch_size)] = (seq, page)
+                seq += 1
+            if not inflight:
+                break
+            finished, _ = wait(inflight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                s, page = inflight.pop(future)
+                done[s] = (page, *future.result())
+            while next_seq in done:
+                page, outcomes, cpu = done.pop(next_seq)
+                checkpoint.state["elapsed"] = time.perf_counter() - start
+                record(checkpoint, diff_file, run, page, outcomes, cpu)
+                next_seq += 1
+                print(f"  {sum(checkpoint.state['counts'].values())} reports, {checkpoint.state['changed']} changed")
+    print_summary(checkpoint.state)
+    print(f"\nDiffs in {args.out}; review them, then apply with --apply {args.out}")
+
+
+# Applying a diff file
+
+def apply(path, chunk_size):
+    from services.storage import get_store, increment
+
+    db = get_store()
+    applied = skipped = conflicts = 0
+    with open(path) as f:
+        lines = [json.loads(line) for line in f]
+    if not lines:
+        raise SystemExit(f"{path} is empty")
+    run = lines[0]["run"]
+    diffs = [d for d in lines[1:] if d.get("run") == run]
+    # Each chunk is one batched write: its reports plus one increment per user
+    for start in range(0, len(diffs), chunk_size):
+        chunk = diffs[start:start + chunk_size]
+        refs = [db.collection("reports").document(diff["reportId"]) for diff in chunk]
+        # One round trip per chunk; get_all() doesn't keep the order of refs
+        found = {doc.id: doc.to_dict() for doc in db.get_all(refs) if doc.exists}
+        batch = db.batch()
+        totals = defaultdict(lambda: [0, 0])
+        for ref, diff in zip(refs, chunk):
+            current = found.get(diff["reportId"])
+            if current is None or (current.get("rescore") or {}).get("run") == run:
+                skipped += 1
+                continue
+            before, after = diff["before"], diff["after"]
+            if any(current.get(k) != v for k, v in before.items()):
+                # Changed since the diff was computed (another run applied, or
+                # an edit); its deltas would be against the wrong values
+                print(f"  conflict: report {diff['reportId']} no longer matches the diff's before values, skipped")
+                conflicts += 1
+                continue
+            batch.set(ref, {**after, "rescore": {"run": run, "previous": before}}, merge=True)
+            if diff.get("userId"):
+                totals[diff["userId"]][0] += after["rating"] - (before["rating"] or 0)
+                totals[diff["userId"]][1] += after["credits_earned"] - (before["credits_earned"] or 0)
+            applied += 1
+        for uid, (stars, credits) in totals.items():
+            batch.set(db.collection("users").document(uid),
+                      {"totalStars": increment(stars), "totalCredits": increment(credits)}, merge=True)
+        batch.commit()
+    print(f"Applied {applied} diffs from run {run} ({skipped} already applied or gone, "
+          f"{conflicts} changed since the run and skipped)")
+    if conflicts:
+        print("Re-run the rescore to compute fresh diffs for the conflicting reports")
+    print("Run python -m scripts.rebuild_analytics --clear to bring the analytics aggregates up to date")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="Image archive directory (<dir>/<hash[:2]>/<hash>)")
+    parser.add_argument("--out", default="rescore.ndjson", help="Diff file (the checkpoint goes next to it)")
+    parser.add_argument("--resume", action="store_true", help="Continue the run checkpointed next to --out")
+    parser.add_argument("--model", help="Model to score with (default: the configured MODEL_PATH)")
+    parser.add_argument("--labels", help="Labels file for --model (default: converted_tflite/labels.txt)")
+    parser.add_argument("--backend", default=config.MODEL_BACKEND)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--threads", type=int, default=1, help="Interpreter threads per worker")
+    parser.add_argument("--batch-size", type=int, default=16, help="Images per interpreter invoke")
+    parser.add_argument("--shard-size", type=int, default=256, help="Reports per worker task")
+    parser.add_argument("--limit", type=int, help="Stop after this many reports")
+    parser.add_argument("--apply", metavar="DIFFS", help="Write a diff file's changes to the store instead")
+    args = parser.parse_args()
+
+    if args.apply:
+        apply(args.apply, chunk_size=200)
+    elif not args.images:
+        parser.error("--images is required (or --apply)")
+    else:
+        rescore(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Production server: several uvicorn worker processes forked from one
+preloaded master.
+
+The master imports the app and the inference runtime and maps the model
+file before forking, so workers share those pages copy-on-write instead of
+each importing TensorFlow (about 600 MB) on its own. Workers accept
+connections on the socket the master opened. Each one loads its own
+interpreters in its lifespan, and their threads must never exist in the
+master before the fork. A worker that exits is restarted with the same
+index.
+
+    python server.py                      # one worker per available core
+    python server.py --workers 4 --port 8080
+
+By default there is one worker per available core (CPU affinity and
+container quota; SERVER_WORKERS overrides it). The cores are divided
+between the workers through INFERENCE_CPUS, which sizes each worker's
+interpreter pool and threads (see config.py). Worker 0 uses
+REPORT_JOURNAL_PATH, and worker i uses REPORT_JOURNAL_PATH.i. Metrics at
+/metrics are per worker.
+
+Run from backend/. For development, use `uvicorn main:app --reload`.
+"""
+import argparse
+import glob
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+from utils.cpus import available_cpus
+
+logger = logging.getLogger("server")
+
+# A worker that dies sooner than this after starting is restarted after a pause
+MIN_WORKER_UPTIME_SECONDS = 5.0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("SERVER_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVER_WORKERS", 0)),
+                        help="Worker processes (default: one per available core)")
+    parser.add_argument("--backlog", type=int, default=2048, help="Listen backlog of the shared socket")
+    parser.add_argument("--graceful-timeout", type=float, default=30.0,
+                        help="Seconds workers get to finish on shutdown before they are killed")
+    parser.add_argument("--access-log", action="store_true", help="Log every request (uvicorn access log)")
+    return parser.parse_args()
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock: socket.socket, index: int, access_log: bool, graceful_timeout: float):
+    import uvicorn
+
+    import config
+
+    # The master's handlers forward signals to workers; uvicorn installs its own
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    # Each worker replays and appends to its own journal
+    if config.REPORT_JOURNAL_PATH and index:
+        config.REPORT_JOURNAL_PATH = f"{config.REPORT_JOURNAL_PATH}.{index}"
+    if config.REPORT_DEAD_LETTER_PATH and index:
+        config.REPORT_DEAD_LETTER_PATH = f"{config.REPORT_DEAD_LETTER_PATH}.{index}"
+
+    server = uvicorn.Server(uvicorn.Config(
+        app, lifespan="on", log_config=None, access_log=access_log,
+        timeout_graceful_shutdown=graceful_timeout,
+    ))
+    server.run(sockets=[sock])
+
+
+class Master:
+    def __init__(self, app, sock: socket.socket, workers: int, access_log: bool, graceful_timeout: float):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.access_log = access_log
+        self.graceful_timeout = graceful_timeout
+        self.children = {}  # pid -> (index, start time)
+        self.stopping = False
+        self.kill_at = None
+
+    def spawn(self, index: int):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(self.app, self.sock, index, self.access_log, self.graceful_timeout)
+            except BaseException:
+                logger.exception("Worker %d failed", index)
+                code = 1
+            finally:
+                logging.shutdown()
+                os._exit(code)
+        self.children[pid] = (index, time.monotonic())
+        logger.info("Started worker %d (pid %d)", index, pid)
+
+    def stop(self, signum=None, frame=None):
+        if self.stopping:
+            # A second Ctrl-C or SIGTERM: don't wait for in-flight requests
+            self._signal_children(signal.SIGKILL)
+            return
+        logger.info("Shutting down %d worker(s)", len(self.children))
+        self.stopping = True
+        self.kill_at = time.monotonic() + self.graceful_timeout + 5
+        self._signal_children(signal.SIGTERM)
+
+    def _signal_children(self, signum):
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for index in range(self.workers):
+            self.spawn(index)
+
+        # Polling keeps the master single-threaded and lets it enforce the kill deadline
+        while self.children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                if self.stopping and time.monotonic() > self.kill_at:
+                    logger.warning("Workers did not stop in time, killing them")
+                    self._signal_children(signal.SIGKILL)
+                    self.kill_at = float("inf")
+                time.sleep(0.2)
+                continue
+            index, started = self.children.pop(pid)
+            if self.stopping:
+                continue
+            logger.warning("Worker %d (pid %d) exited with status %d, restarting", index, pid, os.waitstatus_to_exitcode(status))
+            if time.monotonic() - started < MIN_WORKER_UPTIME_SECONDS:
+                time.sleep(1.0)
+            if not self.stopping:
+                self.spawn(index)
+        logger.info("All workers stopped")
+
+
+def main():
+    args = parse_args()
+
+    # Settled before config is imported: it sizes each worker's interpreter
+    # pool and threads from INFERENCE_CPUS
+    cpus = available_cpus()
+    workers = max(1, args.workers or cpus)
+    os.environ.setdefault("INFERENCE_CPUS", str(max(1, cpus // workers)))
+
+    import config
+    import main as app_module
+    from services.model_service import MODEL_PATH, preload_model
+
+    start = time.perf_counter()
+    model_mapping = preload_model()
+    logger.info("Preloaded the app and %s in %.1fs; starting %d worker(s) on %s:%d with %s core(s) each",
+                os.path.basename(MODEL_PATH), time.perf_counter() - start, workers, args.host, args.port,
+                os.environ["INFERENCE_CPUS"])
+    if threading.active_count() > 1:
+        logger.warning("Threads running in the master before fork: %s", [t.name for t in threading.enumerate()])
+
+    if config.STORAGE_BACKEND != "firestore" and workers > 1:
+        logger.warning("STORAGE_BACKEND=%s keeps a separate copy of the data in each worker; use firestore "
+                       "with more than one worker", config.STORAGE_BACKEND)
+    if config.REPORT_JOURNAL_PATH:
+        for path in glob.glob(f"{glob.escape(config.REPORT_JOURNAL_PATH)}.*"):
+            suffix = path[len(config.REPORT_JOURNAL_PATH) + 1:]
+            if suffix.isdigit() and int(suffix) >= workers and os.path.getsize(path):
+                logger.warning("%s was left by a worker this launch doesn't run; start %d or more workers to replay it",
+                               path, int(suffix) + 1)
+
+    sock = bind_socket(args.host, args.port, args.backlog)
+    Master(app_module.app, sock, workers, args.access_log, args.graceful_timeout).run()
+    sock.close()
+    model_mapping.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Tuple
+from zoneinfo import ZoneInfo
+
+import config
+from services.storage import increment
+
+# Aggregate documents maintained alongside the reports collection
+GLOBAL_DOC = ("analytics", "global")
+BINS_COLLECTION = "analytics_bins"
+DAILY_COLLECTION = "analytics_daily"
+# Per-user aggregates live in a map field on users/{uid}, next to the totals
+USER_FIELD = "analytics"
+# Per-user time buckets for charts: users/{uid}/<collection>/<bucket id>
+USER_BUCKETS = {"day": "history_daily", "week": "history_weekly", "month": "history_monthly"}
+
+DocPath = Tuple[str, str]
+
+_tz = ZoneInfo(config.ANALYTICS_TIMEZONE)
+
+
+def local_date(created_at: datetime) -> date:
+    """Calendar day (in ANALYTICS_TIMEZONE) a report is rolled up under."""
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return created_at.astimezone(_tz).date()
+
+
+def report_day(created_at: datetime) -> str:
+    return local_date(created_at).isoformat()
+
+
+def bucket_id(period: str, day: date) -> str:
+    """Id of the day (2026-01-31), ISO week (2026-W05) or month (2026-01) bucket holding ``day``."""
+    if period == "day":
+        return day.isoformat()
+    if period == "week":
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+    if period == "month":
+        return day.strftime("%Y-%m")
+    raise ValueError(f"Unknown period {period!r}, expected one of {sorted(USER_BUCKETS)}")
+
+
+def bucket_range(period: str, start: date, end: date) -> List[str]:
+    """Ids of every ``period`` bucket overlapping start..end (inclusive), oldest first."""
+    if period == "week":
+        start -= timedelta(days=start.weekday())
+        step = lambda d: d + timedelta(days=7)
+    elif period == "month":
+        start = start.replace(day=1)
+        step = lambda d: (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+    else:
+        step = lambda d: d + timedelta(days=1)
+    ids = []
+    while start <= end:
+        ids.append(bucket_id(period, start))
+        start = step(start)
+    return ids
+
+
+def user_bucket_collection(uid: str, period: str) -> str:
+    return f"users/{uid}/{USER_BUCKETS[period]}"
+
+
+def report_fields(report: Dict[str, Any]) -> Dict[str, Any]:
+    """Counter increments contributed by one report; nested dicts are map fields."""
+    passed = (report.get("rating") or 0) > 0
+    category = report.get("waste_category") or "unknown"
+    weight = float(report.get("estimated_weight_kg") or 0.0) if passed else 0.0
+    return {
+        "total_tests": 1,
+        "tests_passed": 1 if passed else 0,
+        "tests_failed": 0 if passed else 1,
+        "total_stars": int(report.get("rating") or 0),
+        "total_credits": int(report.get("credits_earned") or 0),
+        "total_kg": weight,
+        "tests_by_category": {category: 1},
+        "kg_by_category": {category: weight},
+    }
+
+
+def merge_fields(into: Dict[str, Any], fields: Dict[str, Any]):
+    """Add counters from ``fields`` into ``into``, recursing into maps; strings are labels and overwrite."""
+    for key, value in fields.items():
+        if isinstance(value, dict):
+            merge_fields(into.setdefault(key, {}), value)
+        elif isinstance(value, str):
+            into[key] = value
+        else:
+            into[key] = into.get(key, 0) + value
+
+
+def report_deltas(report: Dict[str, Any], created_at: datetime) -> Dict[DocPath, Dict[str, Any]]:
+    """Aggregate documents touched by one report and the increments for each."""
+    fields = report_fields(report)
+    day = local_date(created_at)
+    deltas = {
+        GLOBAL_DOC: fields,
+        (DAILY_COLLECTION, day.isoformat()): {**fields, "date": day.isoformat()},
+    }
+    if report.get("binId"):
+        deltas[(BINS_COLLECTION, report["binId"])] = {**fields, "binId": report["binId"]}
+    uid = report.get("userId")
+    if uid:
+        deltas[("users", uid)] = {USER_FIELD: fields}
+        for period in USER_BUCKETS:
+            bucket = bucket_id(period, day)
+            deltas[(user_bucket_collection(uid, period), bucket)] = {**fields, "bucket": bucket}
+    return deltas
+
+
+def aggregate_docs(report: Dict[str, Any], created_at: datetime):
+    """Paths of the aggregate documents one report contributes to."""
+    return set(report_deltas(report, created_at))
+
+
+def combine_deltas(items: Iterable[Tuple[Dict[str, Any], datetime]]) -> Dict[DocPath, Dict[str, Any]]:
+    """Sum the deltas of many reports so each aggregate document is written once."""
+    combined: Dict[DocPath, Dict[str, Any]] = defaultdict(dict)
+    for report, created_at in items:
+        for path, fields in report_deltas(report, created_at).items():
+            merge_fields(combined[path], fields)
+    return combined
+
+
+def as_increments(fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Wrap numeric counters in increment transforms for a merge-write."""
+    out = {}
+    for key, value in fields.items():
+        if isinstance(value, dict):
+            out[key] = as_increments(value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            out[key] = increment(value)
+        else:
+            out[key] = value
+    return out
+
+
+def summarize(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """API shape of an aggregate document (missing counters read as zero)."""
+    doc = doc or {}
+    return {
+        "total_tests": doc.get("total_tests", 0),
+        "tests_passed": doc.get("tests_passed", 0),
+        "tests_failed": doc.get("tests_failed", 0),
+        "total_stars": doc.get("total_stars", 0),
+        "total_credits": doc.get("total_credits", 0),
+        "total_kg": round(doc.get("total_kg", 0.0), 3),
+        "tests_by_category": doc.get("tests_by_category", {}),
+        "kg_by_category": {k: round(v, 3) for k, v in doc.get("kg_by_category", {}).items()},
+    }
@@ -0,0 +1,123 @@
+import importlib
+
+import numpy as np
+
+# Interpreter-compatible runtimes, lightest first. "auto" picks the first one
+# that is installed so slim images can ship without the full tensorflow wheel.
+TFLITE_BACKENDS = {
+    "tflite_runtime": ("tflite_runtime.interpreter", "Interpreter"),
+    "litert": ("ai_edge_litert.interpreter", "Interpreter"),
+    "tensorflow": ("tensorflow", "lite.Interpreter"),
+}
+BACKENDS = (*TFLITE_BACKENDS, "onnxruntime")
+
+
+def resolve_backend(backend: str) -> str:
+    """Map "auto" to the lightest installed TFLite runtime."""
+    if backend != "auto":
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown model backend '{backend}', expected one of: auto, {', '.join(BACKENDS)}")
+        return backend
+    for name, (module, _) in TFLITE_BACKENDS.items():
+        try:
+            importlib.import_module(module)
+            return name
+        except ImportError:
+            continue
+    raise ImportError("No TFLite runtime installed (tried tflite-runtime, ai-edge-litert and tensorflow)")
+
+
+def _interpreter_class(backend: str):
+    module_name, attr = TFLITE_BACKENDS[backend]
+    obj = importlib.import_module(module_name)
+    for part in attr.split("."):
+        obj = getattr(obj, part)
+    return obj
+
+
+def import_runtime(backend: str):
+    """Import a runtime's module (most of the time and memory of a first model load) without loading a model."""
+    if backend == "onnxruntime":
+        return importlib.import_module("onnxruntime")
+    return _interpreter_class(backend)
+
+
+def _quantize(x: np.ndarray, detail) -> np.ndarray:
+    scale, zero_point = detail['quantization']
+    info = np.iinfo(detail['dtype'])
+    return np.clip(np.round(x / scale + zero_point), info.min, info.max).astype(detail['dtype'])
+
+
+def _dequantize(q: np.ndarray, detail) -> np.ndarray:
+    scale, zero_point = detail['quantization']
+    return (q.astype(np.float32) - zero_point) * scale
+
+
+class InterpreterRunner:
+    """
+    One TFLite interpreter plus the state needed to run batches on it.
+    A runner is not thread-safe: each inference worker owns its own.
+    Full-integer (int8/uint8) models are quantized/dequantized at the edges so
+    callers always pass 0-1 float32 input and get float32 probabilities back.
+    """
+    def __init__(self, model_path: str, num_threads: int = None, backend: str = "tensorflow"):
+        interpreter_class = _interpreter_class(backend)
+        self.interpreter = interpreter_class(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()
+        self.output_details = self.interpreter.get_output_details()
+        self._batch_size = self.input_details[0]['shape'][0]
+
+    def __call__(self, input_data: np.ndarray) -> np.ndarray:
+        batch_size = input_data.shape[0]
+        input_detail = self.input_details[0]
+        output_detail = self.output_details[0]
+
+        # Only reallocate when the batch dimension actually changes
+        if batch_size != self._batch_size:
+            self.interpreter.resize_tensor_input(input_detail['index'], [batch_size, *input_detail['shape'][1:]])
+            self.interpreter.allocate_tensors()
+            self._batch_size = batch_size
+
+        if input_detail['dtype'] != np.float32:
+            input_data = _quantize(input_data, input_detail)
+
+        self.interpreter.set_tensor(input_detail['index'], input_data)
+        self.interpreter.invoke()
+
+        output = self.interpreter.get_tensor(output_detail['index'])
+        if output_detail['dtype'] != np.float32:
+            return _dequantize(output, output_detail)
+        # Copy out, the interpreter reuses its output buffer on the next invoke
+        return np.array(output)
+
+
+class OnnxRunner:
+    """
+    ONNX Runtime CPU session exposing the same call interface and
+    input_details shape as InterpreterRunner.
+    """
+    def __init__(self, model_path: str, num_threads: int = None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+        self.interpreter = None
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        model_output = self.session.get_outputs()[0]
+        # Symbolic (dynamic) dimensions such as the batch axis are reported as 1
+        shape = [d if isinstance(d, int) else 1 for d in model_input.shape]
+        self.input_details = [{'name': model_input.name, 'index': 0, 'shape': np.array(shape, dtype=np.int32), 'dtype': np.float32}]
+        self.output_details = [{'name': model_output.name, 'index': 0, 'dtype': np.float32}]
+
+    def __call__(self, input_data: np.ndarray) -> np.ndarray:
+        return self.session.run([self.output_details[0]['name']], {self.input_details[0]['name']: input_data})[0]
+
+
+def create_runner(backend: str, model_path: str, num_threads: int = None):
+    if backend == "onnxruntime":
+        return OnnxRunner(model_path, num_threads)
+    return InterpreterRunner(model_path, num_threads, backend)
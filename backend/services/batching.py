@@ -0,0 +1,137 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Sequence, Union
+
+import numpy as np
+
+from services.telemetry import INFERENCE_BATCH_SIZE, INFERENCE_INVOKE_SECONDS, INFERENCE_QUEUE_WAIT_SECONDS
+
+Runner = Callable[[np.ndarray], np.ndarray]
+
+
+class BatchScheduler:
+    """Pool of inference worker threads fed from one shared request queue.
+
+    Callers submit preprocessed input of shape (N, H, W, C), usually N=1, and
+    get back a Future resolving to their own N rows of the model output. Every
+    worker thread is pinned to one runner (an interpreter it alone invokes): it
+    takes the first pending request, waits up to ``max_wait_ms`` for more to
+    arrive (or until ``max_batch_size`` rows are gathered), runs them as a
+    single batch and hands every caller its slice of the result.
+    """
+
+    def __init__(self, runners: Union[Runner, Sequence[Runner]], max_batch_size: int = 8, max_wait_ms: float = 5.0):
+        if callable(runners):
+            runners = [runners]
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._closed = False
+
+        self._stats_lock = threading.Lock()
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._batches = 0
+        self._busy = 0
+        self._max_queue_depth = 0
+        self._queue_wait_total = 0.0
+
+        self._threads: List[threading.Thread] = []
+        for i, runner in enumerate(runners):
+            thread = threading.Thread(target=self._worker, args=(runner,), name=f"inference-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, input_data: np.ndarray) -> Future:
+        if self._closed:
+            raise RuntimeError("Batch scheduler is closed")
+        future = Future()
+        self._queue.put((input_data, future, time.monotonic()))
+        with self._stats_lock:
+            self._submitted += 1
+            self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+        return future
+
+    def close(self):
+        self._closed = True
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def stats(self):
+        with self._stats_lock:
+            completed = self._completed + self._failed
+            return {
+                "workers": len(self._threads),
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_queue_depth,
+                "busy_workers": self._busy,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "batches": self._batches,
+                "avg_batch_size": completed / self._batches if self._batches else 0.0,
+                "avg_queue_wait_ms": 1000.0 * self._queue_wait_total / completed if completed else 0.0,
+            }
+
+    def _collect(self, first):
+        batch = [first]
+        rows = first[0].shape[0]
+        deadline = time.monotonic() + self.max_wait
+        while rows < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Re-queue the shutdown marker so this worker exits after the batch
+                self._queue.put(None)
+                break
+            batch.append(item)
+            rows += item[0].shape[0]
+        return batch
+
+    def _worker(self, runner: Runner):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            # Skip requests whose callers have already given up
+            batch = [(x, f, t) for x, f, t in self._collect(first) if f.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            started = time.monotonic()
+            with self._stats_lock:
+                self._busy += 1
+                self._batches += 1
+                self._queue_wait_total += sum(started - t for _, _, t in batch)
+            for _, _, t in batch:
+                INFERENCE_QUEUE_WAIT_SECONDS.observe(started - t)
+
+            try:
+                inputs = np.concatenate([x for x, _, _ in batch], axis=0)
+                INFERENCE_BATCH_SIZE.observe(inputs.shape[0])
+                outputs = runner(inputs)
+                INFERENCE_INVOKE_SECONDS.observe(time.monotonic() - started)
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                with self._stats_lock:
+                    self._busy -= 1
+                    self._failed += len(batch)
+                continue
+
+            offset = 0
+            for x, future, _ in batch:
+                future.set_result(outputs[offset:offset + x.shape[0]])
+                offset += x.shape[0]
+            with self._stats_lock:
+                self._busy -= 1
+                self._completed += len(batch)
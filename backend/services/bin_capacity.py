@@ -0,0 +1,77 @@
+from collections import defaultdict
+from typing import Any, Dict, Iterable, NamedTuple
+
+import config
+from services.bin_index import bin_index, is_listening
+from services.storage import increment
+
+
+class CapacityUpdate(NamedTuple):
+    kg: float
+    becomes_full: bool
+    # Fill level once the deposit is committed, as seen from the bin index
+    level: float
+
+
+def deposited_kg(report: Dict[str, Any]) -> float:
+    """Weight an accepted scan adds to its bin; rejected scans add nothing."""
+    if not report.get("binId") or (report.get("rating") or 0) <= 0:
+        return 0.0
+    return float(report.get("estimated_weight_kg") or 0.0)
+
+
+def capacity_updates(reports: Iterable[Dict[str, Any]]) -> Dict[str, CapacityUpdate]:
+    """
+    Summed deposits per bin, and whether each deposit takes an active bin to
+    BIN_FULL_THRESHOLD of its max_capacity. The crossing is judged against the
+    fill level in the bin index, which follows Firestore. Bins missing from the
+    index are skipped so a merge-write never recreates a deleted bin.
+    """
+    totals = defaultdict(float)
+    for report in reports:
+        kg = deposited_kg(report)
+        if kg > 0:
+            totals[report["binId"]] += kg
+
+    updates = {}
+    for bin_id, kg in totals.items():
+        bin_data = bin_index.get(bin_id)
+        if bin_data is None:
+            continue
+        level = float(bin_data.get("current_capacity") or 0.0) + kg
+        max_capacity = float(bin_data.get("max_capacity") or 0.0)
+        becomes_full = (
+            bin_data.get("status", "active") == "active"
+            and max_capacity > 0
+            and level >= config.BIN_FULL_THRESHOLD * max_capacity
+        )
+        updates[bin_id] = CapacityUpdate(round(kg, 3), becomes_full, round(level, 3))
+    return updates
+
+
+def capacity_fields(update: CapacityUpdate) -> Dict[str, Any]:
+    """Merge-write fields for bins/{id}: an atomic increment, plus the status flip."""
+    fields = {"current_capacity": increment(update.kg)}
+    if update.becomes_full:
+        fields["status"] = "full"
+    return fields
+
+
+def apply_capacity_updates(updates: Dict[str, CapacityUpdate]):
+    """
+    Reflect committed deposits in the local bin index (which also pushes them
+    to /bins/stream clients) when no snapshot listener does. With one, the
+    listener brings in the stored levels, possibly already during commit(),
+    so adding the deposit here as well would count it twice. Without one, the
+    index gets the level the commit wrote, so patching is idempotent.
+    """
+    if is_listening():
+        return
+    for bin_id, update in updates.items():
+        bin_data = bin_index.get(bin_id)
+        if bin_data is None:
+            continue
+        patched = {**bin_data, "current_capacity": update.level}
+        if update.becomes_full:
+            patched["status"] = "full"
+        bin_index.upsert(patched)
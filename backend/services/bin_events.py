@@ -0,0 +1,183 @@
+import asyncio
+import json
+import logging
+import threading
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, Set
+
+import config
+from services.bin_index import BinIndex, bin_index
+from services.telemetry import CallbackMetric
+
+logger = logging.getLogger(__name__)
+
+# Comment line sent to idle streams so proxies keep the connection open
+HEARTBEAT_SECONDS = 15.0
+_RESYNC = object()
+
+
+def sse_event(event: str, data: bytes, event_id: Optional[str] = None) -> bytes:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\n".encode() + b"data: " + data + b"\n\n"
+
+
+class BinEventHub:
+    """
+    Fans bin changes out to Server-Sent Events subscribers.
+
+    The bin index reports every changed binId (from admin edits, the Firestore
+    listener, or capacity increments after a report flush). Ids accumulate in
+    a pending set; every ``interval_ms`` one ``bins`` event carries a per-bin
+    delta (only the fields that differ from what was last broadcast) for each
+    bin that changed, however many times it changed in between. The event is
+    encoded once and shared by every subscriber.
+
+    New subscribers get a ``snapshot`` event with the full list first. Every
+    event's id is the content ETag of the bin list it brings the client to
+    (see ``BinIndex.listing``), which every worker and restart agrees on, so a
+    reconnect whose Last-Event-ID matches the current list skips the
+    snapshot. A subscriber whose queue overflows is dropped back to a fresh
+    snapshot instead of slowing the others down.
+    """
+
+    def __init__(self, index: BinIndex, interval_ms: float = 1000.0, queue_size: int = 32, max_clients: int = 5000):
+        self.index = index
+        self.interval = max(0.01, float(interval_ms) / 1000.0)
+        self.queue_size = int(queue_size)
+        self.max_clients = int(max_clients)
+
+        self._pending: Set[str] = set()
+        self._pending_lock = threading.Lock()
+        self._sent: Dict[str, Dict[str, Any]] = {}
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._task: Optional[asyncio.Task] = None
+
+        self.changes = 0
+        self.events = 0
+        self.deltas = 0
+        self.resyncs = 0
+        self.bytes_out = 0
+        index.add_watcher(self.notify)
+
+    def notify(self, bin_ids: Iterable[str]):
+        # Runs on whichever thread changed the index
+        with self._pending_lock:
+            for bin_id in bin_ids:
+                self._pending.add(bin_id)
+                self.changes += 1
+
+    @property
+    def clients(self) -> int:
+        return len(self._subscribers)
+
+    def _event_id(self) -> str:
+        return self.index.listing()[1].strip('"')
+
+    def _snapshot_event(self) -> bytes:
+        with self.index.lock:
+            body, _ = self.index.listing()
+            return sse_event("snapshot", body, self._event_id())
+
+    def _collect(self) -> Optional[bytes]:
+        # Under the index lock, so the deltas and the event id describe the same list
+        with self.index.lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, set()
+            if not pending:
+                return None
+
+            changed, removed = [], []
+            for bin_id in sorted(pending):
+                current = self.index.get(bin_id)
+                previous = self._sent.get(bin_id)
+                if current is None:
+                    if self._sent.pop(bin_id, None) is not None:
+                        removed.append(bin_id)
+                    continue
+                delta = {k: v for k, v in current.items() if previous is None or previous.get(k) != v}
+                if delta:
+                    changed.append({**delta, "binId": bin_id})
+                self._sent[bin_id] = dict(current)
+            if not changed and not removed:
+                return None
+            version, event_id = self.index.version, self._event_id()
+        self.deltas += len(changed) + len(removed)
+
+        data = json.dumps({"version": version, "changed": changed, "removed": removed}, default=str, separators=(",", ":"))
+        return sse_event("bins", data.encode(), event_id)
+
+    def flush(self):
+        """Broadcast what changed since the last flush (called by the loop every interval)."""
+        message = self._collect()
+        # With nobody subscribed this only keeps the baseline current
+        if message is None or not self._subscribers:
+            return
+        self.events += 1
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Too far behind: drop its backlog and start it over from a snapshot
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(_RESYNC)
+                self.resyncs += 1
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning("Bin event flush failed: %s", e)
+
+    async def stream(self, last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """SSE byte stream for one client; raises RuntimeError when at max_clients."""
+        if len(self._subscribers) >= self.max_clients:
+            raise RuntimeError(f"Too many bin stream clients ({self.max_clients})")
+        if self._task is None or self._task.done():
+            self._sent = {b["binId"]: dict(b) for b in self.index.all()}
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return self._iterate(queue, last_event_id)
+
+    async def _iterate(self, queue: asyncio.Queue, last_event_id: Optional[str]) -> AsyncIterator[bytes]:
+        try:
+            # A reconnect that already has the current list skips the snapshot
+            if last_event_id != self._event_id():
+                message = self._snapshot_event()
+                self.bytes_out += len(message)
+                yield message
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+                    continue
+                if message is _RESYNC:
+                    message = self._snapshot_event()
+                self.bytes_out += len(message)
+                yield message
+        finally:
+            self._subscribers.discard(queue)
+
+    def stats(self):
+        return {
+            "clients": len(self._subscribers),
+            "changes": self.changes,
+            "events": self.events,
+            "deltas": self.deltas,
+            "resyncs": self.resyncs,
+            "bytes_out": self.bytes_out,
+        }
+
+
+bin_events = BinEventHub(
+    bin_index,
+    interval_ms=config.BIN_STREAM_INTERVAL_MS,
+    queue_size=config.BIN_STREAM_QUEUE_SIZE,
+    max_clients=config.BIN_STREAM_MAX_CLIENTS,
+)
+
+CallbackMetric("ewaste_bin_stream_clients", "Connected /api/bins/stream clients.", lambda: [((), bin_events.clients)])
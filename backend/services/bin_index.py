@@ -0,0 +1,270 @@
+import hashlib
+import json
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+import config
+from utils.geo import haversine_distance, haversine_one_to_many
+
+METERS_PER_DEG_LAT = 111320.0
+# Grid keys are row * _ROW_STRIDE + column, columns offset to stay positive
+_ROW_STRIDE = 1 << 32
+_COL_OFFSET = 1 << 31
+
+
+def _json_default(value):
+    # Firestore timestamps and other non-JSON values, as FastAPI would encode them
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def has_coords(bin_data: Dict[str, Any]) -> bool:
+    return _position(bin_data) is not None
+
+
+def _position(bin_data: Optional[Dict[str, Any]]) -> Optional[Tuple[float, float]]:
+    # Where the bin sits in the grid, or None if it isn't in it
+    try:
+        return float(bin_data["latitude"]), float(bin_data["longitude"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class BinIndex:
+    """
+    In-memory copy of the ``bins`` collection with a uniform lat/lng grid for
+    nearest-bin and radius queries.
+
+    Bins live in a dict keyed by binId, so point updates are O(1). The grid is
+    a pair of NumPy arrays sorted by cell key; every grid row a query touches is
+    one contiguous key range found with searchsorted, and candidate distances
+    are computed vectorized. The arrays are rebuilt lazily on the first query
+    after a bin is added, removed or moved; other updates (fill levels, status)
+    leave them alone, since queries read the bins themselves from the dict.
+
+    It doubles as the read-through cache of bin metadata: ``version`` goes up
+    on every change, and the serialized bin list with its content ETag is
+    built once per version (see ``listing``). Bins without usable coordinates
+    are kept for listing but left out of the grid.
+    """
+
+    def __init__(self, cell_deg: float = 0.01):
+        self.cell_deg = float(cell_deg)
+        self._bins: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+        self._dirty = True
+        self.loaded = False
+        self.loaded_at = 0.0
+        self.version = 0
+        self._listing: Optional[Tuple[int, bytes, str]] = None
+        self._watchers: List[Callable[[Iterable[str]], None]] = []
+        self._ids = np.empty(0, dtype=object)
+        self._lats = np.empty(0)
+        self._lngs = np.empty(0)
+        self._keys = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self._bins)
+
+    @property
+    def lock(self):
+        """Held for every change; hold it to read several bins and the listing as one state."""
+        return self._lock
+
+    # Mutation
+
+    def replace_all(self, bins: Iterable[Dict[str, Any]]):
+        with self._lock:
+            bins = {b["binId"]: b for b in bins if b.get("binId")}
+            changed = {i for i in bins.keys() | self._bins.keys() if bins.get(i) != self._bins.get(i)}
+            if changed:
+                moved = any(_position(bins.get(i)) != _position(self._bins.get(i)) for i in changed)
+                self._bins = bins
+                self._changed(changed, moved)
+            self.loaded = True
+            self.loaded_at = time.monotonic()
+
+    def upsert(self, bin_data: Dict[str, Any]):
+        if not bin_data.get("binId"):
+            return
+        with self._lock:
+            previous = self._bins.get(bin_data["binId"])
+            if previous != bin_data:
+                self._bins[bin_data["binId"]] = bin_data
+                self._changed([bin_data["binId"]], _position(previous) != _position(bin_data))
+
+    def upsert_many(self, bins: Iterable[Dict[str, Any]]):
+        """Upsert a batch of bins as a single change."""
+        with self._lock:
+            changed = []
+            moved = False
+            for bin_data in bins:
+                bin_id = bin_data.get("binId")
+                previous = self._bins.get(bin_id)
+                if bin_id and previous != bin_data:
+                    moved = moved or _position(previous) != _position(bin_data)
+                    self._bins[bin_id] = bin_data
+                    changed.append(bin_id)
+            if changed:
+                self._changed(changed, moved)
+
+    def remove(self, bin_id: str):
+        with self._lock:
+            previous = self._bins.pop(bin_id, None)
+            if previous is not None:
+                self._changed([bin_id], has_coords(previous))
+
+    def add_watcher(self, callback: Callable[[Iterable[str]], None]):
+        """Call ``callback(bin_ids)`` after every change, with the ids that changed."""
+        self._watchers.append(callback)
+
+    def _changed(self, bin_ids: Iterable[str], moved: bool = True):
+        # Callers hold the lock; watchers must be quick and must not call back in.
+        # Only a bin added, removed or moved invalidates the grid
+        if moved:
+            self._dirty = True
+        self.version += 1
+        for callback in self._watchers:
+            callback(bin_ids)
+
+    # Grid
+
+    def _cell(self, lat, lng):
+        return np.floor(np.asarray(lat) / self.cell_deg).astype(np.int64), np.floor(np.asarray(lng) / self.cell_deg).astype(np.int64)
+
+    def _rebuild(self):
+        ids = [i for i, b in self._bins.items() if has_coords(b)]
+        lats = np.fromiter((float(self._bins[i]["latitude"]) for i in ids), dtype=np.float64, count=len(ids))
+        lngs = np.fromiter((float(self._bins[i]["longitude"]) for i in ids), dtype=np.float64, count=len(ids))
+        rows, cols = self._cell(lats, lngs)
+        keys = rows * _ROW_STRIDE + (cols + _COL_OFFSET)
+        order = np.argsort(keys, kind="stable")
+        self._ids = np.array(ids, dtype=object)[order]
+        self._lats = lats[order]
+        self._lngs = lngs[order]
+        self._keys = keys[order]
+        self._dirty = False
+
+    def _snapshot(self):
+        with self._lock:
+            if self._dirty:
+                self._rebuild()
+            return self._ids, self._lats, self._lngs, self._keys, self._bins
+
+    # Queries
+
+    def get(self, bin_id: str) -> Optional[Dict[str, Any]]:
+        return self._bins.get(bin_id)
+
+    def all(self) -> List[Dict[str, Any]]:
+        return list(self._bins.values())
+
+    def listing(self) -> Tuple[bytes, str]:
+        """
+        ``{"bins": [...]}`` as JSON bytes (ordered by binId, like a Firestore
+        stream) and a strong ETag of that body. Serialized once per version;
+        the ETag depends only on content, so every worker agrees on it.
+        """
+        with self._lock:
+            if self._listing is None or self._listing[0] != self.version:
+                bins = [self._bins[i] for i in sorted(self._bins)]
+                body = json.dumps({"bins": bins}, default=_json_default, separators=(",", ":")).encode()
+                etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+                self._listing = (self.version, body, etag)
+            return self._listing[1], self._listing[2]
+
+    def distance_to(self, bin_id: str, lat: float, lng: float) -> Optional[float]:
+        bin_data = self._bins.get(bin_id)
+        if bin_data is None or not has_coords(bin_data):
+            return None
+        return haversine_distance(lat, lng, float(bin_data["latitude"]), float(bin_data["longitude"]))
+
+    def nearby(self, lat: float, lng: float, radius_m: float, k: Optional[int] = None) -> List[Tuple[Dict[str, Any], float]]:
+        """Bins within ``radius_m`` meters of (lat, lng), nearest first, at most ``k`` of them."""
+        ids, lats, lngs, keys, bins = self._snapshot()
+        if len(ids) == 0:
+            return []
+
+        dlat = radius_m / METERS_PER_DEG_LAT
+        dlng = radius_m / (METERS_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6))
+        row0, col0 = self._cell(lat - dlat, lng - dlng)
+        row1, col1 = self._cell(lat + dlat, lng + dlng)
+
+        rows = np.arange(int(row0), int(row1) + 1, dtype=np.int64)
+        if len(rows) * 2 >= len(ids) or dlng >= 180:
+            # Window covers a large share of the index (or wraps the globe): scan it all
+            candidates = np.arange(len(ids))
+        else:
+            starts = np.searchsorted(keys, rows * _ROW_STRIDE + (int(col0) + _COL_OFFSET), side="left")
+            ends = np.searchsorted(keys, rows * _ROW_STRIDE + (int(col1) + _COL_OFFSET), side="right")
+            spans = [np.arange(s, e) for s, e in zip(starts, ends) if e > s]
+            if not spans:
+                return []
+            candidates = np.concatenate(spans)
+
+        distances = haversine_one_to_many(lat, lng, lats[candidates], lngs[candidates])
+        inside = distances <= radius_m
+        candidates, distances = candidates[inside], distances[inside]
+
+        if k is not None and len(candidates) > k:
+            top = np.argpartition(distances, k - 1)[:k]
+            candidates, distances = candidates[top], distances[top]
+        results = []
+        for j in np.argsort(distances):
+            # Skip bins deleted since the arrays were built
+            bin_data = bins.get(ids[candidates[j]])
+            if bin_data is not None:
+                results.append((bin_data, float(distances[j])))
+        return results
+
+
+bin_index = BinIndex(cell_deg=config.BIN_INDEX_CELL_DEG)
+_listener = None
+_load_lock = threading.Lock()
+
+
+def bin_document(doc) -> Dict[str, Any]:
+    """A bins/{id} snapshot as a bin dict, binId defaulting to the document id."""
+    return {"binId": doc.id, **doc.to_dict()}
+
+
+def _on_bins_snapshot(docs, changes, read_time):
+    for change in changes:
+        if change.type.name == "REMOVED":
+            bin_index.remove(change.document.id)
+        else:
+            bin_index.upsert(bin_document(change.document))
+
+
+def is_listening() -> bool:
+    """Whether a snapshot listener keeps the index in step with the store."""
+    return _listener is not None
+
+
+def _is_stale() -> bool:
+    # With a listener the index follows Firestore; without one, reload periodically
+    if not bin_index.loaded:
+        return True
+    if _listener is not None or config.BIN_INDEX_MAX_AGE_SECONDS <= 0:
+        return False
+    return time.monotonic() - bin_index.loaded_at > config.BIN_INDEX_MAX_AGE_SECONDS
+
+
+def ensure_bin_index(db) -> BinIndex:
+    """
+    Load the ``bins`` collection into the index once and, if enabled, keep it in
+    sync with a Firestore snapshot listener so edits from other workers show up.
+    Without the listener the collection is re-read every BIN_INDEX_MAX_AGE_SECONDS.
+    """
+    global _listener
+    if not _is_stale():
+        return bin_index
+    with _load_lock:
+        if _is_stale():
+            bin_index.replace_all(bin_document(d) for d in db.collection("bins").stream())
+            if config.BIN_INDEX_LISTEN and _listener is None:
+                _listener = db.collection("bins").on_snapshot(_on_bins_snapshot)
+    return bin_index
@@ -0,0 +1,272 @@
+import csv
+import io
+import json
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from services.bin_index import bin_index
+from services.submissions import MAX_BATCH_WRITES
+
+FORMATS = ("csv", "geojson", "ndjson")
+# CSV column order; the only fields imported or exported
+BIN_FIELDS = ["binId", "latitude", "longitude", "areaName", "current_capacity", "max_capacity", "status"]
+STATUSES = {"active", "full", "inactive"}
+# Accepted alternative column names
+ALIASES = {"lat": "latitude", "lng": "longitude", "lon": "longitude", "bin_id": "binId", "id": "binId"}
+
+# Errors listed in an import summary (the rest are only counted)
+MAX_REPORTED_ERRORS = 100
+_READ_SIZE = 1 << 16
+_FEATURES = re.compile(r'"features"\s*:\s*\[')
+
+
+def normalize_bin(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    A bins document from user input: a flat dict, or a GeoJSON Point Feature
+    whose properties hold the other fields. Raises ValueError when invalid.
+    """
+    if row.get("type") == "Feature":
+        geometry = row.get("geometry") or {}
+        if geometry.get("type") != "Point" or len(geometry.get("coordinates") or []) < 2:
+            raise ValueError("Feature geometry must be a Point")
+        lng, lat = geometry["coordinates"][:2]
+        row = {**(row.get("properties") or {}), "latitude": lat, "longitude": lng}
+    row = {ALIASES.get(k, k): v for k, v in row.items()}
+
+    def number(field, default=None):
+        value = row.get(field)
+        if value is None or value == "":
+            if default is None:
+                raise ValueError(f"{field} is required")
+            return default
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{field} must be a number, got {value!r}")
+
+    lat, lng = number("latitude"), number("longitude")
+    if not -90 <= lat <= 90 or not -180 <= lng <= 180:
+        raise ValueError(f"Coordinates out of range: {lat}, {lng}")
+    status = row.get("status") or "active"
+    if status not in STATUSES:
+        raise ValueError(f"status must be one of {', '.join(sorted(STATUSES))}")
+    max_capacity = number("max_capacity", 100.0)
+    current_capacity = number("current_capacity", 0.0)
+    if max_capacity <= 0 or current_capacity < 0:
+        raise ValueError("Capacities must be non-negative and max_capacity positive")
+    return {
+        "binId": str(row.get("binId") or f"BIN-{str(uuid.uuid4())[:8].upper()}"),
+        "latitude": lat,
+        "longitude": lng,
+        "areaName": str(row.get("areaName") or ""),
+        "current_capacity": current_capacity,
+        "max_capacity": max_capacity,
+        "status": status,
+    }
+
+
+# Readers: yield (row number, raw row) one at a time from a binary file
+
+
+def _text(f: BinaryIO) -> io.TextIOWrapper:
+    return io.TextIOWrapper(f, encoding="utf-8-sig", newline="")
+
+
+def iter_csv(f: BinaryIO) -> Iterator[Tuple[int, Any]]:
+    reader = csv.DictReader(_text(f))
+    for row in reader:
+        yield reader.line_num, row
+
+
+def iter_ndjson(f: BinaryIO) -> Iterator[Tuple[int, Any]]:
+    # Also reads GeoJSON text sequences (one Feature per line)
+    for number, line in enumerate(_text(f), 1):
+        line = line.strip().lstrip("\x1e")
+        if not line:
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as e:
+            yield number, ValueError(f"Invalid JSON: {e}")
+
+
+def iter_geojson(f: BinaryIO) -> Iterator[Tuple[int, Any]]:
+    """
+    Features of a FeatureCollection, decoded one at a time from a sliding
+    buffer so the collection is never parsed (or held) as a whole.
+    """
+    text = _text(f)
+    decoder = json.JSONDecoder()
+    buf = ""
+    while True:
+        match = _FEATURES.search(buf)
+        if match:
+            pos = match.end()
+            break
+        chunk = text.read(_READ_SIZE)
+        if not chunk:
+            raise ValueError('No "features" array found in GeoJSON')
+        # Keep a tail in case the key straddles two reads
+        buf = buf[-32:] + chunk
+
+    number = 0
+    eof = False
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos < len(buf) and buf[pos] == "]":
+            return
+        try:
+            feature, end = decoder.raw_decode(buf, pos)
+        except ValueError as e:
+            if eof:
+                raise ValueError(f"Invalid GeoJSON after feature {number}: {e}")
+            chunk = text.read(_READ_SIZE)
+            eof = not chunk
+            buf = buf[pos:] + chunk
+            pos = 0
+            continue
+        number += 1
+        yield number, feature
+        pos = end
+        if pos > _READ_SIZE:
+            buf, pos = buf[pos:], 0
+
+
+READERS = {"csv": iter_csv, "ndjson": iter_ndjson, "geojson": iter_geojson}
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    name = (filename or "").lower()
+    for suffix, fmt in ((".csv", "csv"), (".geojson", "geojson"), (".ndjson", "ndjson"), (".jsonl", "ndjson"), (".json", "geojson")):
+        if name.endswith(suffix):
+            return fmt
+    content_type = (content_type or "").lower()
+    if "csv" in content_type:
+        return "csv"
+    if "geo+json" in content_type:
+        return "geojson"
+    if "ndjson" in content_type or "jsonl" in content_type:
+        return "ndjson"
+    return None
+
+
+def import_bins(db, f: BinaryIO, fmt: str, dry_run: bool = False, max_inflight: int = 4) -> Dict[str, Any]:
+    """
+    Validate rows as they are read and write valid bins in batched commits of
+    up to MAX_BATCH_WRITES, with up to ``max_inflight`` commits in flight while
+    parsing continues. Invalid rows are skipped and reported. Bins are upserted
+    by binId, so re-importing a file is idempotent.
+    """
+    summary = {"format": fmt, "rows": 0, "imported": 0, "invalid": 0, "batches": 0, "errors": []}
+    pending: List[Dict[str, Any]] = []
+    inflight = []
+
+    def commit(docs):
+        batch = db.batch()
+        for doc in docs:
+            batch.set(db.collection("bins").document(doc["binId"]), doc)
+        batch.commit()
+        bin_index.upsert_many(docs)
+        return len(docs)
+
+    def drain(limit):
+        while len(inflight) > limit:
+            summary["imported"] += inflight.pop(0).result()
+            summary["batches"] += 1
+
+    def error(row_number, message):
+        summary["invalid"] += 1
+        if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+            summary["errors"].append({"row": row_number, "error": message})
+
+    with ThreadPoolExecutor(max(1, max_inflight), thread_name_prefix="bin-import") as pool:
+        try:
+            for row_number, row in READERS[fmt](f):
+                summary["rows"] += 1
+                if isinstance(row, Exception):
+                    error(row_number, str(row))
+                    continue
+                try:
+                    pending.append(normalize_bin(row))
+                except (ValueError, AttributeError) as e:
+                    error(row_number, str(e))
+                    continue
+                if len(pending) == MAX_BATCH_WRITES:
+                    if dry_run:
+                        summary["imported"] += len(pending)
+                    else:
+                        inflight.append(pool.submit(commit, pending))
+                        drain(max_inflight - 1)
+                    pending = []
+        except (ValueError, csv.Error, UnicodeDecodeError) as e:
+            # The file itself is malformed past this point; keep what was read
+            error(summary["rows"] + 1, f"Stopped reading: {e}")
+        if pending:
+            if dry_run:
+                summary["imported"] += len(pending)
+            else:
+                inflight.append(pool.submit(commit, pending))
+        drain(0)
+    return summary
+
+
+# Export
+
+
+def _bin_pages(db, page_size: int) -> Iterator[List[Dict[str, Any]]]:
+    # Cursor pages ordered by document id; only one page is in memory at a time
+    last = None
+    while True:
+        query = db.collection("bins").order_by("__name__").limit(page_size)
+        if last is not None:
+            query = query.start_after(last)
+        docs = list(query.stream())
+        if docs:
+            yield [{"binId": doc.id, **doc.to_dict()} for doc in docs]
+        if len(docs) < page_size:
+            return
+        last = docs[-1]
+
+
+def _feature(b: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    try:
+        coordinates = [float(b["longitude"]), float(b["latitude"])]
+    except (KeyError, TypeError, ValueError):
+        return None
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": coordinates},
+        "properties": {k: b[k] for k in BIN_FIELDS if k in b and k not in ("latitude", "longitude")},
+    }
+
+
+def export_bins(db, fmt: str, page_size: int = 1000) -> Iterator[bytes]:
+    """Bins encoded in ``fmt``, one chunk per Firestore page, for a StreamingResponse."""
+    if fmt == "geojson":
+        yield b'{"type":"FeatureCollection","features":[\n'
+    elif fmt == "csv":
+        out = io.StringIO()
+        csv.writer(out, lineterminator="\n").writerow(BIN_FIELDS)
+        yield out.getvalue().encode()
+
+    first = True
+    for page in _bin_pages(db, page_size):
+        if fmt == "csv":
+            out = io.StringIO()
+            csv.writer(out, lineterminator="\n").writerows([b.get(k, "") for k in BIN_FIELDS] for b in page)
+            chunk = out.getvalue()
+        elif fmt == "ndjson":
+            chunk = "".join(json.dumps({k: b[k] for k in BIN_FIELDS if k in b}, default=str) + "\n" for b in page)
+        else:
+            features = [json.dumps(f, default=str) for f in map(_feature, page) if f is not None]
+            if not features:
+                continue
+            chunk = ("" if first else ",\n") + ",\n".join(features)
+            first = False
+        yield chunk.encode()
+
+    if fmt == "geojson":
+        yield b"\n]}\n"
@@ -0,0 +1,185 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import config
+from services.analytics_engine import BINS_COLLECTION, DAILY_COLLECTION, GLOBAL_DOC, USER_BUCKETS
+from services.submissions import MAX_BATCH_WRITES
+
+logger = logging.getLogger(__name__)
+
+# Collections the app writes besides admin and bins. (name, is_collection_group):
+# the per-user history buckets are subcollections, which deleting users/{uid}
+# does not remove.
+APP_COLLECTIONS: List[Tuple[str, bool]] = (
+    [(c, False) for c in ("users", "reports", "shops", "images", "complaints")]
+    + [(c, False) for c in (GLOBAL_DOC[0], DAILY_COLLECTION, BINS_COLLECTION)]
+    + [(c, True) for c in USER_BUCKETS.values()]
+)
+
+# Finished jobs kept for the status endpoint
+MAX_FINISHED_JOBS = 20
+
+
+def delete_query(db, query, page_size: int, commit_pool: ThreadPoolExecutor, max_inflight: int,
+                 on_batch: Callable[[int], None]) -> int:
+    """
+    Delete every document ``query`` matches: page through document keys with
+    a cursor and delete each page in one batched write. Up to ``max_inflight``
+    commits run in ``commit_pool`` while the next page is read.
+    """
+    page_size = max(1, min(int(page_size), MAX_BATCH_WRITES))
+    inflight = deque()
+    deleted = 0
+    last = None
+
+    def commit(batch, count):
+        batch.commit()
+        on_batch(count)
+        return count
+
+    while True:
+        page_query = query.select([]).limit(page_size)
+        if last is not None:
+            page_query = page_query.start_after(last)
+        docs = list(page_query.stream())
+        if not docs:
+            break
+        batch = db.batch()
+        for doc in docs:
+            batch.delete(doc.reference)
+        inflight.append(commit_pool.submit(commit, batch, len(docs)))
+        last = docs[-1]
+        while len(inflight) >= max_inflight:
+            deleted += inflight.popleft().result()
+        if len(docs) < page_size:
+            break
+    while inflight:
+        deleted += inflight.popleft().result()
+    return deleted
+
+
+class DeletionJob:
+    """
+    Background bulk delete of several collections, run in parallel (each with
+    pipelined batch commits), with per-collection progress. ``then`` runs
+    after every collection is cleared, e.g. to seed fresh data.
+    """
+
+    def __init__(self, kind: str, targets: List[Tuple[str, bool]], then: Optional[Callable[[Any], Any]] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.targets = targets
+        self.then = then
+        self.status = "pending"
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.progress: Dict[str, Dict[str, Any]] = {
+            name: {"status": "pending", "deleted": 0, "batches": 0, "error": None} for name, _ in targets
+        }
+        self._lock = threading.Lock()
+
+    def _update(self, name: str, **fields):
+        with self._lock:
+            self.progress[name].update(fields)
+
+    def _on_batch(self, name: str, count: int):
+        with self._lock:
+            self.progress[name]["deleted"] += count
+            self.progress[name]["batches"] += 1
+
+    def _delete_target(self, db, name: str, group: bool, commit_pool: ThreadPoolExecutor):
+        self._update(name, status="running")
+        start = time.perf_counter()
+        try:
+            query = db.collection_group(name) if group else db.collection(name)
+            delete_query(db, query, config.BULK_DELETE_PAGE_SIZE, commit_pool, config.BULK_DELETE_MAX_INFLIGHT,
+                         lambda count: self._on_batch(name, count))
+            self._update(name, status="done", seconds=round(time.perf_counter() - start, 3))
+        except Exception as e:
+            logger.error("Bulk delete of %s failed: %s", name, e)
+            self._update(name, status="failed", error=str(e), seconds=round(time.perf_counter() - start, 3))
+
+    def run(self, db):
+        self.status = "running"
+        self.started_at = time.time()
+        parallel = max(1, config.BULK_DELETE_PARALLELISM)
+        commits = parallel * max(1, config.BULK_DELETE_MAX_INFLIGHT)
+        try:
+            with ThreadPoolExecutor(parallel, thread_name_prefix="bulk-delete") as readers, \
+                    ThreadPoolExecutor(commits, thread_name_prefix="bulk-delete-commit") as commit_pool:
+                for future in [readers.submit(self._delete_target, db, name, group, commit_pool) for name, group in self.targets]:
+                    future.result()
+            failed = [name for name, p in self.progress.items() if p["status"] == "failed"]
+            if failed:
+                raise RuntimeError(f"Could not clear {', '.join(failed)}")
+            if self.then is not None:
+                self.then(db)
+            self.status = "done"
+        except Exception as e:
+            self.status = "failed"
+            self.error = str(e)
+        finally:
+            self.finished_at = time.time()
+            deleted = sum(p["deleted"] for p in self.progress.values())
+            logger.info("%s job %s %s: deleted %d documents in %.1fs",
+                        self.kind, self.id, self.status, deleted, self.finished_at - self.started_at)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            progress = {name: dict(p) for name, p in self.progress.items()}
+        end = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "error": self.error,
+            "deleted": sum(p["deleted"] for p in progress.values()),
+            "elapsed_seconds": round(end - self.started_at, 3) if self.started_at else 0.0,
+            "collections": progress,
+        }
+
+
+_jobs: "OrderedDict[str, DeletionJob]" = OrderedDict()
+_jobs_lock = threading.Lock()
+
+
+def start_deletion_job(db_factory: Callable[[], Any], kind: str, targets: List[Tuple[str, bool]],
+                       then: Optional[Callable[[Any], Any]] = None) -> DeletionJob:
+    """Start a job in a background thread; raises RuntimeError while another one is running."""
+    with _jobs_lock:
+        running = [j for j in _jobs.values() if j.status in ("pending", "running")]
+        if running:
+            raise RuntimeError(f"Job {running[0].id} ({running[0].kind}) is still running")
+        job = DeletionJob(kind, targets, then)
+        _jobs[job.id] = job
+        while len(_jobs) > MAX_FINISHED_JOBS:
+            _jobs.popitem(last=False)
+
+    def run():
+        try:
+            db = db_factory()
+        except Exception as e:
+            job.status, job.error = "failed", str(e)
+            return
+        job.run(db)
+
+    threading.Thread(target=run, name=f"{kind}-{job.id}", daemon=True).start()
+    return job
+
+
+def get_job(job_id: str) -> Optional[DeletionJob]:
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def list_jobs() -> List[Dict[str, Any]]:
+    with _jobs_lock:
+        jobs = list(_jobs.values())
+    return [j.to_dict() for j in reversed(jobs)]
@@ -0,0 +1,73 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.analytics_engine import local_date, summarize, user_bucket_collection
+from services.storage import DESCENDING
+
+# Fields of a report returned in history rows
+HISTORY_FIELDS = ["binId", "label", "waste_category", "estimated_weight_kg", "credits_earned", "rating", "duplicate", "createdAt"]
+
+
+def encode_cursor(created_at: datetime, doc_id: str) -> str:
+    """Opaque page token: the (createdAt, id) of the last row returned."""
+    raw = json.dumps({"t": created_at.isoformat(), "id": doc_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(raw["t"]), str(raw["id"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def history_row(doc_id: str, report: Dict[str, Any]) -> Dict[str, Any]:
+    created_at = report.get("createdAt")
+    return {
+        "id": doc_id,
+        "createdAt": created_at.isoformat() if created_at else None,
+        "date": local_date(created_at).isoformat() if created_at else None,
+        "result": "passed" if (report.get("rating") or 0) > 0 else "failed",
+        **{k: report.get(k) for k in HISTORY_FIELDS if k != "createdAt"},
+    }
+
+
+def history_page(db, uid: str, limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    One page of a user's reports, newest first, and the cursor for the next
+    page (None on the last one).
+
+    Keyset pagination on (createdAt DESC, __name__ DESC): each page starts
+    after the previous page's last row, so page N costs the same as page 1,
+    and rows written meanwhile never shift or repeat. Needs the composite index
+    reports(userId ASC, createdAt DESC, __name__ DESC) from firestore.indexes.json.
+    """
+    query = (
+        db.collection("reports")
+        .where("userId", "==", uid)
+        .order_by("createdAt", direction=DESCENDING)
+        .order_by("__name__", direction=DESCENDING)
+        .select(HISTORY_FIELDS)
+    )
+    if cursor:
+        created_at, doc_id = decode_cursor(cursor)
+        query = query.start_after({"createdAt": created_at, "__name__": doc_id})
+
+    # One extra row tells whether another page follows
+    docs = list(query.limit(limit + 1).stream())
+    rows = [history_row(doc.id, doc.to_dict()) for doc in docs[:limit]]
+    next_cursor = None
+    if len(docs) > limit:
+        last = docs[limit - 1]
+        next_cursor = encode_cursor(last.get("createdAt"), last.id)
+    return rows, next_cursor
+
+
+def user_series(db, uid: str, period: str, bucket_ids: List[str]) -> List[Dict[str, Any]]:
+    """Per-bucket totals from the user's precomputed buckets; empty buckets read as zero."""
+    collection = db.collection(user_bucket_collection(uid, period))
+    found = {doc.id: doc.to_dict() for doc in db.get_all([collection.document(b) for b in bucket_ids]) if doc.exists}
+    return [{"bucket": b, **summarize(found.get(b))} for b in bucket_ids]
@@ -0,0 +1,288 @@
+"""
+Content-addressed archive of scanned images, for dispute audits, rescoring
+(scripts/rescore_reports.py) and retraining.
+
+Every upload that produces a report is stored once under its sha256 content
+hash (the report's ``imageHash``) as ``<hash[:2]>/<hash>``, next to a JPEG
+thumbnail at ``thumbnails/<hash[:2]>/<hash>.jpg``. Writes happen on
+background threads fed from a queue bounded in bytes: when it is full a
+request waits up to IMAGE_ARCHIVE_MAX_WAIT_MS for room and the image is then
+skipped (and counted), so a slow store never holds up scans for long.
+"""
+import io
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+from PIL import Image
+
+import config
+from services.image_pipeline import decode_image, make_thumbnail
+from services.telemetry import CallbackMetric
+
+logger = logging.getLogger(__name__)
+
+_HASH = re.compile(r"^[0-9a-f]{64}$")
+
+
+def is_image_hash(value: str) -> bool:
+    return bool(_HASH.match(value))
+
+
+def image_key(image_hash: str) -> str:
+    return f"{image_hash[:2]}/{image_hash}"
+
+
+def thumbnail_key(image_hash: str) -> str:
+    return f"thumbnails/{image_hash[:2]}/{image_hash}.jpg"
+
+
+# Backends: exists/get/put by key
+
+class LocalArchive:
+    """Files under a directory; writes are atomic (temp file, then rename)."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, data: bytes, content_type: str):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+class GCSArchive:
+    """Objects in a Cloud Storage bucket (the Firebase project's credentials)."""
+
+    def __init__(self, bucket: str):
+        from google.cloud import storage
+
+        self.bucket = storage.Client().bucket(bucket)
+
+    def exists(self, key: str) -> bool:
+        return self.bucket.blob(key).exists()
+
+    def get(self, key: str) -> Optional[bytes]:
+        from google.api_core.exceptions import NotFound
+
+        try:
+            return self.bucket.blob(key).download_as_bytes()
+        except NotFound:
+            return None
+
+    def put(self, key: str, data: bytes, content_type: str):
+        # Content-addressed objects never change, so they can be cached forever
+        blob = self.bucket.blob(key)
+        blob.cache_control = "public, max-age=31536000, immutable"
+        blob.upload_from_string(data, content_type=content_type)
+
+
+def create_backend(kind: str):
+    if kind == "local":
+        return LocalArchive(config.IMAGE_ARCHIVE_DIR)
+    if kind == "gcs":
+        if not config.IMAGE_ARCHIVE_BUCKET:
+            raise ValueError("IMAGE_ARCHIVE=gcs needs IMAGE_ARCHIVE_BUCKET")
+        return GCSArchive(config.IMAGE_ARCHIVE_BUCKET)
+    raise ValueError(f"Unknown IMAGE_ARCHIVE '{kind}', expected local, gcs or off")
+
+
+class ImageArchiver:
+    """
+    Background writer for the archive. Hashes known to be stored (recently
+    written or found to exist) are remembered, so re-submissions cost a dict
+    lookup; the rest are queued once even if several requests carry them.
+    """
+
+    def __init__(self, backend, thumbnail_size: int = 256, workers: int = 2, max_queue_bytes: int = 64 << 20,
+                 max_wait_ms: float = 50.0, known_size: int = 65536):
+        self.backend = backend
+        self.thumbnail_size = thumbnail_size
+        self.max_queue_bytes = max_queue_bytes
+        self.max_wait = max_wait_ms / 1000.0
+        self.known_size = known_size
+
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._queued_bytes = 0
+        self._pending = set()
+        self._known: "OrderedDict[str, None]" = OrderedDict()
+        self._closing = False
+
+        self.submitted = 0
+        self.deduplicated = 0
+        self.written = 0
+        self.bytes_written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.waited_ms = 0.0
+
+        self._threads = [threading.Thread(target=self._run, name=f"image-archive-{i}", daemon=True)
+                         for i in range(max(1, workers))]
+        for thread in self._threads:
+            thread.start()
+
+    def known(self, image_hash: str) -> bool:
+        """Already archived or queued; such uploads don't need a thumbnail."""
+        with self._cond:
+            return image_hash in self._known or image_hash in self._pending
+
+    def submit(self, image_hash: str, data: bytes, thumbnail: Optional[bytes] = None) -> bool:
+        """
+        Queue an upload for archiving. Blocks for at most max_wait_ms while
+        the queue is full; returns False if the image was dropped.
+        """
+        size = len(data) + len(thumbnail or b"")
+        with self._cond:
+            self.submitted += 1
+            if image_hash in self._known or image_hash in self._pending:
+                self.deduplicated += 1
+                return True
+            start = time.monotonic()
+            deadline = start + self.max_wait
+            # An upload larger than the whole budget still goes in once the queue is empty
+            while self._queue and self._queued_bytes + size > self.max_queue_bytes:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._closing:
+                    self.dropped += 1
+                    logger.warning("Image archive queue full, skipping %s", image_hash)
+                    return False
+                self._cond.wait(remaining)
+            self.waited_ms += (time.monotonic() - start) * 1000
+            self._queue.append((image_hash, data, thumbnail))
+            self._queued_bytes += size
+            self._pending.add(image_hash)
+            self._cond.notify_all()
+        return True
+
+    def close(self, timeout: float = 10.0):
+        """Write what is queued (within ``timeout``) and stop."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queue_depth": len(self._queue),
+                "queued_bytes": self._queued_bytes,
+                "submitted": self.submitted,
+                "deduplicated": self.deduplicated,
+                "written": self.written,
+                "bytes_written": self.bytes_written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "avg_wait_ms": self.waited_ms / self.submitted if self.submitted else 0.0,
+            }
+
+    @staticmethod
+    def content_type(data: bytes) -> str:
+        try:
+            return Image.MIME.get(Image.open(io.BytesIO(data)).format, "application/octet-stream")
+        except Exception:
+            return "application/octet-stream"
+
+    def _remember(self, image_hash: str):
+        self._known[image_hash] = None
+        self._known.move_to_end(image_hash)
+        while len(self._known) > self.known_size:
+            self._known.popitem(last=False)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closing:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                image_hash, data, thumbnail = self._queue.popleft()
+                self._queued_bytes -= len(data) + len(thumbnail or b"")
+                # Room for waiting producers
+                self._cond.notify_all()
+
+            written = 0
+            try:
+                if not self.backend.exists(image_key(image_hash)):
+                    if thumbnail is None and self.thumbnail_size:
+                        thumbnail = make_thumbnail(decode_image(data, self.thumbnail_size), self.thumbnail_size)
+                    # Thumbnail first: an existing original means both are there
+                    if thumbnail is not None:
+                        self.backend.put(thumbnail_key(image_hash), thumbnail, "image/jpeg")
+                    self.backend.put(image_key(image_hash), data, self.content_type(data))
+                    written = len(data) + len(thumbnail or b"")
+            except Exception as e:
+                logger.warning("Archiving image %s failed: %s", image_hash, e)
+                with self._cond:
+                    self.failed += 1
+                    self._pending.discard(image_hash)
+                continue
+
+            with self._cond:
+                self._pending.discard(image_hash)
+                self._remember(image_hash)
+                if written:
+                    self.written += 1
+                    self.bytes_written += written
+                else:
+                    self.deduplicated += 1
+
+
+_archiver = None
+_archiver_lock = threading.Lock()
+
+
+def get_image_archiver() -> Optional[ImageArchiver]:
+    """The process-wide archiver, or None with IMAGE_ARCHIVE=off."""
+    global _archiver
+    if config.IMAGE_ARCHIVE == "off":
+        return None
+    if _archiver is None:
+        with _archiver_lock:
+            if _archiver is None:
+                _archiver = ImageArchiver(
+                    create_backend(config.IMAGE_ARCHIVE),
+                    thumbnail_size=config.IMAGE_ARCHIVE_THUMBNAIL_SIZE,
+                    workers=config.IMAGE_ARCHIVE_WORKERS,
+                    max_queue_bytes=config.IMAGE_ARCHIVE_QUEUE_BYTES,
+                    max_wait_ms=config.IMAGE_ARCHIVE_MAX_WAIT_MS,
+                )
+    return _archiver
+
+
+def is_image_archiver_started() -> bool:
+    return _archiver is not None
+
+
+def _queued_bytes():
+    return [((), _archiver.stats()["queued_bytes"])] if _archiver is not None else []
+
+
+CallbackMetric("ewaste_image_archive_queued_bytes", "Image bytes waiting to be archived.", _queued_bytes)
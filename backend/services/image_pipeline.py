@@ -0,0 +1,98 @@
+import io
+import queue
+from typing import NamedTuple, Tuple
+
+import numpy as np
+from PIL import Image, ImageStat
+
+_INV_255 = np.float32(1.0 / 255.0)
+
+
+class PreparedImage(NamedTuple):
+    clarity: float          # grayscale variance normalized to roughly 0-1
+    input_data: np.ndarray  # (1, H, W, 3) float32 model input in 0-1
+    phash: int = None       # 64-bit difference hash of the grayscale image
+    thumbnail: bytes = None  # JPEG thumbnail for the image archive, when asked for
+
+
+class TensorBufferPool:
+    """
+    Bounded free-list of preallocated (1, H, W, C) float32 input buffers.
+    Buffers that are never released are simply garbage collected; the pool
+    allocates a fresh one whenever it runs dry.
+    """
+    def __init__(self, shape: Tuple[int, ...], capacity: int = 16):
+        self.shape = tuple(int(d) for d in shape)
+        self._free = queue.LifoQueue(maxsize=capacity)
+        for _ in range(capacity):
+            self._free.put_nowait(np.empty(self.shape, dtype=np.float32))
+
+    def acquire(self) -> np.ndarray:
+        try:
+            return self._free.get_nowait()
+        except queue.Empty:
+            return np.empty(self.shape, dtype=np.float32)
+
+    def release(self, buffer: np.ndarray):
+        if buffer.shape != self.shape or buffer.dtype != np.float32:
+            return
+        try:
+            self._free.put_nowait(buffer)
+        except queue.Full:
+            pass
+
+
+def decode_image(data: bytes, draft_size: int = 0) -> Image.Image:
+    """
+    Decode an upload once. For JPEGs, draft() lets libjpeg decode at a reduced
+    scale (1/2, 1/4 or 1/8) that is still at least ``draft_size`` on both
+    sides, which is far cheaper than decoding a 12MP photo at full resolution.
+    """
+    image = Image.open(io.BytesIO(data))
+    if draft_size and image.format == "JPEG":
+        image.draft("RGB", (draft_size, draft_size))
+    image.load()
+    return image
+
+
+def difference_hash(gray: Image.Image) -> int:
+    """64-bit dHash: whether each pixel of a 9x8 thumbnail is brighter than its right neighbour."""
+    pixels = np.asarray(gray.resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def make_thumbnail(image: Image.Image, size: int) -> bytes:
+    """JPEG of ``image`` scaled down to fit in ``size`` x ``size``."""
+    thumb = image.convert('RGB')
+    thumb.thumbnail((size, size), Image.BILINEAR, reducing_gap=2.0)
+    out = io.BytesIO()
+    thumb.save(out, "JPEG", quality=80)
+    return out.getvalue()
+
+
+def prepare_image(data: bytes, width: int, height: int, out: np.ndarray = None, draft_size: int = 0,
+                  thumbnail_size: int = 0) -> PreparedImage:
+    """
+    Decode ``data`` once and derive both the clarity score and the model
+    input from it. The normalized tensor is written straight into ``out``
+    when a buffer is supplied. With ``thumbnail_size``, a JPEG thumbnail for
+    the image archive is made from the same decoded image.
+    """
+    image = decode_image(data, draft_size)
+
+    # Clarity: variance of the grayscale image, computed from PIL's histogram
+    # rather than a full-size float copy of the pixels
+    gray = image.convert('L')
+    clarity = ImageStat.Stat(gray).var[0] / (255.0**2)
+    phash = difference_hash(gray)
+
+    rgb = image.convert('RGB').resize((width, height))
+    if out is None:
+        out = np.empty((1, height, width, 3), dtype=np.float32)
+
+    # Scale 0-255 -> 0-1 into the output buffer without an intermediate float array
+    np.multiply(np.asarray(rgb), _INV_255, out=out[0], casting='unsafe')
+
+    thumbnail = make_thumbnail(image, thumbnail_size) if thumbnail_size else None
+    return PreparedImage(float(clarity), out, phash, thumbnail)
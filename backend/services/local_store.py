@@ -0,0 +1,668 @@
+import base64
+import bisect
+import enum
+import heapq
+import json
+import logging
+import random
+import sqlite3
+import string
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from services.storage import ASCENDING, DESCENDING, Increment
+from services.submissions import MAX_BATCH_WRITES
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+_AUTO_ID_CHARS = string.ascii_letters + string.digits
+_OPERATORS = {"==", "!=", "<", "<=", ">", ">=", "in", "not-in", "array_contains", "array_contains_any"}
+
+
+class NotFound(LookupError):
+    """update() of a document that does not exist (Firestore raises NotFound too)."""
+
+
+class ChangeType(enum.Enum):
+    ADDED = 1
+    REMOVED = 2
+    MODIFIED = 3
+
+
+class DocumentChange:
+    def __init__(self, type: ChangeType, document: "LocalDocumentSnapshot"):
+        self.type = type
+        self.document = document
+        self.old_index = -1
+        self.new_index = -1
+
+
+def _is_increment(value) -> bool:
+    # Firestore's Increment is accepted as well, so code that built its writes
+    # for Firestore can be pointed at a local store
+    return isinstance(value, Increment) or (type(value).__name__ == "Increment" and hasattr(value, "value"))
+
+
+def _copy(value):
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+
+def _order_key(value):
+    """Sort key following Firestore's cross-type order: null < bool < number < timestamp < string < bytes < reference < array < map."""
+    if value is None:
+        return (0,)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, datetime):
+        return (3, value.timestamp())
+    if isinstance(value, str):
+        return (4, value)
+    if isinstance(value, bytes):
+        return (5, value)
+    if isinstance(value, LocalDocumentReference):
+        return (6, tuple(value.path.split("/")))
+    if isinstance(value, (list, tuple)):
+        return (8, tuple(_order_key(v) for v in value))
+    if isinstance(value, dict):
+        return (9, tuple((k, _order_key(v)) for k, v in sorted(value.items())))
+    return (10, str(value))
+
+
+def _get_field(data: Dict[str, Any], field_path: str):
+    value = data
+    for part in field_path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _stored(value, current=_MISSING):
+    """A written value as stored: transforms applied to ``current``, containers copied, naive datetimes as UTC."""
+    if _is_increment(value):
+        if isinstance(current, (int, float)) and not isinstance(current, bool):
+            return current + value.value
+        return value.value
+    if isinstance(value, dict):
+        return {k: _stored(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_stored(v) for v in value]
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _set_path(data: Dict[str, Any], parts: List[str], value):
+    for part in parts[:-1]:
+        if not isinstance(data.get(part), dict):
+            data[part] = {}
+        data = data[part]
+    data[parts[-1]] = _stored(value, data.get(parts[-1], _MISSING))
+
+
+def _merge(target: Dict[str, Any], data: Dict[str, Any]):
+    for key, value in data.items():
+        if isinstance(value, dict):
+            if not isinstance(target.get(key), dict):
+                target[key] = {}
+            _merge(target[key], value)
+        else:
+            target[key] = _stored(value, target.get(key, _MISSING))
+
+
+def _project(data: Dict[str, Any], field_paths: List[str]) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for field_path in field_paths:
+        value = _get_field(data, field_path)
+        if value is not _MISSING:
+            parts = field_path.split(".")
+            target = out
+            for part in parts[:-1]:
+                target = target.setdefault(part, {})
+            target[parts[-1]] = value
+    return out
+
+
+def _matches(data: Dict[str, Any], path: str, field: str, op: str, value) -> bool:
+    actual = path if field == "__name__" else _get_field(data, field)
+    if actual is _MISSING:
+        return False
+    key = _order_key(actual) if field != "__name__" else (6, tuple(path.split("/")))
+    if op == "==":
+        return key == _order_key(value)
+    if op == "!=":
+        return key != _order_key(value)
+    if op == "in":
+        return key in {_order_key(v) for v in value}
+    if op == "not-in":
+        return key not in {_order_key(v) for v in value}
+    if op == "array_contains":
+        return isinstance(actual, list) and _order_key(value) in {_order_key(v) for v in actual}
+    if op == "array_contains_any":
+        return isinstance(actual, list) and bool({_order_key(v) for v in actual} & {_order_key(v) for v in value})
+    other = _order_key(value)
+    # Range filters only match values of the same type
+    if key[0] != other[0]:
+        return False
+    return {"<": key < other, "<=": key <= other, ">": key > other, ">=": key >= other}[op]
+
+
+# JSON encoding of stored documents for the SQLite file
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"$time": value.isoformat()}
+    if isinstance(value, bytes):
+        return {"$bytes": base64.b64encode(value).decode()}
+    if isinstance(value, LocalDocumentReference):
+        return {"$ref": value.path}
+    raise TypeError(f"Cannot store {type(value).__name__}")
+
+
+def _decoder(store: "LocalStore"):
+    def decode(obj):
+        if len(obj) == 1:
+            if "$time" in obj:
+                return datetime.fromisoformat(obj["$time"])
+            if "$bytes" in obj:
+                return base64.b64decode(obj["$bytes"])
+            if "$ref" in obj:
+                return LocalDocumentReference(store, obj["$ref"])
+        return obj
+    return decode
+
+
+class LocalDocumentSnapshot:
+    def __init__(self, reference: "LocalDocumentReference", data: Optional[Dict[str, Any]]):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        # Stored documents are replaced on write, never changed in place, so
+        # a snapshot can share them; to_dict() hands out a copy
+        self._data = data
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return _copy(self._data) if self._data is not None else None
+
+    def get(self, field_path: str):
+        value = _get_field(self._data or {}, field_path)
+        if value is _MISSING:
+            raise KeyError(field_path)
+        return _copy(value)
+
+
+class LocalQuery:
+    def __init__(self, store: "LocalStore", parent_path: str, group: bool = False, filters=(), orders=(),
+                 limit: Optional[int] = None, cursor=None, projection: Optional[List[str]] = None):
+        self._store = store
+        self._parent_path = parent_path
+        self._group = group
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._cursor = cursor
+        self._projection = projection
+
+    def _with(self, **changes) -> "LocalQuery":
+        fields = dict(store=self._store, parent_path=self._parent_path, group=self._group, filters=self._filters,
+                      orders=self._orders, limit=self._limit, cursor=self._cursor, projection=self._projection)
+        fields.update(changes)
+        return LocalQuery(**fields)
+
+    def where(self, field_path: Optional[str] = None, op_string: Optional[str] = None, value=None, *, filter=None) -> "LocalQuery":
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        if op_string not in _OPERATORS:
+            raise ValueError(f"Unsupported operator {op_string!r}")
+        return self._with(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path: str, direction: str = ASCENDING) -> "LocalQuery":
+        if direction not in (ASCENDING, DESCENDING):
+            raise ValueError(f"Unknown direction {direction!r}")
+        return self._with(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count: int) -> "LocalQuery":
+        return self._with(limit=int(count))
+
+    def select(self, field_paths: Iterable[str]) -> "LocalQuery":
+        return self._with(projection=list(field_paths))
+
+    def start_after(self, document_fields) -> "LocalQuery":
+        return self._with(cursor=(document_fields, False))
+
+    def start_at(self, document_fields) -> "LocalQuery":
+        return self._with(cursor=(document_fields, True))
+
+    def _effective_orders(self) -> List[Tuple[str, str]]:
+        # Like Firestore, results are always finally ordered by document path
+        orders = list(self._orders)
+        if not orders or orders[-1][0] != "__name__":
+            orders.append(("__name__", orders[-1][1] if orders else ASCENDING))
+        return orders
+
+    def _cursor_keys(self, orders) -> List[Any]:
+        fields, _ = self._cursor
+        if isinstance(fields, LocalDocumentSnapshot):
+            values = [fields.reference if f == "__name__" else _get_field(fields._data or {}, f) for f, _ in orders]
+            if _MISSING in values:
+                raise ValueError("Cursor document is missing an order_by field")
+        elif isinstance(fields, dict):
+            values = [fields[f] for f, _ in orders[:len(fields)]]
+        else:
+            values = list(fields)
+        keys = []
+        for (field, _), value in zip(orders, values):
+            if field == "__name__" and isinstance(value, str):
+                value = LocalDocumentReference(self._store, value if self._group else f"{self._parent_path}/{value}")
+            keys.append(_order_key(value))
+        return keys
+
+    def _run(self) -> List[LocalDocumentSnapshot]:
+        orders = self._effective_orders()
+        if not self._group and not self._filters and len(orders) == 1:
+            rows = self._page_by_name(orders[0][1])
+        else:
+            rows = self._scan(orders)
+        return [
+            LocalDocumentSnapshot(
+                LocalDocumentReference(self._store, path),
+                _project(data, self._projection) if self._projection is not None else data,
+            )
+            for path, data in rows
+        ]
+
+    def _page_by_name(self, direction: str) -> List[Tuple[str, Dict[str, Any]]]:
+        # Unfiltered pages in document id order (bulk deletes, exports) are
+        # sliced from the collection's sorted ids instead of scanning it
+        collection = self._parent_path
+        with self._store._lock:
+            ids = self._store._sorted_ids(collection)
+            start, end = 0, len(ids)
+            if self._cursor is not None:
+                cursor_id = self._cursor_keys([("__name__", direction)])[0][1][-1]
+                inclusive = self._cursor[1]
+                if direction == ASCENDING:
+                    start = (bisect.bisect_left if inclusive else bisect.bisect_right)(ids, cursor_id)
+                else:
+                    end = (bisect.bisect_right if inclusive else bisect.bisect_left)(ids, cursor_id)
+            if direction == ASCENDING:
+                page = ids[start:end if self._limit is None else min(end, start + self._limit)]
+            else:
+                page = ids[start if self._limit is None else max(start, end - self._limit):end][::-1]
+            docs = self._store._collections.get(collection, {})
+            return [(f"{collection}/{doc_id}", docs[doc_id]) for doc_id in page]
+
+    def _scan(self, orders) -> List[Tuple[str, Dict[str, Any]]]:
+        rows = []
+        for path, data in self._store._candidates(self):
+            if not all(_matches(data, path, *f) for f in self._filters):
+                continue
+            keys = []
+            for field, _ in orders:
+                if field == "__name__":
+                    keys.append((6, tuple(path.split("/"))))
+                    continue
+                value = _get_field(data, field)
+                if value is _MISSING:
+                    # Documents without an order_by field are left out, as in Firestore
+                    break
+                keys.append(_order_key(value))
+            else:
+                rows.append((keys, path, data))
+
+        if self._cursor is not None:
+            cursor = self._cursor_keys(orders)
+            inclusive = self._cursor[1]
+
+            def after(keys):
+                for key, other, (_, direction) in zip(keys, cursor, orders):
+                    if key != other:
+                        return (key > other) == (direction == ASCENDING)
+                return inclusive
+
+            rows = [row for row in rows if after(row[0])]
+
+        directions = {direction for _, direction in orders}
+        if self._limit is not None and len(directions) == 1:
+            # One direction: a heap picks the page without sorting every match
+            pick = heapq.nsmallest if ASCENDING in directions else heapq.nlargest
+            rows = pick(self._limit, rows, key=lambda row: row[0])
+        else:
+            # Stable sorts, last order first, give a mixed-direction ordering
+            for i in reversed(range(len(orders))):
+                rows.sort(key=lambda row: row[0][i], reverse=orders[i][1] == DESCENDING)
+            if self._limit is not None:
+                rows = rows[:self._limit]
+        return [(path, data) for _, path, data in rows]
+
+    def stream(self, transaction=None) -> Iterator[LocalDocumentSnapshot]:
+        return iter(self._run())
+
+    def get(self, transaction=None) -> List[LocalDocumentSnapshot]:
+        return self._run()
+
+
+class LocalCollectionReference(LocalQuery):
+    def __init__(self, store: "LocalStore", path: str):
+        if len(path.split("/")) % 2 != 1:
+            raise ValueError(f"Not a collection path: {path}")
+        super().__init__(store, path)
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    @property
+    def parent(self) -> Optional["LocalDocumentReference"]:
+        return LocalDocumentReference(self._store, self.path.rsplit("/", 1)[0]) if "/" in self.path else None
+
+    def document(self, document_id: Optional[str] = None) -> "LocalDocumentReference":
+        if document_id is None:
+            document_id = "".join(random.choices(_AUTO_ID_CHARS, k=20))
+        return LocalDocumentReference(self._store, f"{self.path}/{document_id}")
+
+    def add(self, document_data: Dict[str, Any]):
+        ref = self.document()
+        ref.set(document_data)
+        return None, ref
+
+    def on_snapshot(self, callback: Callable) -> "LocalWatch":
+        return self._store._watch(self.path, callback)
+
+
+class LocalDocumentReference:
+    def __init__(self, store: "LocalStore", path: str):
+        if len(path.split("/")) % 2 != 0:
+            raise ValueError(f"Not a document path: {path}")
+        self._store = store
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def __eq__(self, other):
+        return isinstance(other, LocalDocumentReference) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+    @property
+    def parent(self) -> LocalCollectionReference:
+        return LocalCollectionReference(self._store, self.path.rsplit("/", 1)[0])
+
+    def collection(self, collection_id: str) -> LocalCollectionReference:
+        return LocalCollectionReference(self._store, f"{self.path}/{collection_id}")
+
+    def get(self, field_paths=None, transaction=None) -> LocalDocumentSnapshot:
+        return self._store._snapshot(self)
+
+    def set(self, document_data: Dict[str, Any], merge=False):
+        self._store._commit([("set", self, document_data, merge)])
+
+    def update(self, field_updates: Dict[str, Any]):
+        self._store._commit([("update", self, field_updates, None)])
+
+    def delete(self):
+        self._store._commit([("delete", self, None, None)])
+
+
+class LocalWriteBatch:
+    def __init__(self, store: "LocalStore"):
+        self._store = store
+        self._writes = []
+
+    def __len__(self):
+        return len(self._writes)
+
+    def set(self, reference: LocalDocumentReference, document_data: Dict[str, Any], merge=False):
+        self._writes.append(("set", reference, document_data, merge))
+
+    def update(self, reference: LocalDocumentReference, field_updates: Dict[str, Any]):
+        self._writes.append(("update", reference, field_updates, None))
+
+    def delete(self, reference: LocalDocumentReference):
+        self._writes.append(("delete", reference, None, None))
+
+    def commit(self):
+        writes, self._writes = self._writes, []
+        self._store._commit(writes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+
+
+class LocalWatch:
+    def __init__(self, store: "LocalStore", path: str, callback: Callable):
+        self._store, self._path, self._callback = store, path, callback
+
+    def unsubscribe(self):
+        with self._store._lock:
+            watchers = self._store._watchers.get(self._path, [])
+            if self in watchers:
+                watchers.remove(self)
+
+
+class LocalStore:
+    """
+    In-process document store with the Firestore client API the app uses
+    (see services/storage.py), for development and offline load tests.
+
+    Documents live in memory, grouped by collection path. Batched writes are
+    atomic and limited to MAX_BATCH_WRITES, like Firestore's. Queries filter
+    and sort in Python; an equality filter is served from a per-field hash
+    index built on first use and kept up to date on writes. With ``path`` set,
+    every commit is also written to that SQLite file (one transaction per
+    batch) and the documents are loaded from it on start.
+
+    Snapshot listeners are called synchronously after each commit with the
+    changed documents only, not the whole collection.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._indexes: Dict[Tuple[str, str], Dict[Any, set]] = {}
+        self._sorted: Dict[str, List[str]] = {}
+        self._watchers: Dict[str, List[LocalWatch]] = {}
+        self._lock = threading.RLock()
+        self._db = None
+        if path:
+            self._open(path)
+
+    # Firestore client API
+
+    def collection(self, path: str) -> LocalCollectionReference:
+        return LocalCollectionReference(self, path)
+
+    def collection_group(self, collection_id: str) -> LocalQuery:
+        return LocalQuery(self, collection_id, group=True)
+
+    def document(self, path: str) -> LocalDocumentReference:
+        return LocalDocumentReference(self, path)
+
+    def batch(self) -> LocalWriteBatch:
+        return LocalWriteBatch(self)
+
+    def get_all(self, references: Iterable[LocalDocumentReference], field_paths=None, transaction=None) -> Iterator[LocalDocumentSnapshot]:
+        with self._lock:
+            snapshots = [self._snapshot(ref) for ref in references]
+        return iter(snapshots)
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "sqlite" if self.path else "memory",
+                "collections": len(self._collections),
+                "documents": sum(len(docs) for docs in self._collections.values()),
+                "indexes": sorted(f"{col}.{field}" for col, field in self._indexes),
+            }
+
+    # Internals
+
+    def _snapshot(self, ref: LocalDocumentReference) -> LocalDocumentSnapshot:
+        collection, doc_id = ref.path.rsplit("/", 1)
+        with self._lock:
+            data = self._collections.get(collection, {}).get(doc_id)
+        return LocalDocumentSnapshot(ref, data)
+
+    def _sorted_ids(self, collection: str) -> List[str]:
+        # Rebuilt after documents are added to or removed from the collection
+        ids = self._sorted.get(collection)
+        if ids is None:
+            ids = self._sorted[collection] = sorted(self._collections.get(collection, {}))
+        return ids
+
+    def _index(self, collection: str, field: str) -> Dict[Any, set]:
+        index = self._indexes.get((collection, field))
+        if index is None:
+            index = self._indexes[(collection, field)] = {}
+            for doc_id, data in self._collections.get(collection, {}).items():
+                value = _get_field(data, field)
+                if value is not _MISSING:
+                    index.setdefault(_order_key(value), set()).add(doc_id)
+        return index
+
+    def _candidates(self, query: LocalQuery) -> List[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            if query._group:
+                return [
+                    (f"{collection}/{doc_id}", data)
+                    for collection, docs in self._collections.items()
+                    if collection.rsplit("/", 1)[-1] == query._parent_path
+                    for doc_id, data in docs.items()
+                ]
+            collection = query._parent_path
+            docs = self._collections.get(collection, {})
+            equality = next(((f, v) for f, op, v in query._filters if op == "==" and f != "__name__"), None)
+            if equality is not None:
+                ids = self._index(collection, equality[0]).get(_order_key(equality[1]), ())
+                return [(f"{collection}/{doc_id}", docs[doc_id]) for doc_id in ids]
+            return [(f"{collection}/{doc_id}", data) for doc_id, data in docs.items()]
+
+    def _commit(self, writes):
+        if len(writes) > MAX_BATCH_WRITES:
+            raise ValueError(f"A batch holds at most {MAX_BATCH_WRITES} writes, got {len(writes)}")
+        changes = []
+        with self._lock:
+            # Build every new document first so a failing write leaves nothing applied
+            staged: Dict[str, Optional[Dict[str, Any]]] = {}
+            for op, ref, data, merge in writes:
+                collection, doc_id = ref.path.rsplit("/", 1)
+                if ref.path in staged:
+                    current = staged[ref.path]
+                else:
+                    current = self._collections.get(collection, {}).get(doc_id)
+                if op == "delete":
+                    staged[ref.path] = None
+                elif op == "update":
+                    if current is None:
+                        raise NotFound(f"No document to update: {ref.path}")
+                    new = _copy(current)
+                    for field_path, value in data.items():
+                        _set_path(new, field_path.split("."), value)
+                    staged[ref.path] = new
+                elif merge is True:
+                    new = _copy(current) if current is not None else {}
+                    _merge(new, data)
+                    staged[ref.path] = new
+                elif merge:
+                    new = _copy(current) if current is not None else {}
+                    for field_path in merge:
+                        value = _get_field(data, field_path)
+                        if value is _MISSING:
+                            raise ValueError(f"Merge field {field_path} is not in the data")
+                        _set_path(new, field_path.split("."), value)
+                    staged[ref.path] = new
+                else:
+                    staged[ref.path] = _stored(dict(data))
+
+            self._persist(staged)
+            for path, new in staged.items():
+                collection, doc_id = path.rsplit("/", 1)
+                docs = self._collections.setdefault(collection, {})
+                old = docs.get(doc_id)
+                if (old is None) != (new is None):
+                    self._sorted.pop(collection, None)
+                if new is None:
+                    docs.pop(doc_id, None)
+                else:
+                    docs[doc_id] = new
+                for (indexed, field), index in self._indexes.items():
+                    if indexed != collection:
+                        continue
+                    for data, update in ((old, set.discard), (new, set.add)):
+                        value = _get_field(data, field) if data is not None else _MISSING
+                        if value is not _MISSING:
+                            update(index.setdefault(_order_key(value), set()), doc_id)
+                if collection in self._watchers and (old is not None or new is not None):
+                    kind = ChangeType.REMOVED if new is None else ChangeType.ADDED if old is None else ChangeType.MODIFIED
+                    changes.append((collection, DocumentChange(kind, LocalDocumentSnapshot(LocalDocumentReference(self, path), new if new is not None else old))))
+            watchers = {collection: list(self._watchers.get(collection, ())) for collection, _ in changes}
+        self._notify(changes, watchers)
+
+    def _watch(self, collection: str, callback: Callable) -> LocalWatch:
+        watch = LocalWatch(self, collection, callback)
+        with self._lock:
+            self._watchers.setdefault(collection, []).append(watch)
+            docs = [LocalDocumentSnapshot(LocalDocumentReference(self, f"{collection}/{doc_id}"), data)
+                    for doc_id, data in self._collections.get(collection, {}).items()]
+        callback(docs, [DocumentChange(ChangeType.ADDED, d) for d in docs], datetime.now(timezone.utc))
+        return watch
+
+    def _notify(self, changes, watchers):
+        by_collection: Dict[str, List[DocumentChange]] = {}
+        for collection, change in changes:
+            by_collection.setdefault(collection, []).append(change)
+        read_time = datetime.now(timezone.utc)
+        for collection, collection_changes in by_collection.items():
+            for watch in watchers.get(collection, ()):
+                try:
+                    watch._callback([c.document for c in collection_changes], collection_changes, read_time)
+                except Exception as e:
+                    logger.warning("Snapshot listener on %s failed: %s", collection, e)
+
+    def _open(self, path: str):
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS documents (collection TEXT NOT NULL, id TEXT NOT NULL, data TEXT NOT NULL, "
+            "PRIMARY KEY (collection, id))"
+        )
+        decode = _decoder(self)
+        for collection, doc_id, data in self._db.execute("SELECT collection, id, data FROM documents"):
+            self._collections.setdefault(collection, {})[doc_id] = json.loads(data, object_hook=decode)
+
+    def _persist(self, staged: Dict[str, Optional[Dict[str, Any]]]):
+        if self._db is None:
+            return
+        upserts, deletes = [], []
+        for path, data in staged.items():
+            collection, doc_id = path.rsplit("/", 1)
+            if data is None:
+                deletes.append((collection, doc_id))
+            else:
+                upserts.append((collection, doc_id, json.dumps(data, default=_encode, separators=(",", ":"))))
+        self._db.execute("BEGIN")
+        try:
+            self._db.executemany("INSERT OR REPLACE INTO documents (collection, id, data) VALUES (?, ?, ?)", upserts)
+            self._db.executemany("DELETE FROM documents WHERE collection = ? AND id = ?", deletes)
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
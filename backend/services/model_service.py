@@ -1,30 +1,58 @@
-import tensorflow as tf
+import mmap
 import numpy as np
-from PIL import Image
 import os
-import io
+import asyncio
+import logging
+import threading
+import config
+from services.backends import create_runner, import_runtime, resolve_backend
+from services.batching import BatchScheduler
+from services.image_pipeline import PreparedImage, TensorBufferPool, prepare_image
+from services.telemetry import stage
+
+logger = logging.getLogger(__name__)
 
 class ModelService:
-    def __init__(self, model_path: str, labels_path: str):
+    def __init__(self, model_path: str, labels_path: str, pool_size: int = 1, num_threads: int = None,
+                 max_batch_size: int = 1, max_wait_ms: float = 0.0, draft_size: int = 0, backend: str = "auto"):
         self.model_path = model_path
+        self.backend = resolve_backend(backend)
         self.labels_path = labels_path
+        self.pool_size = max(1, int(pool_size))
+        self.num_threads = num_threads
+        self.draft_size = draft_size
         self.interpreter = None
         self.input_details = None
         self.output_details = None
         self.labels = []
+        self.runners = []
         self._load_model()
         self._load_labels()
 
+        # Reusable input tensors, enough to keep every worker's batch queued
+        self.buffers = TensorBufferPool(self.input_details[0]['shape'], capacity=2 * self.pool_size * max(1, max_batch_size))
+
+        # predict() calls are queued to a pool of worker threads, each pinned
+        # to its own interpreter, which also group concurrent requests into batches.
+        self.scheduler = BatchScheduler(self.runners, max_batch_size, max_wait_ms)
+
     def _load_model(self):
         try:
-            print(f"Loading model from {self.model_path}")
-            self.interpreter = tf.lite.Interpreter(model_path=self.model_path)
-            self.interpreter.allocate_tensors()
-            self.input_details = self.interpreter.get_input_details()
-            self.output_details = self.interpreter.get_output_details()
-            print("Model loaded successfully")
+            logger.info("Loading model from %s with %s (%d interpreters, num_threads=%s)",
+                        self.model_path, self.backend, self.pool_size, self.num_threads)
+            self.runners = [create_runner(self.backend, self.model_path, self.num_threads) for _ in range(self.pool_size)]
+            self.interpreter = self.runners[0].interpreter
+            self.input_details = self.runners[0].input_details
+            self.output_details = self.runners[0].output_details
+
+            # One dummy inference per interpreter, before the pool threads own
+            # them, so delegate setup doesn't land on the first real request
+            dummy = np.zeros(self.input_details[0]['shape'], dtype=np.float32)
+            for runner in self.runners:
+                runner(dummy)
+            logger.info("Model loaded successfully")
         except Exception as e:
-            print(f"Error loading model: {e}")
+            logger.error("Error loading model: %s", e)
             raise e
 
     def _load_labels(self):
@@ -33,67 +61,160 @@ class ModelService:
                 # Assuming format "0 Labelname" or just "Labelname"
                 # Based on previous view_file, it's "0 Smartphone"
                 self.labels = [line.strip().split(' ', 1)[1] for line in f.readlines()]
-            print(f"Labels loaded: {self.labels}")
+            logger.info("Labels loaded: %s", self.labels)
         except Exception as e:
-            print(f"Error loading labels: {e}")
+            logger.error("Error loading labels: %s", e)
             self.labels = ["Unknown"]
 
-    def preprocess_image(self, image_data: bytes):
+    def prepare(self, image_data: bytes, thumbnail_size: int = 0) -> PreparedImage:
         """
-        Resize and normalize image for the model.
+        Decode once and return both the clarity score and the normalized
+        model input, written into a buffer from the pool (plus an archive
+        thumbnail when ``thumbnail_size`` is given).
         """
         try:
-            image = Image.open(io.BytesIO(image_data)).convert('RGB')
-            
             # Get input shape from model details
             input_shape = self.input_details[0]['shape']
             height = input_shape[1]
             width = input_shape[2]
-            
-            image = image.resize((width, height))
-            input_data = np.array(image, dtype=np.float32)
-            
-            # Add batch dimension
-            input_data = np.expand_dims(input_data, axis=0)
-            
-            # Normalize if required (usually 0-255 -> 0-1 or -1 to 1)
-            # Defaulting to 0-255 -> 0-1 as common in TFLite converted from Keras
-            # If the model expects 0-255, this might need adjustment.
-            # Usually TFLite image models expect normalized inputs.
-            input_data = input_data / 255.0
-            
-            return input_data
+
+            # One pass does decode, clarity, resize/normalize and the perceptual hash
+            with stage("decode"):
+                return prepare_image(image_data, width, height, out=self.buffers.acquire(), draft_size=self.draft_size,
+                                     thumbnail_size=thumbnail_size)
         except Exception as e:
-            print(f"Error preprocessing image: {e}")
+            logger.warning("Error preprocessing image: %s", e)
             raise e
 
-    def predict(self, image_data: bytes):
-        if not self.interpreter:
+    def preprocess_image(self, image_data: bytes):
+        """
+        Resize and normalize image for the model.
+        """
+        return self.prepare(image_data).input_data
+
+    def run_batch(self, input_data: np.ndarray) -> np.ndarray:
+        """
+        Run a stacked batch of preprocessed images on the interpreter pool
+        and return the output rows, one per image.
+        """
+        if not self.runners:
             raise Exception("Model not initialized")
+        with stage("inference"):
+            return self.scheduler.submit(input_data).result()
 
-        input_data = self.preprocess_image(image_data)
-        
-        self.interpreter.set_tensor(self.input_details[0]['index'], input_data)
-        self.interpreter.invoke()
-        
-        output_data = self.interpreter.get_tensor(self.output_details[0]['index'])
-        probs = output_data[0] # Probability array
-        
+    def postprocess(self, probs: np.ndarray):
+        with stage("postprocess"):
+            return self._postprocess(probs)
+
+    def _postprocess(self, probs: np.ndarray):
         # Get top prediction
         top_index = np.argmax(probs)
         confidence = float(probs[top_index])
         label = self.labels[top_index] if top_index < len(self.labels) else "Unknown"
-        
+
         return {
             "label": label,
             "confidence": confidence,
             "all_predictions": {self.labels[i]: float(probs[i]) for i in range(len(self.labels))} if len(self.labels) == len(probs) else {}
         }
 
-# Singleton instance to be used by API
+    def predict(self, image_data: bytes):
+        input_data = self.preprocess_image(image_data)
+        probs = self.run_batch(input_data)[0]
+        self.buffers.release(input_data)
+        return self.postprocess(probs)
+
+    async def predict_async(self, image_data: bytes):
+        """
+        Like predict(), but decodes in a worker thread and awaits a pool slot
+        instead of blocking the event loop.
+        """
+        prepared = await asyncio.to_thread(self.prepare, image_data)
+        return await self.infer_async(prepared)
+
+    async def infer_async(self, prepared: PreparedImage):
+        """Await inference for an image already decoded by prepare()."""
+        with stage("inference"):
+            probs = await asyncio.wrap_future(self.scheduler.submit(prepared.input_data))
+        self.buffers.release(prepared.input_data)
+        return self.postprocess(probs[0])
+
+    async def infer_batch_async(self, prepared: list):
+        """Await inference for several decoded images, stacked into one batch."""
+        input_data = np.concatenate([p.input_data for p in prepared], axis=0)
+        for p in prepared:
+            self.buffers.release(p.input_data)
+        with stage("inference"):
+            probs = await asyncio.wrap_future(self.scheduler.submit(input_data))
+        return [self.postprocess(row) for row in probs]
+
+    def predict_batch(self, images: list):
+        """Classify several images with a single invoke."""
+        if not images:
+            return []
+        tensors = [self.preprocess_image(data) for data in images]
+        input_data = np.concatenate(tensors, axis=0)
+        for tensor in tensors:
+            self.buffers.release(tensor)
+        return [self.postprocess(probs) for probs in self.run_batch(input_data)]
+
+    def stats(self):
+        return self.scheduler.stats()
+
+    def close(self):
+        self.scheduler.close()
+
+def model_path_for(variant: str, backend: str) -> str:
+    """model_<variant>.tflite, or model_<variant>.onnx for the ONNX Runtime backend."""
+    extension = "onnx" if backend == "onnxruntime" else "tflite"
+    return os.path.join(MODEL_DIR, f"model_{variant}.{extension}")
+
+
 # Paths are relative to backend/ execution context or absolute
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-MODEL_PATH = os.path.join(BASE_DIR, "../converted_tflite/model_unquant.tflite")
-LABELS_PATH = os.path.join(BASE_DIR, "../converted_tflite/labels.txt")
+MODEL_DIR = os.path.join(BASE_DIR, "../converted_tflite")
+MODEL_PATH = config.MODEL_PATH or model_path_for(config.MODEL_VARIANT, config.MODEL_BACKEND)
+LABELS_PATH = os.path.join(MODEL_DIR, "labels.txt")
+
+# Singleton instance to be used by API, created on first use (or by the
+# startup warm-up) so importing this module stays cheap
+_model_service = None
+_model_service_lock = threading.Lock()
+
+
+def get_model_service() -> ModelService:
+    global _model_service
+    if _model_service is None:
+        with _model_service_lock:
+            if _model_service is None:
+                _model_service = ModelService(
+                    MODEL_PATH,
+                    LABELS_PATH,
+                    pool_size=config.INFERENCE_POOL_SIZE,
+                    num_threads=config.INFERENCE_NUM_THREADS,
+                    max_batch_size=config.BATCH_MAX_SIZE,
+                    max_wait_ms=config.BATCH_MAX_WAIT_MS,
+                    draft_size=config.DECODE_DRAFT_SIZE,
+                    backend=config.MODEL_BACKEND,
+                )
+    return _model_service
+
+
+def is_model_loaded() -> bool:
+    return _model_service is not None
+
 
-model_service = ModelService(MODEL_PATH, LABELS_PATH)
+def preload_model() -> mmap.mmap:
+    """
+    Import the inference runtime and map the model file, in the server master
+    before it forks its workers. The workers inherit the imported runtime
+    copy-on-write, and TFLite memory-maps the model file read-only, so every
+    worker's interpreters read the same page-cache pages, which the master's
+    mapping keeps warm.
+    """
+    import_runtime(resolve_backend(config.MODEL_BACKEND))
+    with open(MODEL_PATH, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mmap, "MADV_WILLNEED"):
+        mapped.madvise(mmap.MADV_WILLNEED)
+    return mapped
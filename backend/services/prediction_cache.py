@@ -0,0 +1,146 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import config
+from services.telemetry import CallbackMetric
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of prediction results keyed by a hash of the uploaded
+    bytes, with a per-entry TTL and hit/miss counters.
+
+    Entries can also carry a 64-bit perceptual hash of the image. Near-identical
+    re-shots (different bytes, hashes within ``phash_max_distance`` bits) are
+    found through a band index: the hash is split into max_distance + 1 bands,
+    and by the pigeonhole principle any hash within that distance matches the
+    query exactly on at least one band.
+    """
+
+    def __init__(self, max_entries: int = 4096, ttl_seconds: float = 3600.0, phash_max_distance: int = 4):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl_seconds)
+        self.phash_max_distance = int(phash_max_distance)
+        self._entries: "OrderedDict[str, Tuple[float, Optional[int], Dict[str, Any]]]" = OrderedDict()
+        self._bands: Dict[Tuple[int, int], set] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        bands = max(1, self.phash_max_distance + 1)
+        width = -(-64 // bands)
+        self._band_masks = [(i * width, (1 << min(width, 64 - i * width)) - 1) for i in range(bands) if i * width < 64]
+
+    def _band_keys(self, phash: int):
+        return [(i, (phash >> shift) & mask) for i, (shift, mask) in enumerate(self._band_masks)]
+
+    def _remove(self, key: str):
+        _, phash, _ = self._entries.pop(key)
+        if phash is not None:
+            for band in self._band_keys(phash):
+                keys = self._bands.get(band)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._bands[band]
+
+    def _live(self, key: str, now: float) -> bool:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        if now - entry[0] > self.ttl:
+            self._remove(key)
+            return False
+        return True
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Exact lookup by content hash."""
+        with self._lock:
+            if not self._live(key, time.monotonic()):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][2]
+
+    def find_similar(self, phash: int) -> Optional[Tuple[Dict[str, Any], int]]:
+        """Closest entry whose perceptual hash is within phash_max_distance, with its distance."""
+        if self.phash_max_distance < 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            candidates = set()
+            for band in self._band_keys(phash):
+                candidates.update(self._bands.get(band, ()))
+
+            best = None
+            for key in candidates:
+                if not self._live(key, now):
+                    continue
+                distance = hamming_distance(phash, self._entries[key][1])
+                if distance <= self.phash_max_distance and (best is None or distance < best[1]):
+                    best = (key, distance)
+
+            if best is None:
+                return None
+            self._entries.move_to_end(best[0])
+            self.near_hits += 1
+            return self._entries[best[0]][2], best[1]
+
+    def put(self, key: str, value: Dict[str, Any], phash: Optional[int] = None):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic(), phash, value)
+            if phash is not None:
+                for band in self._band_keys(phash):
+                    self._bands.setdefault(band, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bands.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+prediction_cache = PredictionCache(
+    max_entries=config.PREDICTION_CACHE_SIZE,
+    ttl_seconds=config.PREDICTION_CACHE_TTL_SECONDS,
+    phash_max_distance=config.PREDICTION_CACHE_PHASH_DISTANCE,
+)
+
+CallbackMetric(
+    "ewaste_prediction_cache_lookups", "Prediction cache lookups by result.",
+    lambda: [((result,), prediction_cache.stats()[key]) for result, key in
+             (("hit", "hits"), ("near_hit", "near_hits"), ("miss", "misses"))],
+    labelnames=["result"], type="counter",
+)
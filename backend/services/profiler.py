@@ -0,0 +1,61 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+# Frames whose thread is parked rather than working (idle pool workers,
+# the event loop waiting on sockets); samples ending in them are dropped.
+_IDLE_FILES = ("threading.py", "queue.py", "selectors.py")
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of every thread in the process every ``interval_ms``
+    until stopped (or ``max_seconds``), and reports them in the collapsed
+    format flamegraph.pl and speedscope read ("a;b;c count" per line).
+
+    A request's work is spread over the event loop, the threadpool and the
+    inference workers, so all threads are sampled, not just the caller's;
+    concurrent requests show up in the same profile.
+    """
+
+    def __init__(self, interval_ms: float = 5.0, max_seconds: float = 30.0):
+        self.interval = max(0.001, interval_ms / 1000.0)
+        self.max_seconds = max_seconds
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == own or os.path.basename(frame.f_code.co_filename) in _IDLE_FILES:
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
@@ -0,0 +1,324 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+import config
+from services.submissions import take_batch, write_submissions
+from services.telemetry import REPORT_DEAD_LETTERS, REPORT_FLUSH_SECONDS, REPORT_FLUSH_SIZE, CallbackMetric
+
+logger = logging.getLogger(__name__)
+
+# Store errors that say nothing about the reports being written (an outage,
+# overload or contention), by Google API exception name
+_TRANSIENT_GOOGLE_ERRORS = {"ServiceUnavailable", "DeadlineExceeded", "InternalServerError", "TooManyRequests",
+                            "ResourceExhausted", "Aborted", "GatewayTimeout", "BadGateway", "RetryError"}
+
+
+def is_transient_error(error: Exception) -> bool:
+    """Whether a failed commit is worth retrying as is, rather than a problem with its reports."""
+    if isinstance(error, (ConnectionError, TimeoutError, sqlite3.OperationalError)):
+        return True
+    return type(error).__module__.startswith("google.") and type(error).__name__ in _TRANSIENT_GOOGLE_ERRORS
+
+
+class ReportWriter:
+    """
+    Write-behind queue for scan submissions (report insert + user increments).
+
+    submit() appends the submission to an on-disk NDJSON journal and an
+    in-memory queue and returns immediately. A flusher thread commits queued
+    submissions in bulk batched writes when ``flush_size`` are waiting or every
+    ``flush_interval_ms``, retrying failed commits with exponential backoff.
+    Committed ids are appended to the journal as checkpoint lines; on start the
+    journal is replayed so submissions accepted before a crash or restart are
+    still written, and it is truncated whenever the queue drains.
+
+    Reports are written under their submission id, so a replay never
+    duplicates a report. A crash between a commit and its checkpoint can
+    re-apply that batch's user increments once.
+
+    While the store is unavailable (see ``is_transient_error``) the queue is
+    kept and retried every ``failure_pause_s``, however long the outage. A
+    batch that fails every retry with any other error is halved, so the
+    reports ahead of a bad one still commit; a lone report that fails that way
+    is appended to ``dead_letter_path`` (or only logged, without one),
+    checkpointed and skipped, so it can't hold up the queue behind it.
+    """
+
+    def __init__(self, db_factory: Callable[[], Any], journal_path: Optional[str] = None, flush_size: int = 200,
+                 flush_interval_ms: float = 500.0, max_queue: int = 100000, max_retries: int = 5, fsync: bool = False,
+                 dead_letter_path: Optional[str] = None, failure_pause_s: float = 5.0):
+        self.db_factory = db_factory
+        self.journal_path = journal_path
+        # Upper bound per flush; take_batch() also keeps each one within Firestore's write limit
+        self.flush_size = max(1, int(flush_size))
+        self.flush_interval = max(0.0, float(flush_interval_ms)) / 1000.0
+        self.max_queue = int(max_queue)
+        self.max_retries = int(max_retries)
+        self.fsync = fsync
+        self.dead_letter_path = dead_letter_path
+        self.failure_pause_s = failure_pause_s
+        # Largest batch to try next: halved when a batch fails, doubled back on success
+        self._batch_limit = self.flush_size
+
+        self._queue: deque = deque()
+        self._cond = threading.Condition()
+        self._journal = None
+        self._thread = None
+        self._closing = False
+
+        self.submitted = 0
+        self.flushed = 0
+        self.batches = 0
+        self.retries = 0
+        self.dropped = 0
+        self.failed_batches = 0
+        self.dead_lettered = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._flush_ms_total = 0.0
+
+    # Lifecycle
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            if self.journal_path:
+                for submission in self._replay_journal():
+                    self._queue.append(submission)
+                if self._queue:
+                    logger.info("Replaying %d unflushed report(s) from %s", len(self._queue), self.journal_path)
+                self._rewrite_journal(list(self._queue))
+            self._thread = threading.Thread(target=self._run, name="report-writer", daemon=True)
+            self._thread.start()
+
+    def close(self, timeout: float = 10.0):
+        """Flush what is queued (within ``timeout``) and stop; anything left stays in the journal."""
+        with self._cond:
+            if self._thread is None:
+                return
+            self._closing = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        with self._cond:
+            if self._journal:
+                self._journal.close()
+                self._journal = None
+            self._thread = None
+            self._closing = False
+
+    # Producer side
+
+    def submit(self, submission: Dict[str, Any]) -> bool:
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self.dropped += 1
+                logger.error("Report queue full (%d), dropping report %s", self.max_queue, submission["id"])
+                return False
+            self._append_journal(submission)
+            self._queue.append(submission)
+            self.submitted += 1
+            # Wake the flusher when a batch starts (to begin its interval) or fills up
+            if len(self._queue) == 1 or len(self._queue) >= self.flush_size:
+                self._cond.notify()
+        return True
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queue_depth": len(self._queue),
+                "submitted": self.submitted,
+                "flushed": self.flushed,
+                "batches": self.batches,
+                "retries": self.retries,
+                "failed_batches": self.failed_batches,
+                "dead_lettered": self.dead_lettered,
+                "dropped": self.dropped,
+                "last_flush_ms": self.last_flush_ms,
+                "max_flush_ms": self.max_flush_ms,
+                "avg_flush_ms": self._flush_ms_total / self.batches if self.batches else 0.0,
+                "journal_bytes": os.path.getsize(self.journal_path) if self.journal_path and os.path.exists(self.journal_path) else 0,
+            }
+
+    # Journal
+
+    def _append_journal(self, record: Dict[str, Any]):
+        if not self.journal_path:
+            return
+        if self._journal is None:
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._journal.write(json.dumps(record, default=str) + "\n")
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+
+    def _replay_journal(self) -> List[Dict[str, Any]]:
+        if not os.path.exists(self.journal_path):
+            return []
+        pending, committed = {}, set()
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-write
+                    continue
+                if "committed" in record:
+                    committed.update(record["committed"])
+                else:
+                    pending[record["id"]] = record
+        return [s for i, s in pending.items() if i not in committed]
+
+    def _rewrite_journal(self, pending: List[Dict[str, Any]]):
+        if self._journal:
+            self._journal.close()
+            self._journal = None
+        tmp_path = self.journal_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for submission in pending:
+                f.write(json.dumps(submission, default=str) + "\n")
+        os.replace(tmp_path, self.journal_path)
+
+    # Flusher
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closing:
+                    self._cond.wait()
+                if len(self._queue) < self.flush_size and not self._closing:
+                    # Give a partial batch until the interval to fill up
+                    self._cond.wait(self.flush_interval)
+                if not self._queue:
+                    return
+                chunk = [self._queue[i] for i in range(take_batch(self._queue, self._batch_limit))]
+
+            error = self._commit(chunk)
+            transient = error is not None and is_transient_error(error)
+            if transient or (error is not None and len(chunk) > 1):
+                with self._cond:
+                    if self._closing:
+                        return
+                    if transient:
+                        # The store is down, not this batch: keep everything
+                        # queued and retry at full size once it is back
+                        self._batch_limit = self.flush_size
+                    else:
+                        # Narrow down on the report that fails
+                        self._batch_limit = max(1, len(chunk) // 2)
+                    self._pause()
+                continue
+            if error is not None:
+                if self._closing:
+                    return
+                self._dead_letter(chunk[0], error)
+
+            with self._cond:
+                for _ in chunk:
+                    self._queue.popleft()
+                if error is None:
+                    self.flushed += len(chunk)
+                    self._batch_limit = min(self.flush_size, self._batch_limit * 2)
+                else:
+                    self._batch_limit = self.flush_size
+                if self._queue:
+                    self._append_journal({"committed": [s["id"] for s in chunk]})
+                elif self.journal_path:
+                    # Everything is durable in Firestore, start a fresh journal
+                    self._rewrite_journal([])
+
+    def _pause(self):
+        # Back off before the next round; submit() notifies the condition too,
+        # so only close() cuts the pause short. Callers hold the lock
+        deadline = time.monotonic() + self.failure_pause_s
+        while not self._closing:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self._cond.wait(remaining)
+
+    def _dead_letter(self, submission: Dict[str, Any], error: Exception):
+        logger.error("Report %s failed %d commit attempts, setting it aside: %s", submission["id"], self.max_retries + 1, error)
+        if self.dead_letter_path:
+            record = {**submission, "error": str(error), "failed_at": time.time()}
+            try:
+                with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, default=str) + "\n")
+            except OSError as e:
+                logger.error("Could not write report %s to %s: %s", submission["id"], self.dead_letter_path, e)
+        REPORT_DEAD_LETTERS.inc()
+        with self._cond:
+            self.dead_lettered += 1
+
+    def _commit(self, chunk: List[Dict[str, Any]]) -> Optional[Exception]:
+        """Write ``chunk``, retrying with backoff; the last error if every attempt failed."""
+        delay = 0.1
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                write_submissions(self.db_factory(), chunk)
+            except Exception as e:
+                logger.warning("Report flush of %d failed (attempt %d): %s", len(chunk), attempt + 1, e)
+                error = e
+                if attempt == self.max_retries or self._closing:
+                    break
+                self.retries += 1
+                time.sleep(delay)
+                delay = min(delay * 2, 5.0)
+                continue
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            REPORT_FLUSH_SECONDS.observe(elapsed_ms / 1000)
+            REPORT_FLUSH_SIZE.observe(len(chunk))
+            with self._cond:
+                self.batches += 1
+                self.last_flush_ms = elapsed_ms
+                self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+                self._flush_ms_total += elapsed_ms
+            return None
+
+        with self._cond:
+            self.failed_batches += 1
+        return error
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_report_writer() -> ReportWriter:
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                from services.storage import get_store
+
+                _writer = ReportWriter(
+                    get_store,
+                    journal_path=config.REPORT_JOURNAL_PATH or None,
+                    flush_size=config.REPORT_QUEUE_FLUSH_SIZE,
+                    flush_interval_ms=config.REPORT_QUEUE_FLUSH_INTERVAL_MS,
+                    max_queue=config.REPORT_QUEUE_MAX_SIZE,
+                    max_retries=config.REPORT_QUEUE_MAX_RETRIES,
+                    fsync=config.REPORT_JOURNAL_FSYNC,
+                    dead_letter_path=config.REPORT_DEAD_LETTER_PATH or None,
+                )
+                _writer.start()
+    return _writer
+
+
+def is_report_writer_started() -> bool:
+    return _writer is not None
+
+
+def _queue_depth():
+    return [((), _writer.stats()["queue_depth"])] if _writer is not None else []
+
+
+CallbackMetric("ewaste_report_queue_depth", "Reports queued and not yet committed.", _queue_depth)
@@ -0,0 +1,365 @@
+"""
+Collection route planning for full and near-full bins (/api/admin/routes).
+
+This is a capacitated vehicle-routing problem. K trucks of equal capacity
+leave a depot, collect bins (each bin's load is its current_capacity, in
+kg) while the load fits, and return. It is solved with fast heuristics
+under a time budget:
+
+  1. Nearest neighbor: each truck in turn drives to the closest unvisited
+     bin that still fits, until none does.
+  2. 2-opt within each route: reverse the stretch between two edges when
+     that makes the route shorter. Vectorized over the second edge.
+  3. Or-opt: move a run of 1-3 consecutive bins, possibly reversed, to a
+     cheaper place in the same route or in another route with room. Only
+     places next to the run's nearest bins are tried.
+  4. Bins that fitted in no truck are inserted where room has opened up.
+
+Steps 2-4 repeat until nothing improves or the budget runs out, so a
+short budget still returns a valid, if longer, plan. Distances are
+great-circle distances, not road distances.
+"""
+import time
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from services.bin_index import has_coords
+from utils.geo import pairwise_distance_matrix
+
+# Moves must save at least this many meters, so rounding can't make them cycle
+MIN_GAIN_M = 1e-3
+# Or-opt tries to place a run of bins only next to this many of its nearest bins
+NEIGHBORS = 16
+MAX_SEGMENT = 3
+
+
+def fill_ratio(bin_data: Dict[str, Any]) -> float:
+    max_capacity = float(bin_data.get("max_capacity") or 0.0)
+    return float(bin_data.get("current_capacity") or 0.0) / max_capacity if max_capacity > 0 else 0.0
+
+
+def needs_collection(bin_data: Dict[str, Any], threshold: float) -> bool:
+    """Bins marked full, and active bins filled to at least ``threshold`` of max_capacity."""
+    status = bin_data.get("status", "active")
+    if status == "inactive" or not has_coords(bin_data):
+        return False
+    return status == "full" or fill_ratio(bin_data) >= threshold
+
+
+class SolveStats(NamedTuple):
+    construction_m: float
+    distance_m: float
+    moves: Dict[str, int]
+    passes: int
+    timed_out: bool
+
+
+class _Solver:
+    """
+    Routes are NumPy arrays of point indexes that start and end at the depot
+    (point 0); an unused truck's route is [0, 0].
+    """
+
+    def __init__(self, dist: np.ndarray, demand: np.ndarray, capacity: float, deadline: float):
+        self.dist = dist
+        self.demand = demand
+        self.capacity = capacity
+        self.deadline = deadline
+        self.tours: List[np.ndarray] = []
+        self.loads = np.zeros(0)
+        self.unassigned: List[int] = []
+        self.moves = {"two_opt": 0, "or_opt": 0, "insert": 0}
+        self.timed_out = False
+        self._layout = None
+        # Don't-look bits: or-opt skips runs starting at a bin that found no
+        # move, until an edge next to it changes
+        self.settled = np.zeros(len(dist), dtype=bool)
+
+        n = len(dist) - 1
+        k = min(NEIGHBORS, n - 1)
+        if k > 0:
+            bins = dist[1:, 1:]
+            np.fill_diagonal(bins, np.inf)
+            self.neighbors = np.argpartition(bins, k - 1, axis=1)[:, :k] + 1
+            np.fill_diagonal(bins, 0.0)
+            # Row 0 (the depot) is never looked up
+            self.neighbors = np.vstack((np.zeros((1, k), dtype=self.neighbors.dtype), self.neighbors))
+        else:
+            self.neighbors = np.zeros((n + 1, 0), dtype=np.int64)
+
+    def _out_of_time(self) -> bool:
+        if time.perf_counter() >= self.deadline:
+            self.timed_out = True
+        return self.timed_out
+
+    def length(self, tour: np.ndarray) -> float:
+        return float(self.dist[tour[:-1], tour[1:]].sum())
+
+    def total(self) -> float:
+        return sum(self.length(tour) for tour in self.tours)
+
+    # Construction
+
+    def nearest_neighbor(self, trucks: int):
+        free = np.ones(len(self.dist), dtype=bool)
+        free[0] = False
+        loads = []
+        for _ in range(trucks):
+            tour, load, current = [0], 0.0, 0
+            while True:
+                fits = free & (self.demand <= self.capacity - load)
+                if not fits.any():
+                    break
+                current = int(np.argmin(np.where(fits, self.dist[current], np.inf)))
+                free[current] = False
+                load += self.demand[current]
+                tour.append(current)
+            tour.append(0)
+            self.tours.append(np.array(tour, dtype=np.int64))
+            loads.append(load)
+        self.loads = np.array(loads)
+        # Fullest first, for the insertion step
+        self.unassigned = sorted(np.flatnonzero(free).tolist(), key=lambda i: -self.demand[i])
+
+    # 2-opt
+
+    def two_opt(self, r: int) -> bool:
+        tour = self.tours[r]
+        dist = self.dist
+        improved = False
+        again = True
+        while again and not self._out_of_time():
+            again = False
+            edges = dist[tour[:-1], tour[1:]]
+            for i in range(len(tour) - 3):
+                a, b = tour[i], tour[i + 1]
+                # Replace edges (a, b) and (c, d) with (a, c) and (b, d), for every later (c, d)
+                c, d = tour[i + 2:-1], tour[i + 3:]
+                delta = dist[a][c] + dist[b][d] - edges[i] - edges[i + 2:]
+                j = int(np.argmin(delta))
+                if delta[j] < -MIN_GAIN_M:
+                    j += i + 2
+                    self.settled[[a, b, tour[j], tour[j + 1]]] = False
+                    tour[i + 1:j + 1] = tour[i + 1:j + 1][::-1].copy()
+                    edges = dist[tour[:-1], tour[1:]]
+                    self.moves["two_opt"] += 1
+                    improved = again = True
+        if improved:
+            self._layout = None
+        return improved
+
+    # Or-opt
+
+    def _index(self):
+        """
+        The routes laid end to end (``flat``, route r starting at offsets[r]),
+        and where each bin is: its route (-1 if unassigned) and position.
+        """
+        if self._layout is None:
+            n = len(self.dist)
+            route_of = np.full(n, -1, dtype=np.int64)
+            pos_of = np.zeros(n, dtype=np.int64)
+            for r, tour in enumerate(self.tours):
+                route_of[tour[1:-1]] = r
+                pos_of[tour[1:-1]] = np.arange(1, len(tour) - 1)
+            flat = np.concatenate(self.tours)
+            offsets = np.cumsum([0] + [len(t) for t in self.tours[:-1]])
+            empty = next((r for r, t in enumerate(self.tours) if len(t) == 2), None)
+            self._layout = (route_of, pos_of, flat, offsets, empty)
+        return self._layout
+
+    def _move_segment(self, r: int, i: int, size: int) -> bool:
+        """Move tours[r][i:i+size] to its best place near its neighbours, if that is shorter."""
+        dist = self.dist
+        tour = self.tours[r]
+        segment = tour[i:i + size]
+        first, last = segment[0], segment[-1]
+        before, after = tour[i - 1], tour[i + size]
+        saved = dist[before, first] + dist[last, after] - dist[before, after]
+        if saved <= MIN_GAIN_M:
+            return False
+        load = float(self.demand[segment].sum())
+
+        # Candidate edges (route, position of their first point): on either side
+        # of each neighbour of the run's two ends, plus the empty trucks
+        route_of, pos_of, flat, offsets, empty = self._index()
+        near = np.concatenate((self.neighbors[first], self.neighbors[last]))
+        near = near[route_of[near] >= 0]
+        routes = np.concatenate((route_of[near], route_of[near]))
+        positions = np.concatenate((pos_of[near], pos_of[near] - 1))
+        if empty is not None:
+            routes = np.append(routes, empty)
+            positions = np.append(positions, 0)
+        if not len(routes):
+            return False
+
+        allowed = np.where(routes == r,
+                           (positions < i - 1) | (positions > i + size - 1),
+                           self.loads[routes] + load <= self.capacity)
+        if not allowed.any():
+            return False
+        routes, positions = routes[allowed], positions[allowed]
+        at = offsets[routes] + positions
+        c, d = flat[at], flat[at + 1]
+        forward = dist[c, first] + dist[last, d] - dist[c, d]
+        backward = dist[c, last] + dist[first, d] - dist[c, d]
+        cost = np.minimum(forward, backward)
+        best = int(np.argmin(cost))
+        if cost[best] - saved >= -MIN_GAIN_M:
+            return False
+
+        target, position = int(routes[best]), int(positions[best])
+        self.settled[[before, after, first, last, c[best], d[best]]] = False
+        moved = segment[::-1] if backward[best] < forward[best] else segment.copy()
+        remaining = np.concatenate((tour[:i], tour[i + size:]))
+        if target == r:
+            if position >= i:
+                position -= size
+            self.tours[r] = np.concatenate((remaining[:position + 1], moved, remaining[position + 1:]))
+        else:
+            other = self.tours[target]
+            self.tours[r] = remaining
+            self.tours[target] = np.concatenate((other[:position + 1], moved, other[position + 1:]))
+            self.loads[r] -= load
+            self.loads[target] += load
+        self._layout = None
+        self.moves["or_opt"] += 1
+        return True
+
+    def or_opt(self) -> bool:
+        improved = False
+        for r in range(len(self.tours)):
+            i = 1
+            while i < len(self.tours[r]) - 1:
+                if self._out_of_time():
+                    return improved
+                point = self.tours[r][i]
+                if self.settled[point]:
+                    i += 1
+                    continue
+                for size in range(1, MAX_SEGMENT + 1):
+                    if i + size < len(self.tours[r]) and self._move_segment(r, i, size):
+                        improved = True
+                        break
+                else:
+                    self.settled[point] = True
+                    i += 1
+        return improved
+
+    # Left-over bins
+
+    def insert_unassigned(self) -> bool:
+        improved = False
+        for point in list(self.unassigned):
+            need = self.demand[point]
+            best = None
+            for r, tour in enumerate(self.tours):
+                if self.loads[r] + need > self.capacity:
+                    continue
+                cost = self.dist[tour[:-1], point] + self.dist[point, tour[1:]] - self.dist[tour[:-1], tour[1:]]
+                j = int(np.argmin(cost))
+                if best is None or cost[j] < best[0]:
+                    best = (cost[j], r, j)
+            if best is not None:
+                _, r, j = best
+                self.settled[[self.tours[r][j], self.tours[r][j + 1]]] = False
+                self.tours[r] = np.insert(self.tours[r], j + 1, point)
+                self.loads[r] += need
+                self.unassigned.remove(point)
+                self._layout = None
+                self.moves["insert"] += 1
+                improved = True
+        return improved
+
+    def solve(self, trucks: int) -> SolveStats:
+        self.nearest_neighbor(trucks)
+        construction = self.total()
+        passes = 0
+        rechecked = False
+        while not self._out_of_time():
+            passes += 1
+            improved = False
+            for r in range(len(self.tours)):
+                improved |= self.two_opt(r)
+            improved |= self.or_opt()
+            if self.unassigned:
+                improved |= self.insert_unassigned()
+            if improved:
+                rechecked = False
+            elif rechecked:
+                break
+            else:
+                # 2-opt changes gains of bins away from the edges it touched,
+                # so clear the bits once before calling the routes converged
+                self.settled[:] = False
+                rechecked = True
+        return SolveStats(construction, self.total(), dict(self.moves), passes, self.timed_out)
+
+
+def solve_routes(lats, lngs, demand, depot: Tuple[float, float], trucks: int, capacity: float,
+                 time_budget_ms: float) -> Tuple[List[List[int]], List[float], List[int], SolveStats]:
+    """
+    Plan routes for points ``lats``/``lngs`` with loads ``demand``. Returns the
+    routes as lists of point indexes in visiting order (one per truck, maybe
+    empty), their lengths in meters, the points no truck had room for, and
+    solve statistics.
+    """
+    deadline = time.perf_counter() + time_budget_ms / 1000.0
+    dist = pairwise_distance_matrix(np.r_[depot[0], lats], np.r_[depot[1], lngs])
+    solver = _Solver(dist, np.r_[0.0, np.asarray(demand, dtype=np.float64)], capacity, deadline)
+    stats = solver.solve(trucks)
+    routes = [(tour[1:-1] - 1).tolist() for tour in solver.tours]
+    return routes, [solver.length(tour) for tour in solver.tours], [p - 1 for p in solver.unassigned], stats
+
+
+def plan_collection(bins: Iterable[Dict[str, Any]], threshold: float, trucks: int, capacity: float,
+                    time_budget_ms: float, depot: Optional[Tuple[float, float]] = None) -> Dict[str, Any]:
+    """
+    Pickup routes for every bin that needs collecting, as returned by
+    /api/admin/routes. Without a depot the trucks start from the bins' centroid.
+    """
+    start = time.perf_counter()
+    selected = sorted((b for b in bins if needs_collection(b, threshold)), key=lambda b: str(b.get("binId")))
+    lats = np.array([float(b["latitude"]) for b in selected], dtype=np.float64)
+    lngs = np.array([float(b["longitude"]) for b in selected], dtype=np.float64)
+    demand = np.array([max(0.0, float(b.get("current_capacity") or 0.0)) for b in selected], dtype=np.float64)
+    if depot is None:
+        depot = (float(lats.mean()), float(lngs.mean())) if len(selected) else (0.0, 0.0)
+
+    if selected:
+        routes, lengths, unassigned, stats = solve_routes(lats, lngs, demand, depot, trucks, capacity, time_budget_ms)
+    else:
+        routes, lengths, unassigned, stats = [[] for _ in range(trucks)], [0.0] * trucks, [], SolveStats(0.0, 0.0, {}, 0, False)
+
+    def stop(i):
+        b = selected[i]
+        return {"binId": b.get("binId"), "areaName": b.get("areaName"), "latitude": float(lats[i]),
+                "longitude": float(lngs[i]), "fill": round(fill_ratio(b), 3), "load_kg": round(float(demand[i]), 3)}
+
+    plans = []
+    for truck, (route, length) in enumerate(zip(routes, lengths), start=1):
+        plans.append({
+            "truck": truck,
+            "stops": [stop(i) for i in route],
+            "load_kg": round(float(demand[route].sum()), 3),
+            "distance_km": round(length / 1000, 3),
+        })
+    return {
+        "threshold": threshold,
+        "trucks": trucks,
+        "truck_capacity_kg": capacity,
+        "depot": {"latitude": depot[0], "longitude": depot[1]},
+        "bins_selected": len(selected),
+        "routes": plans,
+        "unassigned": [stop(i) for i in unassigned],
+        "total_distance_km": round(stats.distance_m / 1000, 3),
+        "solve": {
+            "construction_km": round(stats.construction_m / 1000, 3),
+            "improvement": round(1 - stats.distance_m / stats.construction_m, 4) if stats.construction_m else 0.0,
+            "moves": stats.moves,
+            "passes": stats.passes,
+            "timed_out": stats.timed_out,
+            "ms": round((time.perf_counter() - start) * 1000, 1),
+        },
+    }
@@ -0,0 +1,156 @@
+"""
+Scoring of a classified scan: waste category, estimated weight, star rating,
+credits and the message shown to the user. Shared by the scan endpoints and
+the offline rescoring tool.
+"""
+from typing import Any, Dict
+
+# Uploads below this clarity are rejected as too blurry before inference
+MIN_CLARITY = 0.15
+
+
+def categorize_waste(label: str, confidence: float):
+    """Categorize e-waste and estimate weight based on detected label"""
+    label_lower = label.lower()
+    
+    # E-waste categories with weight ranges (min, max in kg)
+    categories = {
+        "mobile": {
+            "keywords": ["mobile", "phone", "smartphone", "cell"],
+            "weight_range": (0.15, 0.25),
+            "base_stars": 2.5,
+            "recyclability": "recyclable"
+        },
+        "laptop": {
+            "keywords": ["laptop", "notebook", "computer"],
+            "weight_range": (1.5, 3.0),
+            "base_stars": 3.5,
+            "recyclability": "recyclable"
+        },
+        "charger": {
+            "keywords": ["charger", "adapter", "cable", "cord"],
+            "weight_range": (0.05, 0.15),
+            "base_stars": 1.5,
+            "recyclability": "recyclable"
+        },
+        "battery": {
+            "keywords": ["battery", "cell"],
+            "weight_range": (0.02, 0.5),
+            "base_stars": 2.0,
+            "recyclability": "partially_damaged"
+        },
+        "monitor": {
+            "keywords": ["monitor", "screen", "display", "tv", "television"],
+            "weight_range": (3.0, 10.0),
+            "base_stars": 4.5,
+            "recyclability": "recyclable"
+        },
+        "printer": {
+            "keywords": ["printer", "scanner"],
+            "weight_range": (5.0, 15.0),
+            "base_stars": 4.5,
+            "recyclability": "recyclable"
+        },
+        "mixed": {
+            "keywords": ["electronic", "device", "plastic", "waste", "trash", "mixed"],
+            "weight_range": (0.5, 2.0),
+            "base_stars": 2.0,
+            "recyclability": "recyclable"
+        }
+    }
+    
+    # Match label to category
+    for category, data in categories.items():
+        for keyword in data["keywords"]:
+            if keyword in label_lower:
+                # Estimate weight (average with slight randomness based on confidence)
+                weight_min, weight_max = data["weight_range"]
+                estimated_weight = weight_min + (weight_max - weight_min) * confidence
+                return category, estimated_weight, data["base_stars"], data["recyclability"]
+    
+    # Unknown/not e-waste
+    return "unknown", 0.0, 0.0, "unknown"
+
+
+def calculate_rating(waste_category: str, estimated_weight: float, clarity: float, confidence: float, base_stars: float):
+    """Calculate rating based on waste value, weight, clarity, and confidence"""
+    
+    if waste_category == "unknown" or confidence < 0.35:
+        # Not e-waste or too low confidence
+        return 0
+    
+    # Start with base stars for waste type
+    rating = base_stars
+    
+    # Weight contribution
+    if estimated_weight >= 5.0:
+        rating += 1.5
+    elif estimated_weight >= 1.0:
+        rating += 1.0
+    elif estimated_weight >= 0.1:
+        rating += 0.5
+    
+    # Image quality (clarity)
+    if clarity < 0.2:
+        rating -= 1.0  # Poor quality penalty
+    elif clarity > 0.4:
+        rating += 0.5  # Good quality bonus
+    
+    # Confidence multiplier
+    if confidence < 0.6:
+        rating *= 0.7  # Fair confidence
+    elif confidence < 0.8:
+        rating *= 0.85  # Good confidence
+    # Otherwise 100% (excellent confidence)
+    
+    # Clamp to 0-5 range and round
+    rating = max(0, min(5, round(rating)))
+    
+    # Deny if rating < 1
+    if rating < 1:
+        return 0
+    
+    return int(rating)
+
+
+def score_prediction(label: str, confidence: float, clarity: float) -> Dict[str, Any]:
+    """Rating, credits and user-facing message for a classified image."""
+    # Categorize waste and estimate weight
+    waste_category, estimated_weight, base_stars, recyclability = categorize_waste(label, confidence)
+
+    # Calculate rating
+    rating = calculate_rating(waste_category, estimated_weight, clarity, confidence, base_stars)
+
+    # Determine if this is valid e-waste
+    is_valid_waste = rating > 0 and waste_category != "unknown"
+
+    message = ""
+    denial_reason = None
+
+    if not is_valid_waste:
+        rating = 0
+        message = "Invalid image. No e-waste detected or confidence too low."
+        denial_reason = "Not valid e-waste"
+    else:
+        # Success messages based on rating
+        if rating >= 4:
+            message = f"Excellent! High-value {waste_category} detected. Clear image, good recyclability."
+        elif rating >= 3:
+            message = f"Good submission! {waste_category.capitalize()} detected and accepted."
+        elif rating >= 2:
+            message = f"{waste_category.capitalize()} detected but image could be clearer or item is small."
+        else:
+            message = f"Low-value item detected. Try submitting larger or clearer e-waste."
+
+    # Calculate credits: (rating × 10) + (weight × 5)
+    credits_earned = int((rating * 10) + (estimated_weight * 5)) if is_valid_waste else 0
+
+    return {
+        "waste_category": waste_category,
+        "estimated_weight_kg": estimated_weight,
+        "recyclability": recyclability,
+        "rating": rating,
+        "message": message,
+        "denial_reason": denial_reason,
+        "credits_earned": credits_earned,
+    }
@@ -0,0 +1,79 @@
+"""
+Document store used by the routers and services.
+
+Code talks to the store through this subset of the google-cloud-firestore
+client API, so the same calls run on Firestore or on the local store
+(services/local_store.py) used for development and offline load tests:
+
+    store.collection(path), collection_group(id), document(path), batch(), get_all(refs)
+    collection.document(id), on_snapshot(callback)
+    document.get(), set(data, merge=), update(fields), delete(), collection(id), parent
+    query.where(field, op, value), order_by(field, direction=), limit(n),
+        select(fields), start_after(snapshot | dict), stream(), get()
+    snapshot.id, exists, reference, to_dict(), get(field)
+    batch.set(ref, data, merge=), update(ref, fields), delete(ref), commit()
+
+Counters are written with increment(), which returns the transform the
+configured backend understands.
+"""
+import threading
+
+import config
+
+BACKENDS = ("firestore", "memory", "sqlite")
+ASCENDING = "ASCENDING"
+DESCENDING = "DESCENDING"
+
+_store = None
+_lock = threading.Lock()
+
+
+class Increment:
+    """Numeric increment transform for the local store (Firestore has its own)."""
+
+    def __init__(self, value):
+        self.value = value
+
+
+def increment(value):
+    if config.STORAGE_BACKEND == "firestore":
+        from firebase_admin import firestore
+
+        return firestore.Increment(value)
+    return Increment(value)
+
+
+def create_store(backend: str, sqlite_path: str = ""):
+    if backend == "firestore":
+        from utils.auth import init_firebase
+
+        init_firebase()
+        from firebase_admin import firestore
+
+        return firestore.client()
+    if backend in ("memory", "sqlite"):
+        from services.local_store import LocalStore
+
+        return LocalStore(sqlite_path if backend == "sqlite" else None)
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}, use one of {', '.join(BACKENDS)}")
+
+
+def get_store():
+    """The process-wide store for STORAGE_BACKEND, created on first use (or by the startup warm-up)."""
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                _store = create_store(config.STORAGE_BACKEND, config.STORAGE_SQLITE_PATH)
+    return _store
+
+
+def set_store(store):
+    """Replace the process-wide store, e.g. with a pre-filled local store in a benchmark."""
+    global _store
+    with _lock:
+        _store = store
+
+
+def is_store_ready() -> bool:
+    return _store is not None
@@ -0,0 +1,110 @@
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, Dict, Iterable, List
+
+from services.analytics_engine import aggregate_docs, as_increments, combine_deltas
+from services.bin_capacity import apply_capacity_updates, capacity_fields, capacity_updates, deposited_kg
+from services.storage import increment
+
+# A Firestore batch holds at most 500 writes
+MAX_BATCH_WRITES = 500
+
+
+def make_submission(user: Dict[str, Any], report_doc: Dict[str, Any], stars: int, credits: int) -> Dict[str, Any]:
+    """
+    JSON-serializable record of one scan's writes. The id doubles as the report
+    document id, so replaying a submission rewrites the same report.
+    """
+    return {
+        "id": uuid.uuid4().hex,
+        "ts": time.time(),
+        "user": {field: user.get(field) for field in ("uid", "name", "email")},
+        "report": report_doc,
+        "stars": stars,
+        "credits": credits,
+    }
+
+
+def user_stats_update(user: Dict[str, Any], stars: int, credits: int, tests: int = 1) -> Dict[str, Any]:
+    """
+    Fields for a merge-write of users/{uid}: server-side increments, so
+    concurrent submissions for the same user never overwrite each other, and
+    the document is created on first use. Profile fields are only written when
+    the token actually carries them.
+    """
+    update = {
+        "totalStars": increment(stars),
+        "totalCredits": increment(credits),
+        "testsCompleted": increment(tests),
+    }
+    for field in ("name", "email"):
+        if user.get(field):
+            update[field] = user[field]
+    return update
+
+
+def submission_time(submission: Dict[str, Any]) -> datetime:
+    return datetime.fromtimestamp(submission["ts"], tz=timezone.utc)
+
+
+def take_batch(pending: Iterable[Dict[str, Any]], max_items: int) -> int:
+    """
+    How many leading submissions fit in one batched write: one report each,
+    plus every distinct user, bin and aggregate document they touch.
+    """
+    docs = set()
+    count = 0
+    for s in islice(pending, max_items):
+        new_docs = aggregate_docs(s["report"], submission_time(s)) | {("users", s["user"]["uid"])}
+        if deposited_kg(s["report"]) > 0:
+            new_docs.add(("bins", s["report"]["binId"]))
+        new_docs -= docs
+        if count and count + 1 + len(docs) + len(new_docs) > MAX_BATCH_WRITES:
+            break
+        docs |= new_docs
+        count += 1
+    return count
+
+
+def write_submissions(db, submissions: List[Dict[str, Any]]):
+    """
+    Commit submissions as one batched write: every report, a single increment
+    per user summing that user's stars, credits and scans, one fill-level
+    increment per bin, and the analytics aggregates (global, per-day, per-bin,
+    per-user) they roll up into. Size batches with take_batch() to stay within
+    MAX_BATCH_WRITES.
+    """
+    totals = defaultdict(lambda: [0, 0, 0])
+    users = {}
+    batch = db.batch()
+    for s in submissions:
+        uid = s["user"]["uid"]
+        users[uid] = s["user"]
+        totals[uid][0] += s["stars"]
+        totals[uid][1] += s["credits"]
+        totals[uid][2] += 1
+        batch.set(db.collection("reports").document(s["id"]), {**s["report"], "createdAt": submission_time(s)})
+
+    aggregates = combine_deltas((s["report"], submission_time(s)) for s in submissions)
+    for uid, (stars, credits, tests) in totals.items():
+        update = user_stats_update(users[uid], stars, credits, tests)
+        update.update(as_increments(aggregates.pop(("users", uid), {})))
+        batch.set(db.collection("users").document(uid), update, merge=True)
+    for (collection, doc_id), fields in aggregates.items():
+        batch.set(db.collection(collection).document(doc_id), as_increments(fields), merge=True)
+    capacity = capacity_updates(s["report"] for s in submissions)
+    for bin_id, update in capacity.items():
+        batch.set(db.collection("bins").document(bin_id), capacity_fields(update), merge=True)
+    batch.commit()
+    apply_capacity_updates(capacity)
+
+
+def record_submission(db, user: Dict[str, Any], report_doc: Dict[str, Any], stars: int, credits: int):
+    """
+    Apply a scan's user stat increments and insert its report in a single
+    batched write: one round-trip, and both land or neither does.
+    """
+    write_submissions(db, [make_submission(user, report_doc, stars, credits)])
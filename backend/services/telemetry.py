@@ -0,0 +1,277 @@
+"""
+Prometheus metrics (served at /metrics), per-stage request timing and
+optional OpenTelemetry traces.
+
+Metrics are kept in a small in-process registry and rendered in the
+Prometheus text format, so no client library is needed. With OTEL_TRACES=1
+and opentelemetry-api installed, every request and stage also becomes a
+span; spans are exported by whatever SDK is configured (e.g. with
+opentelemetry-instrument), and are no-ops otherwise.
+"""
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import config
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            try:
+                lines.extend(metric.lines())
+            except Exception as e:
+                logger.warning("Metric %s failed to render: %s", metric.name, e)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels[n] for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def lines(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}_total{_labels(self.labelnames, k)} {_number(v)}" for k, v in sorted(values.items())]
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # Per label set: [count per bucket (non-cumulative)], sum, count
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels[n] for n in self.labelnames)
+        i = next(i for i, bound in enumerate(self.buckets) if value <= bound)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def lines(self) -> List[str]:
+        with self._lock:
+            snapshot = {k: (list(s[0]), s[1], s[2]) for k, s in self._series.items()}
+        lines = []
+        for key, (counts, total, count) in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class CallbackMetric:
+    """A gauge or counter read from existing stats when /metrics is scraped."""
+
+    def __init__(self, name: str, help: str, read: Callable[[], Iterable[Tuple[Sequence, float]]],
+                 labelnames: Sequence[str] = (), type: str = "gauge"):
+        self.name, self.help, self.labelnames, self.type = name, help, tuple(labelnames), type
+        self.read = read
+        REGISTRY.register(self)
+
+    def lines(self) -> List[str]:
+        suffix = "_total" if self.type == "counter" else ""
+        return [f"{self.name}{suffix}{_labels(self.labelnames, k)} {_number(v)}" for k, v in self.read()]
+
+
+REQUEST_SECONDS = Histogram("ewaste_http_request_duration_seconds", "HTTP request latency by route.", ["method", "route", "status"])
+STAGE_SECONDS = Histogram("ewaste_request_stage_seconds", "Time spent in each stage of handling a request.", ["stage"])
+INFERENCE_QUEUE_WAIT_SECONDS = Histogram("ewaste_inference_queue_wait_seconds", "Time a request waits for an inference worker.")
+INFERENCE_BATCH_SIZE = Histogram("ewaste_inference_batch_size", "Images per interpreter invoke.", buckets=(1, 2, 4, 8, 16, 32, 64))
+INFERENCE_INVOKE_SECONDS = Histogram("ewaste_inference_invoke_seconds", "Interpreter invoke time per batch.")
+REPORT_FLUSH_SECONDS = Histogram("ewaste_report_flush_seconds", "Batched write time of queued reports.")
+REPORT_DEAD_LETTERS = Counter("ewaste_report_dead_letters", "Reports set aside after every commit attempt failed.")
+REPORT_FLUSH_SIZE = Histogram("ewaste_report_flush_size", "Reports per batched write.", buckets=(1, 5, 10, 25, 50, 100, 200, 500))
+
+
+# Stages and traces
+
+_tracer = None
+if config.OTEL_TRACES:
+    try:
+        from opentelemetry import trace
+
+        _tracer = trace.get_tracer("ewaste-backend")
+    except ImportError:
+        logger.warning("OTEL_TRACES is set but opentelemetry-api is not installed; tracing is off")
+
+# Stage durations of the current request, for the slow-request log and Server-Timing
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as one stage of the current request (histogram, Server-Timing, span)."""
+    span = _tracer.start_as_current_span(name) if _tracer is not None else nullcontext()
+    start = time.perf_counter()
+    try:
+        with span:
+            yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        timings = _timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed
+
+
+def _route(scope) -> str:
+    # The route template keeps label values bounded (not /api/bins/BIN-123).
+    # Routes of included routers carry their path without the include prefix,
+    # so the prefix is taken from the request path (prefixes here are static).
+    template = getattr(scope.get("route"), "path", None)
+    if not template:
+        return "unmatched"
+    segments = len(template.strip("/").split("/")) if template.strip("/") else 0
+    parts = scope["path"].rstrip("/").split("/")
+    return "/".join(parts[:len(parts) - segments]) + template
+
+
+class TelemetryMiddleware:
+    """
+    ASGI middleware: request latency histogram, a Server-Timing header with
+    the stage durations, a log line for requests slower than SLOW_REQUEST_MS,
+    a server span per request when tracing is on, and the per-request
+    sampling profiler (X-Profile header, when PROFILE_REQUESTS is on).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def _wants_profile(self, headers: Dict[bytes, bytes]) -> bool:
+        if not config.PROFILE_REQUESTS:
+            return False
+        value = headers.get(b"x-profile", b"").decode()
+        if not value:
+            return False
+        return value == config.PROFILE_TOKEN if config.PROFILE_TOKEN else value not in ("0", "false")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        timings: Dict[str, float] = {}
+        token = _timings.set(timings)
+        status = 500
+        start = time.perf_counter()
+
+        profiler = None
+        if self._wants_profile(headers):
+            from services.profiler import SamplingProfiler
+
+            profiler = SamplingProfiler(config.PROFILE_INTERVAL_MS, config.PROFILE_MAX_SECONDS)
+            profiler.start()
+
+        async def send_with_timing(message):
+            nonlocal status, profiler
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                extra = []
+                if timings:
+                    extra.append((b"server-timing", ", ".join(f"{k};dur={v * 1000:.2f}" for k, v in timings.items()).encode()))
+                if profiler is not None:
+                    extra.append((b"x-profile", self._save_profile(profiler, scope).encode()))
+                    profiler = None
+                if extra:
+                    message = {**message, "headers": list(message.get("headers", [])) + extra}
+            await send(message)
+
+        span = nullcontext()
+        if _tracer is not None:
+            from opentelemetry import trace
+            from opentelemetry.propagate import extract
+
+            carrier = {k.decode("latin-1"): v.decode("latin-1") for k, v in headers.items()}
+            span = _tracer.start_as_current_span(f"{scope['method']} {scope['path']}", context=extract(carrier),
+                                                 kind=trace.SpanKind.SERVER)
+        try:
+            with span:
+                await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = time.perf_counter() - start
+            _timings.reset(token)
+            if profiler is not None:
+                self._save_profile(profiler, scope)
+            route = _route(scope)
+            REQUEST_SECONDS.observe(elapsed, method=scope["method"], route=route, status=status)
+            if config.SLOW_REQUEST_MS > 0 and elapsed * 1000 >= config.SLOW_REQUEST_MS:
+                logger.warning("Slow request", extra={
+                    "method": scope["method"], "route": route, "status": status, "ms": round(elapsed * 1000, 2),
+                    "stages_ms": {k: round(v * 1000, 2) for k, v in timings.items()},
+                })
+
+    def _save_profile(self, profiler, scope) -> str:
+        profiler.stop()
+        os.makedirs(config.PROFILE_DIR, exist_ok=True)
+        path = os.path.join(config.PROFILE_DIR, f"profile-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.txt")
+        with open(path, "w") as f:
+            f.write(profiler.collapsed())
+        logger.info("Profile saved", extra={"path": path, "route": _route(scope), "samples": profiler.samples})
+        return path
@@ -0,0 +1,227 @@
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import config
+from services.telemetry import CallbackMetric
+
+logger = logging.getLogger(__name__)
+
+# Where Firebase publishes the public keys ID tokens are signed with
+ID_TOKEN_CERT_URI = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+def token_key(token: str) -> bytes:
+    # Only a digest is kept, so a heap dump does not hold usable tokens
+    return hashlib.sha256(token.encode()).digest()
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of verified ID token claims keyed by a hash of the
+    token. An entry is dropped when the token's ``exp`` passes (less
+    ``expiry_margin`` seconds), or after ``max_age`` seconds if that is
+    sooner. Failed verifications are never cached.
+
+    Concurrent misses for the same token share a single verification.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_age: float = 3600.0, expiry_margin: float = 5.0):
+        self.max_entries = max(1, int(max_entries))
+        self.max_age = float(max_age)
+        self.expiry_margin = float(expiry_margin)
+        self._entries: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[bytes, threading.Event] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.failures = 0
+        self.verifications = 0
+        self.verify_seconds = 0.0
+
+    def _lookup(self, key: bytes, now: float) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if now >= entry[0]:
+            del self._entries[key]
+            self.expired += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """Cached claims for ``token``, or None (counted as a miss)."""
+        with self._lock:
+            claims = self._lookup(token_key(token), time.time())
+            if claims is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return claims
+
+    def put(self, token: str, claims: Dict[str, Any]):
+        now = time.time()
+        expires = now + self.max_age
+        if "exp" in claims:
+            expires = min(expires, float(claims["exp"]) - self.expiry_margin)
+        if expires <= now:
+            return
+        with self._lock:
+            self._entries[token_key(token)] = (expires, claims)
+            self._entries.move_to_end(token_key(token))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def verify(self, token: str, verifier: Callable[[str], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Claims for ``token`` from the cache, or from ``verifier`` (which raises
+        on an invalid token). Blocking; call it from a worker thread on a miss.
+        """
+        key = token_key(token)
+        while True:
+            with self._lock:
+                claims = self._lookup(key, time.time())
+                if claims is not None:
+                    return claims
+                waiting = self._inflight.get(key)
+                if waiting is None:
+                    done = self._inflight[key] = threading.Event()
+                    break
+            # Another thread is verifying this token; use its result
+            waiting.wait()
+
+        start = time.perf_counter()
+        try:
+            claims = verifier(token)
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            raise
+        else:
+            self.put(token, claims)
+            return claims
+        finally:
+            with self._lock:
+                self.verifications += 1
+                self.verify_seconds += time.perf_counter() - start
+                del self._inflight[key]
+            done.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "max_age_seconds": self.max_age,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "verifications": self.verifications,
+                "failures": self.failures,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "avg_verify_ms": round(1000 * self.verify_seconds / self.verifications, 3) if self.verifications else 0.0,
+            }
+
+
+class SigningKeyRefresher:
+    """
+    Keeps the SDK's HTTP cache of token signing keys warm. Firebase Admin
+    fetches the keys through a Cache-Control aware session when a cached copy
+    has expired, which puts a blocking HTTPS round trip on whichever request
+    verifies a token next. This thread re-fetches them (bypassing the cache)
+    once ``refresh_fraction`` of their max-age has passed, so that the
+    verification path always finds a fresh copy. If ``request_factory``
+    returns None, key refresh is unsupported and the thread exits.
+    """
+
+    def __init__(self, request_factory: Callable[[], Callable], url: str = ID_TOKEN_CERT_URI,
+                 refresh_fraction: float = 0.8, min_interval: float = 60.0, retry_interval: float = 30.0):
+        self.request_factory = request_factory
+        self.url = url
+        self.refresh_fraction = refresh_fraction
+        self.min_interval = min_interval
+        self.retry_interval = retry_interval
+        self.refreshes = 0
+        self.errors = 0
+        self.last_refresh = None
+        self.last_error = None
+        self.next_refresh = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self) -> Optional[float]:
+        """Fetch the keys now; returns the seconds until the next refresh, or None if unsupported."""
+        request = self.request_factory()
+        if request is None:
+            return None
+        response = request(self.url, headers={"Cache-Control": "no-cache"})
+        if response.status != 200:
+            raise RuntimeError(f"Signing key fetch returned HTTP {response.status}")
+        match = _MAX_AGE.search(response.headers.get("cache-control", ""))
+        self.refreshes += 1
+        self.last_refresh = time.time()
+        self.last_error = None
+        max_age = int(match.group(1)) if match else 0
+        return max(self.min_interval, max_age * self.refresh_fraction)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                delay = self.refresh()
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+                logger.warning("Signing key refresh failed: %s", e)
+                delay = self.retry_interval
+            if delay is None:
+                self.last_error = "unsupported"
+                logger.info("Signing key refresh disabled; token verification fetches the keys itself")
+                return
+            self.next_refresh = time.time() + delay
+            self._stop.wait(delay)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="signing-key-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+            "last_refresh": self.last_refresh,
+            "next_refresh": self.next_refresh,
+            "last_error": self.last_error,
+        }
+
+
+token_cache = TokenCache(
+    max_entries=config.TOKEN_CACHE_SIZE,
+    max_age=config.TOKEN_CACHE_MAX_AGE_SECONDS,
+)
+
+CallbackMetric(
+    "ewaste_token_cache_lookups", "ID token cache lookups by result.",
+    lambda: [((result,), token_cache.stats()[key]) for result, key in (("hit", "hits"), ("miss", "misses"))],
+    labelnames=["result"], type="counter",
+)
@@ -0,0 +1,44 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Per-component warm-up state: pending -> loading -> ready | failed
+_state: Dict[str, Dict] = {}
+_lock = threading.Lock()
+
+
+def _set(name: str, **fields):
+    with _lock:
+        _state.setdefault(name, {"status": "pending", "seconds": None, "error": None}).update(fields)
+
+
+def run_warmup(tasks: List[Tuple[str, Callable[[], object]]]):
+    """Run each (name, fn) warm-up task in order, recording its outcome."""
+    for name, _ in tasks:
+        _set(name)
+    for name, fn in tasks:
+        _set(name, status="loading")
+        start = time.perf_counter()
+        try:
+            fn()
+            _set(name, status="ready", seconds=round(time.perf_counter() - start, 3))
+        except Exception as e:
+            logger.error("Warm-up of %s failed: %s", name, e)
+            _set(name, status="failed", seconds=round(time.perf_counter() - start, 3), error=str(e))
+
+
+def start_warmup(tasks: List[Tuple[str, Callable[[], object]]]) -> threading.Thread:
+    """Warm up in a background thread so the server starts answering immediately."""
+    for name, _ in tasks:
+        _set(name)
+    thread = threading.Thread(target=run_warmup, args=(tasks,), name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def warmup_status() -> Dict[str, Dict]:
+    with _lock:
+        return {name: dict(state) for name, state in _state.items()}
@@ -0,0 +1,15 @@
+import os
+import sys
+
+# Settings are read when config is imported: run against the in-memory store,
+# with no report journal, token key refresher or image archive
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+os.environ.setdefault("REPORT_JOURNAL_PATH", "")
+os.environ.setdefault("REPORT_DEAD_LETTER_PATH", "")
+os.environ.setdefault("TOKEN_KEY_REFRESH", "0")
+os.environ.setdefault("IMAGE_ARCHIVE", "off")
+os.environ.setdefault("WARMUP_ON_STARTUP", "0")
+os.environ.setdefault("BIN_INDEX_LISTEN", "0")
+os.environ.setdefault("PREDICTION_CACHE_PHASH_DISTANCE", "-1")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
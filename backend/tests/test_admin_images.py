@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from services.image_archive import ImageArchiver, LocalArchive, image_key
+
+AUTH = {"Authorization": "Bearer mock-token"}
+IMAGE_HASH = "ab" * 32
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    import main
+    from routers import admin
+
+    backend = LocalArchive(str(tmp_path))
+    backend.put(image_key(IMAGE_HASH), b"\xff\xd8\xff\xe0 not really a jpeg", "image/jpeg")
+    archiver = SimpleNamespace(backend=backend, content_type=ImageArchiver.content_type)
+    monkeypatch.setattr(admin, "get_image_archiver", lambda: archiver)
+    with TestClient(main.app) as client:
+        yield client
+    main.app.dependency_overrides.clear()
+
+
+def test_archived_images_need_an_admin_token(client):
+    import main
+    from utils.auth import verify_token
+
+    assert client.get(f"/api/admin/images/{IMAGE_HASH}").status_code == 422
+    assert client.get(f"/api/admin/images/{IMAGE_HASH}", headers={"Authorization": "Bearer bad"}).status_code == 401
+    assert client.get(f"/api/admin/images/{IMAGE_HASH}", headers=AUTH).status_code == 403
+
+    main.app.dependency_overrides[verify_token] = lambda: {"uid": "admin-user", "admin": True}
+    response = client.get(f"/api/admin/images/{IMAGE_HASH}")
+    assert response.status_code == 200
+    assert response.content.startswith(b"\xff\xd8")
+    assert response.headers["Cache-Control"] == "private, no-store"
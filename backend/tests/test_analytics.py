@@ -0,0 +1,27 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+from services.analytics_engine import GLOBAL_DOC, combine_deltas, merge_fields, summarize
+
+
+def test_aggregate_matches_a_scan_of_the_reports():
+    rng = random.Random(0)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    reports = []
+    for i in range(1000):
+        rating = rng.choice([0, 0, 1, 2, 3, 4, 5])
+        reports.append(({"userId": f"user-{i % 50}", "binId": f"BIN-{i % 20:03d}", "rating": rating,
+                         "credits_earned": rating * 10, "waste_category": rng.choice(["Battery", "Laptop", "Cable"]),
+                         "estimated_weight_kg": round(rng.uniform(0.05, 2.5), 2)}, start + timedelta(minutes=i * 37)))
+
+    doc = {}
+    # Flush-sized deltas summed into one document, as the report writer does
+    for i in range(0, len(reports), 200):
+        merge_fields(doc, combine_deltas(reports[i:i + 200])[GLOBAL_DOC])
+    summary = summarize(doc)
+
+    passed = sum(1 for r, _ in reports if r["rating"] > 0)
+    assert summary["total_tests"] == len(reports)
+    assert summary["tests_passed"] == passed
+    assert summary["tests_failed"] == len(reports) - passed
+    assert summary["total_stars"] == sum(r["rating"] for r, _ in reports)
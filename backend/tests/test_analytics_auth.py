@@ -0,0 +1,39 @@
+import pytest
+from fastapi.testclient import TestClient
+
+AUTH = {"Authorization": "Bearer mock-token"}
+
+
+@pytest.fixture(scope="module")
+def client():
+    import main
+
+    with TestClient(main.app) as client:
+        yield client
+
+
+def test_user_analytics_needs_the_users_token(client):
+    assert client.get("/api/analytics/user/mock-user").status_code == 422
+    assert client.get("/api/analytics/user/mock-user", headers={"Authorization": "Bearer bad"}).status_code == 401
+    assert client.get("/api/analytics/user/someone-else", headers=AUTH).status_code == 403
+    response = client.get("/api/analytics/user/mock-user", headers=AUTH)
+    assert response.status_code == 200
+    assert response.json()["uid"] == "mock-user"
+
+
+@pytest.mark.parametrize("path", ["/history", "/series?start=2026-01-01&end=2026-01-31"])
+def test_user_history_and_series_need_the_users_token(client, path):
+    assert client.get(f"/api/analytics/user/mock-user{path}").status_code == 422
+    assert client.get(f"/api/analytics/user/someone-else{path}", headers=AUTH).status_code == 403
+    assert client.get(f"/api/analytics/user/mock-user{path}", headers=AUTH).status_code == 200
+
+
+def test_admin_claim_reads_any_user(client):
+    import main
+    from utils.auth import verify_token
+
+    main.app.dependency_overrides[verify_token] = lambda: {"uid": "admin-user", "admin": True}
+    try:
+        assert client.get("/api/analytics/user/someone-else/history").status_code == 200
+    finally:
+        main.app.dependency_overrides.clear()
@@ -0,0 +1,34 @@
+from fastapi.testclient import TestClient
+
+from services.token_cache import SigningKeyRefresher
+
+
+def test_refresher_stops_when_unsupported():
+    refresher = SigningKeyRefresher(lambda: None)
+    refresher.start()
+    refresher._thread.join(5)
+    stats = refresher.stats()
+    assert not stats["running"]
+    assert stats["last_error"] == "unsupported"
+
+
+def test_refresher_follows_max_age():
+    class Response:
+        status = 200
+        headers = {"cache-control": "public, max-age=20000"}
+
+    refresher = SigningKeyRefresher(lambda: lambda url, headers: Response(), refresh_fraction=0.5)
+    assert refresher.refresh() == 10000
+    assert refresher.stats()["refreshes"] == 1
+
+
+def test_local_store_starts_no_key_refresh(monkeypatch):
+    import config
+    import main
+    from utils.auth import signing_keys
+
+    # Even with refresh enabled, mock tokens never initialize Firebase Admin
+    monkeypatch.setattr(config, "TOKEN_KEY_REFRESH", True)
+    with TestClient(main.app) as client:
+        assert client.get("/api/analytics/user/mock-user/history", headers={"Authorization": "Bearer mock-token"}).status_code == 200
+        assert not signing_keys.stats()["running"]
@@ -0,0 +1,47 @@
+import pytest
+
+import config
+from services import bin_capacity, bin_index as bin_index_module
+from services.bin_index import BinIndex, ensure_bin_index
+from services.local_store import LocalStore
+from services.submissions import make_submission, write_submissions
+
+USER = {"uid": "u1", "name": "User One"}
+
+
+def deposit(kg):
+    report = {"userId": "u1", "binId": "BIN-1", "label": "Laptop", "rating": 3, "credits_earned": 30,
+              "waste_category": "Laptop", "estimated_weight_kg": kg}
+    return make_submission(USER, report, 3, 30)
+
+
+@pytest.fixture(params=[True, False], ids=["listener", "no-listener"])
+def store(request, monkeypatch):
+    index = BinIndex()
+    monkeypatch.setattr(bin_index_module, "bin_index", index)
+    monkeypatch.setattr(bin_index_module, "_listener", None)
+    monkeypatch.setattr(bin_capacity, "bin_index", index)
+    monkeypatch.setattr(config, "BIN_INDEX_LISTEN", request.param)
+    store = LocalStore()
+    store.collection("bins").document("BIN-1").set(
+        {"latitude": 28.6, "longitude": 77.2, "current_capacity": 0.0, "max_capacity": 100.0, "status": "active"})
+    ensure_bin_index(store)
+    assert bin_index_module.is_listening() == request.param
+    yield store
+    if bin_index_module._listener is not None:
+        bin_index_module._listener.unsubscribe()
+
+
+def test_deposits_are_counted_once(store):
+    write_submissions(store, [deposit(10)])
+    assert store.collection("bins").document("BIN-1").get().get("current_capacity") == 10
+    assert bin_index_module.bin_index.get("BIN-1")["current_capacity"] == 10
+
+    write_submissions(store, [deposit(40)])
+    write_submissions(store, [deposit(1)])
+    for stored in (store.collection("bins").document("BIN-1").get().to_dict(), bin_index_module.bin_index.get("BIN-1")):
+        assert (stored["current_capacity"], stored["status"]) == (51, "active")
+
+    write_submissions(store, [deposit(44)])
+    assert store.collection("bins").document("BIN-1").get().get("status") == "full"
+    assert bin_index_module.bin_index.get("BIN-1")["status"] == "full"
@@ -0,0 +1,44 @@
+import asyncio
+
+from services.bin_events import BinEventHub
+from services.bin_index import BinIndex
+
+BINS = [{"binId": "A", "latitude": 28.6, "longitude": 77.2, "current_capacity": 0},
+        {"binId": "B", "latitude": 28.7, "longitude": 77.1, "current_capacity": 5}]
+
+
+def event(message):
+    fields = dict(line.split(": ", 1) for line in message.decode().splitlines() if line)
+    return fields["event"], fields.get("id")
+
+
+def test_event_ids_follow_content_not_version():
+    async def run():
+        index = BinIndex()
+        index.replace_all(BINS)
+        hub = BinEventHub(index, interval_ms=60000)
+        first = await (await hub.stream()).__anext__()
+        name, event_id = event(first)
+        assert name == "snapshot"
+
+        # Another worker (or a restarted one) with the same bins but a different version
+        other = BinIndex()
+        other.replace_all(BINS[:1])
+        other.upsert(BINS[1])
+        assert other.version != index.version
+        other_hub = BinEventHub(other, interval_ms=60000)
+        resumed = await other_hub.stream(event_id)
+        pending = asyncio.ensure_future(resumed.__anext__())
+        await asyncio.sleep(0)
+        other.upsert({**BINS[0], "current_capacity": 7})
+        other_hub.flush()
+        name, delta_id = event(await pending)
+        assert name == "bins"
+        assert delta_id == other.listing()[1].strip('"') != event_id
+
+        # An id that matches neither list, e.g. the old version counter, gets a snapshot
+        for stale in (str(index.version), event_id):
+            name, _ = event(await (await other_hub.stream(stale)).__anext__())
+            assert name == "snapshot"
+
+    asyncio.run(run())
@@ -0,0 +1,79 @@
+import numpy as np
+
+from services.bin_index import BinIndex
+from utils.geo import haversine_one_to_many
+
+CENTER = (28.6139, 77.2090)
+
+
+def make_bins(n, seed=0, span=0.2):
+    rng = np.random.default_rng(seed)
+    lats = CENTER[0] + (rng.random(n) - 0.5) * span
+    lngs = CENTER[1] + (rng.random(n) - 0.5) * span
+    return [{"binId": f"BIN-{i}", "latitude": float(lats[i]), "longitude": float(lngs[i])} for i in range(n)], lats, lngs
+
+
+def brute_force(lats, lngs, lat, lng, radius, k=None):
+    d = haversine_one_to_many(lat, lng, lats, lngs)
+    hits = np.nonzero(d <= radius)[0]
+    hits = hits[np.argsort(d[hits], kind="stable")]
+    return [f"BIN-{i}" for i in (hits[:k] if k else hits)]
+
+
+def test_nearby_matches_brute_force():
+    bins, lats, lngs = make_bins(5000)
+    index = BinIndex(cell_deg=0.01)
+    index.replace_all(bins)
+    rng = np.random.default_rng(1)
+    for _ in range(50):
+        lat, lng = CENTER[0] + (rng.random() - 0.5) * 0.16, CENTER[1] + (rng.random() - 0.5) * 0.16
+        for radius, k in ((30.0, None), (800.0, None), (3000.0, None), (5000.0, 10)):
+            got = index.nearby(lat, lng, radius, k)
+            assert [b["binId"] for b, _ in got] == brute_force(lats, lngs, lat, lng, radius, k)
+            assert all(d <= radius for _, d in got)
+
+
+def test_nearby_follows_updates():
+    index = BinIndex()
+    index.replace_all([{"binId": "A", "latitude": CENTER[0], "longitude": CENTER[1]},
+                       {"binId": "NOCOORDS", "latitude": None, "longitude": None}])
+    assert [b["binId"] for b, _ in index.nearby(*CENTER, 10)] == ["A"]
+    assert index.get("NOCOORDS") is not None
+
+    index.upsert({"binId": "B", "latitude": CENTER[0] + 0.00005, "longitude": CENTER[1]})
+    assert [b["binId"] for b, _ in index.nearby(*CENTER, 30)] == ["A", "B"]
+
+    index.upsert({"binId": "A", "latitude": CENTER[0] + 1, "longitude": CENTER[1]})
+    index.remove("B")
+    assert index.nearby(*CENTER, 30) == []
+    assert index.nearby(CENTER[0] + 1, CENTER[1], 1, k=1)[0][0]["binId"] == "A"
+
+
+def test_listing_etag_changes_with_content():
+    index = BinIndex()
+    index.replace_all([{"binId": "B", "latitude": 1, "longitude": 2}, {"binId": "A", "latitude": 3, "longitude": 4}])
+    body, etag = index.listing()
+    assert body.index(b'"A"') < body.index(b'"B"')
+    assert index.listing() == (body, etag)
+    index.upsert({"binId": "A", "latitude": 3, "longitude": 5})
+    assert index.listing()[1] != etag
+
+
+def test_only_moves_rebuild_the_grid(monkeypatch):
+    index = BinIndex()
+    index.replace_all([{"binId": "A", "latitude": CENTER[0], "longitude": CENTER[1], "current_capacity": 0}])
+    rebuilds = []
+    rebuild = index._rebuild
+    monkeypatch.setattr(index, "_rebuild", lambda: (rebuilds.append(1), rebuild()))
+
+    index.nearby(*CENTER, 10)
+    index.upsert({"binId": "A", "latitude": CENTER[0], "longitude": CENTER[1], "current_capacity": 12.5})
+    index.upsert_many([{"binId": "A", "latitude": str(CENTER[0]), "longitude": CENTER[1], "current_capacity": 13, "status": "full"}])
+    assert index.nearby(*CENTER, 10)[0][0]["current_capacity"] == 13
+    assert len(rebuilds) == 1
+
+    index.upsert({"binId": "A", "latitude": CENTER[0] + 1, "longitude": CENTER[1], "current_capacity": 13})
+    assert index.nearby(*CENTER, 10) == []
+    index.upsert({"binId": "B", "latitude": CENTER[0], "longitude": CENTER[1]})
+    assert [b["binId"] for b, _ in index.nearby(*CENTER, 10)] == ["B"]
+    assert len(rebuilds) == 3
@@ -0,0 +1,46 @@
+import numpy as np
+
+from utils.geo import haversine_distance, haversine_matrix, haversine_one_to_many, nearest, pairwise_distance_matrix
+
+EDGE_POINTS = np.array([
+    [0.0, 0.0], [0.0, 180.0], [0.0, -180.0], [90.0, 0.0], [-90.0, 45.0],
+    [28.6139, 77.2090], [28.6139, 77.2090], [-33.8688, 151.2093], [51.5074, -0.1278],
+])
+
+
+def scalar_matrix(a, b):
+    return np.array([[haversine_distance(p[0], p[1], q[0], q[1]) for q in b] for p in a])
+
+
+def delhi_points(n, seed):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([28.6 + rng.random(n) * 0.4, 77.0 + rng.random(n) * 0.4])
+
+
+def test_vectorized_haversine_matches_scalar():
+    users, bins = delhi_points(50, 0), delhi_points(200, 1)
+    for a, b in ((EDGE_POINTS, EDGE_POINTS), (users, bins)):
+        expected = scalar_matrix(a, b)
+        # A small chunk size exercises the chunked path
+        np.testing.assert_allclose(haversine_matrix(a[:, 0], a[:, 1], b[:, 0], b[:, 1], chunk_cells=64), expected, rtol=1e-6, atol=1e-6)
+        np.testing.assert_allclose(haversine_one_to_many(a[0, 0], a[0, 1], b[:, 0], b[:, 1]), expected[0], rtol=1e-6, atol=1e-6)
+        index, distance = nearest(a[:, 0], a[:, 1], b[:, 0], b[:, 1], chunk_cells=64)
+        np.testing.assert_allclose(distance, expected.min(axis=1), rtol=1e-6, atol=1e-6)
+        np.testing.assert_allclose(expected[np.arange(len(a)), index], distance, rtol=1e-6, atol=1e-6)
+
+
+def test_pairwise_distance_matrix_matches_haversine():
+    for points in (EDGE_POINTS, delhi_points(300, 2)):
+        got = pairwise_distance_matrix(points[:, 0], points[:, 1])
+        np.testing.assert_allclose(got, haversine_matrix(points[:, 0], points[:, 1], points[:, 0], points[:, 1]), rtol=1e-9, atol=1e-6)
+        np.testing.assert_array_equal(np.diag(got), 0.0)
+
+
+def test_pairwise_distance_matrix_close_points():
+    # 0.11 m and 1 m apart, where 1 - p.q loses the distance to cancellation
+    lats = np.array([28.6139, 28.6139 + 1e-6, 28.6139, 51.5074])
+    lngs = np.array([77.2090, 77.2090, 77.2090 + 1e-5 / np.cos(np.radians(28.6139)), -0.1278])
+    got = pairwise_distance_matrix(lats, lngs)
+    np.testing.assert_allclose(got, haversine_matrix(lats, lngs, lats, lngs), rtol=1e-9, atol=1e-6)
+    assert 0.11 < got[0, 1] < 0.112
+    np.testing.assert_allclose(got, got.T)
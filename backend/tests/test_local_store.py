@@ -0,0 +1,93 @@
+import pytest
+
+from services.local_store import LocalStore, NotFound
+from services.storage import DESCENDING, increment
+from services.submissions import MAX_BATCH_WRITES
+
+
+def test_batch_commit_is_atomic():
+    store = LocalStore()
+    users = store.collection("users")
+    users.document("a").set({"totalStars": 1, "name": "A"})
+
+    batch = store.batch()
+    batch.set(users.document("a"), {"totalStars": increment(2)}, merge=True)
+    batch.set(store.collection("reports").document("r1"), {"userId": "a"})
+    batch.update(users.document("missing"), {"totalStars": 1})
+    with pytest.raises(NotFound):
+        batch.commit()
+    # Nothing of the failed batch was applied
+    assert users.document("a").get().to_dict() == {"totalStars": 1, "name": "A"}
+    assert not store.collection("reports").document("r1").get().exists
+
+    batch = store.batch()
+    batch.set(users.document("a"), {"totalStars": increment(2)}, merge=True)
+    batch.set(users.document("b"), {"totalStars": increment(3)}, merge=True)
+    batch.commit()
+    assert users.document("a").get().to_dict() == {"totalStars": 3, "name": "A"}
+    assert users.document("b").get().to_dict() == {"totalStars": 3}
+
+
+def test_batch_write_limit():
+    store = LocalStore()
+    batch = store.batch()
+    for i in range(MAX_BATCH_WRITES + 1):
+        batch.set(store.collection("bins").document(str(i)), {"i": i})
+    with pytest.raises(ValueError):
+        batch.commit()
+    assert store.collection("bins").limit(1).get() == []
+
+
+def test_paging_by_document_id():
+    store = LocalStore()
+    bins = store.collection("bins")
+    ids = [f"BIN-{i:03d}" for i in range(250)]
+    for start in range(0, len(ids), 100):
+        batch = store.batch()
+        for doc_id in ids[start:start + 100]:
+            batch.set(bins.document(doc_id), {"n": int(doc_id[4:])})
+        batch.commit()
+
+    seen, last = [], None
+    while True:
+        query = bins.order_by("__name__").limit(60)
+        if last is not None:
+            query = query.start_after(last)
+        page = query.get()
+        if not page:
+            break
+        seen.extend(doc.id for doc in page)
+        last = page[-1]
+    assert seen == ids
+
+    bins.document("BIN-100").delete()
+    newest = bins.order_by("__name__", direction=DESCENDING).start_after({"__name__": "BIN-102"}).limit(3).get()
+    assert [doc.id for doc in newest] == ["BIN-101", "BIN-099", "BIN-098"]
+
+
+def test_filtered_query_order_and_cursor():
+    store = LocalStore()
+    reports = store.collection("reports")
+    for i in range(20):
+        reports.document(f"r{i:02d}").set({"userId": "u1" if i % 2 else "u2", "ts": i})
+
+    query = reports.where("userId", "==", "u1").order_by("ts", direction=DESCENDING)
+    first = query.limit(4).get()
+    assert [doc.get("ts") for doc in first] == [19, 17, 15, 13]
+    rest = query.start_after(first[-1]).get()
+    assert [doc.get("ts") for doc in rest] == [11, 9, 7, 5, 3, 1]
+
+    # The equality index follows writes
+    reports.document("r19").update({"userId": "u2"})
+    assert [doc.get("ts") for doc in query.limit(2).get()] == [17, 15]
+
+
+def test_sqlite_persistence(tmp_path):
+    path = str(tmp_path / "store.sqlite3")
+    store = LocalStore(path)
+    store.collection("users").document("a").set({"totalStars": increment(5), "tags": ["x"]})
+    store.close()
+
+    reopened = LocalStore(path)
+    assert reopened.collection("users").document("a").get().to_dict() == {"totalStars": 5, "tags": ["x"]}
+    reopened.close()
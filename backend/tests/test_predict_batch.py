@@ -0,0 +1,85 @@
+import io
+import json
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+BIN = {"binId": "TEST-BIN", "latitude": 28.6139, "longitude": 77.2090, "areaName": "Test", "max_capacity": 1e9,
+       "current_capacity": 0, "status": "active"}
+AUTH = {"Authorization": "Bearer mock-token"}
+
+
+def jpeg(seed: int) -> bytes:
+    # Black and white blocks with noise pass the clarity check
+    rng = np.random.default_rng(seed)
+    blocks = rng.integers(0, 2, size=(8, 8, 1), dtype=np.uint8) * 215 + rng.integers(0, 41, size=(8, 8, 3), dtype=np.uint8)
+    img = np.kron(blocks, np.ones((30, 40, 1), dtype=np.uint8))
+    img = np.clip(img.astype(np.int16) + rng.integers(-20, 21, size=img.shape), 0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(img).save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+
+@pytest.fixture(scope="module")
+def client():
+    import main
+    from services.bin_index import bin_index
+    from services.storage import get_store
+
+    with TestClient(main.app) as client:
+        get_store().collection("bins").document(BIN["binId"]).set(BIN)
+        bin_index.upsert(dict(BIN))
+        yield client
+
+
+def post_batch(client, images):
+    files = [("files", (f"item-{i}.jpg", data, "image/jpeg")) for i, data in enumerate(images)]
+    response = client.post("/api/predict/batch", files=files, headers=AUTH,
+                           data={"bin_id": BIN["binId"], "user_lat": BIN["latitude"], "user_lng": BIN["longitude"]})
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    return [line for line in lines if "index" in line], lines[-1]["summary"]
+
+
+def test_batch_returns_one_line_per_image(client):
+    a, b = jpeg(100), jpeg(101)
+    results, summary = post_batch(client, [a, b, a, b, a])
+    assert sorted(r["index"] for r in results) == [0, 1, 2, 3, 4]
+    by_index = {r["index"]: r for r in results}
+    assert [by_index[i]["filename"] for i in range(5)] == [f"item-{i}.jpg" for i in range(5)]
+    assert by_index[2]["label"] == by_index[0]["label"]
+    assert summary["images"] == 5
+    assert summary["accepted"] + summary["rejected"] + summary["errors"] == 5
+    assert summary["stored"] == "committed"
+
+
+def test_batch_rejects_non_images(client):
+    files = [("files", ("a.jpg", jpeg(102), "image/jpeg")), ("files", ("notes.txt", b"hello", "text/plain"))]
+    response = client.post("/api/predict/batch", files=files, headers=AUTH,
+                           data={"bin_id": BIN["binId"], "user_lat": BIN["latitude"], "user_lng": BIN["longitude"]})
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    # Lines stream out as results are ready, not in upload order
+    assert {"index": 1, "filename": "notes.txt", "error": "File must be an image"} in lines
+    assert lines[-1]["summary"]["errors"] == 1
+
+
+def test_batch_requires_token(client):
+    response = client.post("/api/predict/batch", files=[("files", ("a.jpg", jpeg(103), "image/jpeg"))],
+                           data={"bin_id": BIN["binId"], "user_lat": BIN["latitude"], "user_lng": BIN["longitude"]})
+    assert response.status_code == 422
+
+
+def test_copies_of_a_cached_image_each_get_a_line(client):
+    a, b = jpeg(104), jpeg(105)
+    response = client.post("/api/predict", files={"file": ("a.jpg", a, "image/jpeg")}, headers=AUTH,
+                           data={"bin_id": BIN["binId"], "user_lat": BIN["latitude"], "user_lng": BIN["longitude"]})
+    assert response.status_code == 200
+
+    results, summary = post_batch(client, [a, a, b, b])
+    assert sorted(r["index"] for r in results) == [0, 1, 2, 3]
+    assert summary["images"] == 4
+    assert summary["accepted"] + summary["rejected"] + summary["errors"] == 4
+    by_index = {r["index"]: r for r in results}
+    assert by_index[0]["label"] == by_index[1]["label"]
@@ -0,0 +1,136 @@
+import json
+import time
+
+from services.local_store import LocalStore
+from services.report_queue import ReportWriter
+from services.submissions import make_submission
+
+USER = {"uid": "u1", "name": "User One"}
+
+
+def submission(rating=3):
+    return make_submission(USER, {"userId": "u1", "label": "Battery", "rating": rating, "credits_earned": rating * 10,
+                                  "waste_category": "Battery", "estimated_weight_kg": 0.1}, rating, rating * 10)
+
+
+def test_journal_replay_after_crash(tmp_path):
+    journal = tmp_path / "journal.ndjson"
+    done, pending = submission(), [submission(2), submission(4)]
+    with open(journal, "w") as f:
+        for s in [done] + pending:
+            f.write(json.dumps(s) + "\n")
+        f.write(json.dumps({"committed": [done["id"]]}) + "\n")
+        # A line torn by the crash
+        f.write('{"id": "torn", "us')
+
+    store = LocalStore()
+    writer = ReportWriter(lambda: store, journal_path=str(journal), flush_interval_ms=10)
+    writer.start()
+    writer.close()
+
+    reports = store.collection("reports")
+    assert not reports.document(done["id"]).get().exists
+    for s in pending:
+        assert reports.document(s["id"]).get().to_dict()["rating"] == s["stars"]
+    user = store.collection("users").document("u1").get().to_dict()
+    assert (user["totalStars"], user["totalCredits"], user["testsCompleted"]) == (6, 60, 2)
+    assert writer.stats()["flushed"] == 2
+    # Drained, so the journal starts over
+    assert journal.read_text() == ""
+
+
+def test_submissions_are_journaled_until_committed(tmp_path):
+    journal = tmp_path / "journal.ndjson"
+    store = LocalStore()
+    writer = ReportWriter(lambda: store, journal_path=str(journal), flush_interval_ms=10)
+    writer.start()
+    submissions = [submission() for _ in range(5)]
+    for s in submissions:
+        assert writer.submit(s)
+    writer.close()
+    assert all(store.collection("reports").document(s["id"]).get().exists for s in submissions)
+
+    # A writer that never got to flush leaves its submissions for the next start
+    unflushed = submission(5)
+    with open(journal, "a") as f:
+        f.write(json.dumps(unflushed) + "\n")
+    replayed = ReportWriter(lambda: store, journal_path=str(journal), flush_interval_ms=10)
+    replayed.start()
+    replayed.close()
+    assert store.collection("reports").document(unflushed["id"]).get().exists
+    assert store.collection("users").document("u1").get().get("totalStars") == 5 * 3 + 5
+
+
+class PoisonedStore(LocalStore):
+    """Fails every batch that holds a report labelled "poison"."""
+
+    def _commit(self, writes):
+        if any(op == "set" and data.get("label") == "poison" for op, _, data, _ in writes):
+            raise ValueError("invalid report")
+        super()._commit(writes)
+
+
+def test_failing_report_is_dead_lettered(tmp_path):
+    journal, dead = tmp_path / "journal.ndjson", tmp_path / "dead.ndjson"
+    store = PoisonedStore()
+    writer = ReportWriter(lambda: store, journal_path=str(journal), flush_size=8, flush_interval_ms=10,
+                          max_retries=1, dead_letter_path=str(dead), failure_pause_s=0)
+    submissions = [submission() for _ in range(12)]
+    poison = submissions[5]
+    poison["report"]["label"] = "poison"
+    writer.start()
+    for s in submissions:
+        writer.submit(s)
+    # close() stops retrying, so wait for the queue to drain first
+    deadline = time.monotonic() + 10
+    while writer.stats()["queue_depth"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    writer.close()
+
+    reports = store.collection("reports")
+    assert [reports.document(s["id"]).get().exists for s in submissions] == [s is not poison for s in submissions]
+    lines = [json.loads(line) for line in dead.read_text().splitlines()]
+    assert [line["id"] for line in lines] == [poison["id"]]
+    assert lines[0]["error"] == "invalid report"
+    stats = writer.stats()
+    assert (stats["flushed"], stats["dead_lettered"], stats["queue_depth"]) == (11, 1, 0)
+    assert journal.read_text() == ""
+
+
+class FlakyStore(LocalStore):
+    """Fails every commit with a connection error until ``down`` is cleared."""
+
+    down = True
+
+    def _commit(self, writes):
+        if self.down:
+            raise ConnectionError("store unavailable")
+        super()._commit(writes)
+
+
+def test_outage_keeps_reports_queued(tmp_path):
+    journal, dead = tmp_path / "journal.ndjson", tmp_path / "dead.ndjson"
+    store = FlakyStore()
+    writer = ReportWriter(lambda: store, journal_path=str(journal), flush_size=4, flush_interval_ms=10,
+                          max_retries=0, dead_letter_path=str(dead), failure_pause_s=0.01)
+    submissions = [submission() for _ in range(10)]
+    writer.start()
+    for s in submissions:
+        writer.submit(s)
+    # Long enough for the old halving to reach a single report and dead-letter it
+    deadline = time.monotonic() + 0.5
+    while time.monotonic() < deadline:
+        assert writer.stats()["queue_depth"] == 10
+        time.sleep(0.01)
+
+    store.down = False
+    deadline = time.monotonic() + 10
+    while writer.stats()["queue_depth"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    writer.close()
+
+    assert all(store.collection("reports").document(s["id"]).get().exists for s in submissions)
+    stats = writer.stats()
+    assert (stats["flushed"], stats["dead_lettered"], stats["queue_depth"]) == (10, 0, 0)
+    assert not dead.exists()
+    assert store.collection("users").document("u1").get().get("totalStars") == 30
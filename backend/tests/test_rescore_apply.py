@@ -0,0 +1,33 @@
+import json
+
+from scripts.rescore_reports import apply
+from services import storage
+from services.local_store import LocalStore
+
+BEFORE = {"label": "phone", "confidence": 0.9, "waste_category": "small", "rating": 3, "credits_earned": 30,
+          "estimated_weight_kg": 0.2}
+AFTER = {**BEFORE, "label": "laptop", "waste_category": "large", "rating": 4, "credits_earned": 50}
+
+
+def test_apply_skips_reports_changed_since_the_run(tmp_path, monkeypatch):
+    store = LocalStore()
+    monkeypatch.setattr(storage, "_store", store)
+    reports = store.collection("reports")
+    reports.document("r1").set({"userId": "u", **BEFORE})
+    reports.document("r2").set({"userId": "u", **BEFORE, "rating": 5})
+    store.collection("users").document("u").set({"totalStars": 10, "totalCredits": 100})
+
+    path = tmp_path / "rescore.ndjson"
+    lines = [{"run": "rescore-test"}] + [
+        {"run": "rescore-test", "reportId": r, "userId": "u", "binId": "b", "before": BEFORE, "after": AFTER}
+        for r in ("r1", "r2", "missing")]
+    path.write_text("".join(json.dumps(line) + "\n" for line in lines))
+
+    apply(str(path), chunk_size=2)
+    assert reports.document("r1").get().to_dict()["label"] == "laptop"
+    assert reports.document("r2").get().to_dict()["label"] == "phone"
+    assert store.collection("users").document("u").get().to_dict() == {"totalStars": 11, "totalCredits": 120}
+
+    # A second apply is a no-op
+    apply(str(path), chunk_size=2)
+    assert store.collection("users").document("u").get().to_dict() == {"totalStars": 11, "totalCredits": 120}
@@ -0,0 +1,51 @@
+import numpy as np
+
+from services.routing import needs_collection, plan_collection, solve_routes
+
+DEPOT = (28.6139, 77.2090)
+
+
+def problem(n, seed):
+    rng = np.random.default_rng(seed)
+    return 28.40 + rng.random(n) * 0.45, 76.95 + rng.random(n) * 0.45, rng.uniform(60, 150, n)
+
+
+def test_routes_visit_every_bin_once_within_capacity():
+    for n, trucks, slack in ((1, 3, 1.0), (60, 3, 1.2), (400, 8, 1.1), (300, 2, 0.5)):
+        lats, lngs, demand = problem(n, n)
+        capacity = max(demand.sum() / trucks * slack, demand.max())
+        routes, lengths, unassigned, stats = solve_routes(lats, lngs, demand, DEPOT, trucks, capacity, 5000)
+        assert len(routes) == trucks
+        assert sorted([i for route in routes for i in route] + unassigned) == list(range(n))
+        assert all(demand[route].sum() <= capacity + 1e-6 for route in routes)
+        assert stats.distance_m <= stats.construction_m + 1e-6
+        assert abs(sum(lengths) - stats.distance_m) < 1e-3
+        if slack < 1:
+            assert unassigned
+
+
+def test_short_budget_still_returns_a_valid_plan():
+    lats, lngs, demand = problem(1000, 0)
+    capacity = demand.sum() / 4 * 1.1
+    routes, _, unassigned, stats = solve_routes(lats, lngs, demand, DEPOT, 4, capacity, 1)
+    assert stats.timed_out
+    assert sorted([i for route in routes for i in route] + unassigned) == list(range(1000))
+
+
+def test_plan_collection_selects_full_bins():
+    bins = [
+        {"binId": "FULL", "latitude": 28.60, "longitude": 77.20, "current_capacity": 50, "max_capacity": 100, "status": "full"},
+        {"binId": "HIGH", "latitude": 28.61, "longitude": 77.21, "current_capacity": 90, "max_capacity": 100, "status": "active"},
+        {"binId": "LOW", "latitude": 28.62, "longitude": 77.22, "current_capacity": 10, "max_capacity": 100, "status": "active"},
+        {"binId": "OFF", "latitude": 28.63, "longitude": 77.23, "current_capacity": 100, "max_capacity": 100, "status": "inactive"},
+        {"binId": "NOWHERE", "current_capacity": 100, "max_capacity": 100},
+    ]
+    assert [b["binId"] for b in bins if needs_collection(b, 0.8)] == ["FULL", "HIGH"]
+    plan = plan_collection(bins, 0.8, 2, 1000, 100)
+    assert plan["bins_selected"] == 2
+    assert sorted(s["binId"] for r in plan["routes"] for s in r["stops"]) == ["FULL", "HIGH"]
+    assert plan["unassigned"] == []
+
+    empty = plan_collection(bins[2:], 0.8, 2, 1000, 100, depot=(28.6, 77.2))
+    assert empty["bins_selected"] == 0 and empty["total_distance_km"] == 0
+    assert [r["stops"] for r in empty["routes"]] == [[], []]
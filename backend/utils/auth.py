@@ -1,44 +1,112 @@
-import firebase_admin
-from firebase_admin import credentials, auth, firestore
 from fastapi import HTTPException, Header
+from fastapi.concurrency import run_in_threadpool
+from services.token_cache import SigningKeyRefresher, token_cache
+from services.telemetry import stage
+import config
+import logging
+import threading
+import os
+
+# Firebase Admin is initialized on first use (or by the startup warm-up) rather
+# than at import time, so the app can answer health checks while the SDK and
+# credentials are still loading. The document store is in services/storage.py.
+_init_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+def init_firebase():
+    """Initialize Firebase Admin once; safe to call from any thread."""
+    import firebase_admin
+    from firebase_admin import credentials
+
+    with _init_lock:
+        if firebase_admin._apps:
+            return
+        try:
+            cred = None
+            # Check for service account key file in root or current dir
+            key_path = "serviceAccountKey.json"
+            if os.path.exists(key_path):
+                cred = credentials.Certificate(key_path)
+
+            if cred:
+                firebase_admin.initialize_app(cred)
+            else:
+                # Fallback to default (will fail if no ADC set)
+                firebase_admin.initialize_app()
+        except ValueError:
+            # Already initialized
+            pass
+    # Only once the SDK is set up: the memory and sqlite stores with mock
+    # tokens never initialize it, and start no key-fetching thread
+    if config.TOKEN_KEY_REFRESH:
+        signing_keys.start()
+
+
+def _verify_id_token(token: str):
+    init_firebase()
+    from firebase_admin import auth
+
+    return auth.verify_id_token(token)
+
+
+def _signing_key_request():
+    # The SDK's own cert-fetching transport, so a refresh warms the HTTP cache
+    # verify_id_token() reads from. Relies on Firebase Admin internals; if
+    # they change, this returns None, the refresher stops and verification
+    # fetches the keys itself as usual.
+    init_firebase()
+    import firebase_admin
+    from firebase_admin import auth
+
+    try:
+        return auth._get_client(firebase_admin.get_app())._token_verifier.request
+    except AttributeError as e:
+        logger.warning("This firebase_admin version has no token verifier transport to refresh signing keys with: %s", e)
+        return None
+
+
+signing_keys = SigningKeyRefresher(_signing_key_request)
+
+
+def auth_stats():
+    return {"token_cache": token_cache.stats(), "signing_keys": signing_keys.stats()}
+
+
+def require_user(token: dict, uid: str):
+    """403 unless the verified token belongs to ``uid`` or carries the ``admin`` custom claim."""
+    if token.get("uid") != uid and token.get("admin") is not True:
+        raise HTTPException(status_code=403, detail="Not allowed to read another user's data")
+
+
+def require_admin(token: dict):
+    """403 unless the verified token carries the ``admin`` custom claim."""
+    if token.get("admin") is not True:
+        raise HTTPException(status_code=403, detail="Admin access required")
 
-# Initialize Firebase Admin
-# Initialize Firebase Admin
-try:
-    cred = None
-    # Check for service account key file in root or current dir
-    import os
-    
-    key_path = "serviceAccountKey.json"
-    if os.path.exists(key_path):
-        cred = credentials.Certificate(key_path)
-    
-    if cred:
-        default_app = firebase_admin.initialize_app(cred)
-    else:
-        # Fallback to default (will fail if no ADC set)
-        default_app = firebase_admin.initialize_app()
-except ValueError:
-    # Already initialized
-    pass
-
-db = firestore.client()
 
 async def verify_token(authorization: str = Header(...)):
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Invalid authorization header")
-    
+
     token = authorization.split(" ")[1]
-    
+
     try:
         # Mock for hackathon if no firebase creds key file present?
         # Ideally: decoded_token = auth.verify_id_token(token)
         # For simplicity in this environment without key file:
         if token == "mock-token":
             return {"uid": "mock-user", "name": "Mock User"}
-            
-        decoded_token = auth.verify_id_token(token)
+
+        # A token seen before is answered from the cache without leaving the
+        # event loop; otherwise verification may initialize the SDK or fetch
+        # signing keys, so it runs in the threadpool.
+        with stage("auth"):
+            decoded_token = token_cache.get(token)
+            if decoded_token is None:
+                decoded_token = await run_in_threadpool(token_cache.verify, token, _verify_id_token)
         return decoded_token
     except Exception as e:
-        print(f"Auth error: {e}")
+        logger.info("Auth error: %s", e)
         raise HTTPException(status_code=401, detail="Invalid token")
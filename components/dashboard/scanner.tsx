@@ -345,7 +345,7 @@ export function Scanner() {
                                                 </div>
                                                 <p className="text-xs text-yellow-700 dark:text-yellow-300 mt-1">
                                                     +{result.stars_awarded} Stars Earned
-                                                    {result.new_total_stars !== undefined && ` (Total: ${result.new_total_stars})`}
+                                                    {result.new_total_stars != null && ` (Total: ${result.new_total_stars})`}
                                                 </p>
                                             </div>
                                         </div>
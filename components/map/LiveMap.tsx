@@ -4,7 +4,7 @@ import { MapContainer, TileLayer, Marker, Popup, Circle } from "react-leaflet"
 import "leaflet/dist/leaflet.css"
 import L from "leaflet"
 import { useEffect, useState } from "react"
-import { getBins, getNearbyBins } from "@/lib/api"
+import { getBins, getNearbyBins, subscribeBinUpdates } from "@/lib/api"
 import { MapPin, Navigation2 } from "lucide-react"
 
 // Custom marker icons
@@ -125,6 +125,31 @@ export default function LiveMap() {
         }
     }, [])
 
+    // Live bins: a (re)connect snapshot replaces the list, deltas patch known bins and add new ones.
+    // Distances from the nearby search are kept for bins that were already on the map.
+    useEffect(() => {
+        const replace = (snapshot: Bin[]) => {
+            setBins((prev) => {
+                const distances = new Map(prev.map((bin) => [bin.binId, bin.distance]))
+                return snapshot.map((bin) => ({ ...bin, distance: distances.get(bin.binId) }))
+            })
+        }
+        return subscribeBinUpdates(replace, (changed, removed) => {
+            setBins((prev) => {
+                const byId = new Map(changed.map((u: Bin) => [u.binId, u]))
+                const merged = prev
+                    .filter((bin) => !removed.includes(bin.binId))
+                    .map((bin) => {
+                        const update = byId.get(bin.binId)
+                        if (!update) return bin
+                        byId.delete(bin.binId)
+                        return { ...bin, ...update }
+                    })
+                return [...merged, ...byId.values()]
+            })
+        })
+    }, [])
+
     const getMarkerIcon = (bin: Bin) => {
         if (nearestBin && bin.binId === nearestBin.binId) {
             return nearestIcon
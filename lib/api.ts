@@ -1,34 +1,64 @@
 export const API_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000/api";
 
 // Bin management
+let binsCache: { etag: string; bins: any[] } | null = null;
+
 export async function getBins() {
-  const response = await fetch(`${API_URL}/admin/bins`);
+  // Revalidate with the last ETag; an unchanged list comes back as an empty 304
+  const headers: HeadersInit = {};
+  if (binsCache) headers["If-None-Match"] = binsCache.etag;
+
+  const response = await fetch(`${API_URL}/admin/bins`, { headers, cache: "no-store" });
+  if (response.status === 304 && binsCache) {
+    return binsCache.bins;
+  }
   if (!response.ok) {
     throw new Error("Failed to fetch bins");
   }
   const data = await response.json();
-  return data.bins || [];
+  const bins = data.bins || [];
+  const etag = response.headers.get("ETag");
+  binsCache = etag ? { etag, bins } : null;
+  return bins;
 }
 
-export async function getNearbyBins(userLat: number, userLng: number, radiusKm: number = 3.0) {
-  const bins = await getBins();
-  
-  // Haversine distance calculation
-  const haversine = (lat1: number, lon1: number, lat2: number, lon2: number) => {
-    const R = 6371; // Earth radius in km
-    const dLat = (lat2 - lat1) * Math.PI / 180;
-    const dLon = (lon2 - lon1) * Math.PI / 180;
-    const a = Math.sin(dLat / 2) * Math.sin(dLat / 2) +
-              Math.cos(lat1 * Math.PI / 180) * Math.cos(lat2 * Math.PI / 180) *
-              Math.sin(dLon / 2) * Math.sin(dLon / 2);
-    const c = 2 * Math.atan2(Math.sqrt(a), Math.sqrt(1 - a));
-    return R * c;
-  };
-
-  return bins.map((bin: any) => ({
+export function subscribeBinUpdates(
+  onSnapshot: (bins: any[]) => void,
+  onChange: (changed: any[], removed: string[]) => void,
+) {
+  // Server-Sent Events: a full snapshot on (re)connect, then coalesced per-bin deltas.
+  // EventSource reconnects on its own; returns a function that closes the stream.
+  const source = new EventSource(`${API_URL}/bins/stream`);
+  source.addEventListener("snapshot", (event) => {
+    onSnapshot(JSON.parse((event as MessageEvent).data).bins || []);
+  });
+  source.addEventListener("bins", (event) => {
+    const data = JSON.parse((event as MessageEvent).data);
+    onChange(data.changed || [], data.removed || []);
+  });
+  return () => source.close();
+}
+
+export async function getNearbyBins(userLat: number, userLng: number, radiusKm: number = 3.0, limit?: number) {
+  // Radius search runs server-side against the in-memory bin index
+  const params = new URLSearchParams({
+    lat: userLat.toString(),
+    lng: userLng.toString(),
+    radius: (radiusKm * 1000).toString(),
+  });
+  if (limit !== undefined) params.append("k", limit.toString());
+
+  const response = await fetch(`${API_URL}/bins/nearby?${params}`);
+  if (!response.ok) {
+    throw new Error("Failed to fetch nearby bins");
+  }
+  const data = await response.json();
+
+  // Callers expect `distance` in km, nearest first
+  return (data.bins || []).map((bin: any) => ({
     ...bin,
-    distance: haversine(userLat, userLng, bin.latitude, bin.longitude)
-  })).filter((bin: any) => bin.distance <= radiusKm);
+    distance: bin.distance_meters / 1000
+  }));
 }
 
 // AI Prediction
@@ -59,6 +89,36 @@ export async function predictImage(file: File, token?: string, binId?: string, u
   return response.json();
 }
 
+// User history and charts
+// Both need the user's Firebase ID token (auth.currentUser.getIdToken())
+export async function getUserHistory(uid: string, token: string, cursor?: string, limit: number = 50) {
+  // Pass back `next_cursor` from the previous page; it is null on the last page
+  const params = new URLSearchParams({ limit: limit.toString() });
+  if (cursor) params.append("cursor", cursor);
+
+  const response = await fetch(`${API_URL}/analytics/user/${uid}/history?${params}`, {
+    headers: { Authorization: `Bearer ${token}` },
+  });
+  if (!response.ok) {
+    throw new Error("Failed to fetch history");
+  }
+  return response.json();
+}
+
+export async function getUserSeries(uid: string, token: string, start: string, end: string, period: "day" | "week" | "month" = "day") {
+  // Dates as YYYY-MM-DD; served from precomputed per-user buckets
+  const params = new URLSearchParams({ start, end, period });
+
+  const response = await fetch(`${API_URL}/analytics/user/${uid}/series?${params}`, {
+    headers: { Authorization: `Bearer ${token}` },
+  });
+  if (!response.ok) {
+    throw new Error("Failed to fetch chart data");
+  }
+  const data = await response.json();
+  return data.buckets || [];
+}
+
 // Admin functions
 export async function adminLogin(email: string, password: string) {
   const response = await fetch(`${API_URL}/admin/login`, {
@@ -105,6 +165,28 @@ export async function updateBin(binId: string, data: any) {
   return response.json();
 }
 
+export async function importBins(file: File, dryRun: boolean = false) {
+  // CSV, GeoJSON or NDJSON; the format is taken from the file extension
+  const formData = new FormData();
+  formData.append("file", file);
+
+  const response = await fetch(`${API_URL}/admin/bins/import?dry_run=${dryRun}`, {
+    method: "POST",
+    body: formData,
+  });
+
+  if (!response.ok) {
+    const error = await response.json();
+    throw new Error(error.detail || "Failed to import bins");
+  }
+
+  return response.json();
+}
+
+export function binsExportUrl(format: "csv" | "geojson" | "ndjson" = "csv") {
+  return `${API_URL}/admin/bins/export?format=${format}`;
+}
+
 export async function deleteBin(binId: string) {
   const response = await fetch(`${API_URL}/admin/bins/${binId}`, {
     method: "DELETE",